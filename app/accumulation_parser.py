@@ -0,0 +1,93 @@
+"""
+Parser for accumulation amounts ("2 pts", "Até 1,5 pts", "de 2 a 5 pts") and helpers
+for fixed-point point arithmetic.
+
+Points are represented as integers in hundredths of a point (POINTS_SCALE), so 1,5
+points is 150. All comparisons in the matching path are done on these integers.
+"""
+import re
+from decimal import Decimal
+from typing import NamedTuple, Optional, Union
+
+POINTS_SCALE = 100
+
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_AMOUNT_RE = re.compile(
+    r'^(?:(?P<upto>at[eé])\s+)?(?:de\s+)?(?P<first>' + _NUMBER + r')'
+    r'(?:\s+a\s+(?P<second>' + _NUMBER + r'))?'
+    r'\s*(?P<unit>pontos?|pts?)?\.?$',
+    re.IGNORECASE)
+_NUMBER_RE = re.compile(_NUMBER)
+
+
+class AccumulationRange(NamedTuple):
+    """
+    Points offered per real, in fixed-point (hundredths of a point).
+    """
+    min: int
+    max: int
+    unit: str
+
+
+def _fixed_from_text(number: str) -> int:
+    whole, _, fraction = number.replace(",", ".").partition(".")
+    fraction = (fraction + "00")[:2]
+    return int(whole) * POINTS_SCALE + int(fraction)
+
+
+def to_fixed(value: Union[int, float, Decimal, str, None]) -> int:
+    """
+    Converts a number of points to fixed-point.
+
+    Strings may use a comma as decimal separator; the first number found is used and
+    text without numbers is 0.
+
+    Args:
+        value (Union[int, float, Decimal, str, None]): Number of points.
+
+    Returns:
+        int: The value in hundredths of a point.
+    """
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, int):
+        return value * POINTS_SCALE
+    if isinstance(value, (float, Decimal)):
+        return int(round(Decimal(str(value)) * POINTS_SCALE))
+    match = _NUMBER_RE.search(value)
+    return _fixed_from_text(match.group(0)) if match else 0
+
+
+def from_fixed(value: int) -> Decimal:
+    """
+    Converts a fixed-point value back to a Decimal number of points.
+    """
+    return Decimal(value) / POINTS_SCALE
+
+
+def parse_accumulation(text: Optional[str]) -> Optional[AccumulationRange]:
+    """
+    Parses an Esfera accumulation amount into a structured range.
+
+    Examples:
+        "2 pts"          -> AccumulationRange(200, 200, "pts")
+        "Até 1,5 pts"    -> AccumulationRange(0, 150, "pts")
+        "de 2 a 5 pts"   -> AccumulationRange(200, 500, "pts")
+
+    Args:
+        text (Optional[str]): The "esf_accumulationAmount" label.
+
+    Returns:
+        Optional[AccumulationRange]: The range, or None if the text is empty or not understood.
+    """
+    if not text:
+        return None
+    match = _AMOUNT_RE.match(" ".join(text.split()))
+    if match is None:
+        return None
+    first = _fixed_from_text(match.group("first"))
+    second = _fixed_from_text(match.group("second")) if match.group("second") else first
+    low, high = min(first, second), max(first, second)
+    if match.group("upto"):
+        low = 0
+    return AccumulationRange(low, high, "pts")
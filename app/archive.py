@@ -0,0 +1,38 @@
+"""
+Reads the raw-response archives written by the tracker daemon (--archive).
+
+    python3 -m app.archive app/database/archive                          # list the cycles
+    python3 -m app.archive app/database/archive 20250101T120000          # list a cycle's responses
+    python3 -m app.archive app/database/archive 20250101T120000 esfera --key offset=50 > page.json
+
+Only the requested responses are decompressed.
+"""
+import argparse
+import sys
+from app.response_archive_class import ResponseArchive
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Raw-response archive reader")
+    parser.add_argument("directory", help="archive directory")
+    parser.add_argument("cycle", nargs="?", help="cycle to list or extract from")
+    parser.add_argument("source", nargs="?", help="source whose responses are written to stdout")
+    parser.add_argument("--key", help="only responses whose request contains this text")
+    args = parser.parse_args()
+
+    archive = ResponseArchive(args.directory, retain=0)
+    if args.cycle is None:
+        for cycle in archive.cycles():
+            print(cycle)
+        return
+    reader = archive.open(args.cycle)
+    if args.source is None:
+        for entry in reader.entries:
+            print(f"{entry.source}\t{entry.status}\t{entry.elapsed:.3f}\t{entry.raw_length}\t{entry.length}\t{entry.key}")
+        return
+    for content in reader.read(args.source, args.key):
+        sys.stdout.buffer.write(content + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Micro-benchmarks for the tracker's hot paths, run against the sample responses in
+app/database.
+
+    python3 -m app.benchmarks               # run every benchmark
+    python3 -m app.benchmarks json_codec    # run only the named ones
+    python3 -m app.benchmarks --memory      # per-stage memory of the Esfera sample
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+from app.esfera_partners_list import EsferaPartnersList
+from app.notification_renderer_class import ESFERA_RENDERER
+from app.partnersconfig_class import PartnerConfig
+from app.sentence_analysis_cache_class import SENTENCE_CACHE
+from app.services import json_codec
+from app.stage_memory_class import StageMemoryTracker
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchstore_class import WatchStore
+
+ESFERA_RESPONSE_PATH = "./app/database/response_esfera.json"
+
+BENCHMARKS: Dict[str, Callable[[int], Dict[str, float]]] = {}
+
+
+def benchmark(func: Callable[[int], Dict[str, float]]) -> Callable[[int], Dict[str, float]]:
+    """
+    Registers a benchmark. It receives the repeat count and returns named timings in seconds.
+    """
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    """
+    Returns the best wall-clock time of repeat calls to func.
+    """
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@benchmark
+def json_codec_decode(repeat: int) -> Dict[str, float]:
+    with open(ESFERA_RESPONSE_PATH, "rb") as f:
+        raw = f.read()
+    return {
+        "stdlib json.loads(str)": best_of(lambda: json.loads(raw.decode("utf-8")), repeat),
+        f"json_codec.loads(bytes) [{json_codec.BACKEND}]": best_of(lambda: json_codec.loads(raw), repeat),
+    }
+
+
+@benchmark
+def json_codec_encode(repeat: int) -> Dict[str, float]:
+    data = json_codec.load(ESFERA_RESPONSE_PATH)
+    return {
+        "stdlib json.dumps": best_of(lambda: json.dumps(data, ensure_ascii=False).encode("utf-8"), repeat),
+        f"json_codec.dumps [{json_codec.BACKEND}]": best_of(lambda: json_codec.dumps(data), repeat),
+    }
+
+
+@benchmark
+def sentence_cache(repeat: int) -> Dict[str, float]:
+    data = json_codec.load(ESFERA_RESPONSE_PATH)
+    records = [EsferaPartnersList.transform_item(item) for item in data.get("items", [])]
+
+    def analyse_all() -> None:
+        # Legal terms are analysed lazily, on the first read of the points
+        for record in records:
+            PartnerConfig.from_esfera_dict(record).max_points
+
+    def cold() -> None:
+        SENTENCE_CACHE.clear()
+        analyse_all()
+
+    timings = {
+        "analysis, empty sentence cache": best_of(cold, repeat),
+        "analysis, warm sentence cache": best_of(analyse_all, repeat),
+    }
+    print(f"    {SENTENCE_CACHE.report()}")
+    return timings
+
+
+def esfera_memory_stages(tracker: StageMemoryTracker, path: str = ESFERA_RESPONSE_PATH) -> None:
+    """
+    Runs the Esfera sample through every stage, one at a time, under the memory tracker.
+
+    Every store of the sample is watched with min_points 0, so all partners reach the
+    notify stage.
+    """
+    with tracker.stage("fetch"):
+        with open(path, "rb") as f:
+            raw = f.read()
+    with tracker.stage("decode"):
+        data = json_codec.loads(raw)
+    with tracker.stage("extract"):
+        records = [EsferaPartnersList.transform_item(item) for item in data.get("items", [])]
+    with tracker.stage("analyse"):
+        partners = [PartnerConfig.from_esfera_dict(record) for record in records]
+        for partner in partners:
+            partner.max_points  # analysed lazily, on first access
+    with tracker.stage("match"):
+        matcher = WatchlistMatcher([WatchStore(record["partner_name"], record["partner_name"], "2099-12-31", 0)
+                                    for record in records if record["partner_name"]])
+        matched = [partner for partner in partners if matcher.match(partner, "name")]
+    with tracker.stage("notify"):
+        ESFERA_RENDERER.render([{"name": partner.partner_name, "legal_terms": partner.legal_terms, "url": ""}
+                                for partner in matched])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the tracker benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per measurement")
+    parser.add_argument("--memory", action="store_true", help="report per-stage memory instead of timings")
+    args = parser.parse_args()
+
+    if args.memory:
+        tracker = StageMemoryTracker()
+        esfera_memory_stages(tracker)
+        tracker.stop()
+        print(tracker.report())
+        return
+
+    for name in args.names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}', choose from: {', '.join(BENCHMARKS)}")
+        print(name)
+        for label, seconds in BENCHMARKS[name](args.repeat).items():
+            print(f"    {label:<50} {seconds * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
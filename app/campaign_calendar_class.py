@@ -0,0 +1,297 @@
+import bisect
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from .partnersconfig_class import PartnerConfig
+
+# Campaign window as (first day, last day), both inclusive.
+Window = Tuple[date, date]
+
+_FULL_DATE_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{2,4})')
+# "de 1 a 30/04/2023", "de 1º a 30/04/2023"
+_DAY_RANGE_RE = re.compile(r'\bde (\d{1,2})º? a (\d{1,2})/(\d{1,2})/(\d{2,4})')
+# A lone day number before a full date, e.g. "válida de 11 até 13/02/2025"
+_LONE_DAY_RE = re.compile(r' (\d{2}) ')
+
+
+def _to_date(day: str, month: str, year: str) -> Optional[date]:
+    year_value = int(year)
+    if year_value < 100:
+        year_value += 2000
+    try:
+        return date(year_value, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _day_before(end: date, day: int) -> Optional[date]:
+    """
+    Returns the closest date on or before end whose day of month is day.
+    """
+    candidate = end
+    for _ in range(2):
+        try:
+            start = candidate.replace(day=day)
+        except ValueError:
+            start = None
+        if start is not None and start <= end:
+            return start
+        candidate = candidate.replace(day=1) - timedelta(days=1)
+    return None
+
+
+def extract_campaign_window(legal_terms: Optional[str]) -> Optional[Window]:
+    """
+    Extracts the campaign window from legal terms.
+
+    Recognises two full dates ("de 10/02/2025 a 13/02/2025"), a day range ending in
+    a full date ("de 11 a 13/02/2025") and a lone day number followed by a full date.
+    A start day greater than the end day is taken to be in the previous month.
+
+    Args:
+        legal_terms (Optional[str]): Plain-text legal terms.
+
+    Returns:
+        Optional[Window]: (first day, last day), or None if no window was found.
+    """
+    if not legal_terms:
+        return None
+    full_dates = [found for found in (_to_date(*groups) for groups in _FULL_DATE_RE.findall(legal_terms)) if found]
+    if len(full_dates) >= 2:
+        return full_dates[0], full_dates[1]
+    range_match = _DAY_RANGE_RE.search(legal_terms)
+    if range_match:
+        end = _to_date(*range_match.groups()[1:])
+        start = _day_before(end, int(range_match.group(1))) if end else None
+        if start:
+            return start, end
+    if len(full_dates) == 1:
+        lone_day = _LONE_DAY_RE.search(legal_terms)
+        if lone_day:
+            start = _day_before(full_dates[0], int(lone_day.group(1)))
+            if start:
+                return start, full_dates[0]
+    return None
+
+
+class _Node:
+    """
+    Node of a centered interval tree over day ordinals.
+    """
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, intervals: List[Tuple[int, int, str]]) -> None:
+        endpoints = sorted(point for start, end, _ in intervals for point in (start, end))
+        self.center = endpoints[len(endpoints) // 2]
+        left = [interval for interval in intervals if interval[1] < self.center]
+        right = [interval for interval in intervals if interval[0] > self.center]
+        overlapping = [interval for interval in intervals if interval[0] <= self.center <= interval[1]]
+        self.by_start = sorted(overlapping, key=lambda interval: interval[0])
+        self.by_end = sorted(overlapping, key=lambda interval: interval[1], reverse=True)
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+    def query(self, point: int, found: List[str]) -> None:
+        node: Optional[_Node] = self
+        while node is not None:
+            if point < node.center:
+                for start, _, key in node.by_start:
+                    if start > point:
+                        break
+                    found.append(key)
+                node = node.left
+            elif point > node.center:
+                for _, end, key in node.by_end:
+                    if end < point:
+                        break
+                    found.append(key)
+                node = node.right
+            else:
+                found.extend(key for _, _, key in node.by_start)
+                return
+
+
+class CampaignCalendar:
+    """
+    Index of campaign windows.
+
+    Windows are kept in an interval tree (rebuilt lazily after changes) for "active on
+    day D" queries and in sorted start/end lists for "starting/ending within the next
+    N hours" and "starts today" queries, so none of them scan every partner.
+    Keys are strings such as "livelo:CSB".
+    Windows parsed from legal terms are cached per key and only re-parsed when the
+    terms change.
+    """
+    def __init__(self) -> None:
+        self._windows: Dict[str, Window] = {}
+        self._terms: Dict[str, str] = {}
+        self._starts: List[Tuple[date, str]] = []
+        self._ends: List[Tuple[date, str]] = []
+        self._tree: Optional[_Node] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._windows
+
+    def window(self, key: str) -> Optional[Window]:
+        """
+        Returns the window stored for a key, if any.
+        """
+        return self._windows.get(key)
+
+    def add(self, key: str, start: date, end: date) -> None:
+        """
+        Adds or replaces the window of a key.
+        """
+        if start > end:
+            start, end = end, start
+        with self._lock:
+            self._remove(key)
+            self._windows[key] = (start, end)
+            bisect.insort(self._starts, (start, key))
+            bisect.insort(self._ends, (end, key))
+            self._dirty = True
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the window of a key (no-op if it is unknown).
+        """
+        with self._lock:
+            self._remove(key)
+            self._terms.pop(key, None)
+
+    def _remove(self, key: str) -> None:
+        window = self._windows.pop(key, None)
+        if window is None:
+            return
+        start, end = window
+        del self._starts[bisect.bisect_left(self._starts, (start, key))]
+        del self._ends[bisect.bisect_left(self._ends, (end, key))]
+        self._dirty = True
+
+    def track_legal_terms(self, key: str, legal_terms: Optional[str]) -> Optional[Window]:
+        """
+        Stores the window found in a partner's legal terms, parsing them only if they changed.
+
+        Args:
+            key (str): Partner key.
+            legal_terms (Optional[str]): Plain-text legal terms.
+
+        Returns:
+            Optional[Window]: The partner's window, or None if the terms have no dates.
+        """
+        legal_terms = legal_terms or ""
+        if self._terms.get(key) == legal_terms:
+            return self._windows.get(key)
+        window = extract_campaign_window(legal_terms)
+        if window is None:
+            self.remove(key)
+        else:
+            self.add(key, *window)
+        self._terms[key] = legal_terms
+        return window
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        Returns the windows and the legal terms they were parsed from, JSON-serialisable.
+        """
+        with self._lock:
+            windows = [[key, start.isoformat(), end.isoformat()] for key, (start, end) in self._windows.items()]
+            return {"windows": windows, "terms": dict(self._terms)}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """
+        Adds the windows of a checkpoint() to the calendar.
+        """
+        for key, start, end in state["windows"]:
+            self.add(key, date.fromisoformat(start), date.fromisoformat(end))
+        self._terms.update(state["terms"])
+
+    @staticmethod
+    def partner_key(program: str, partner: PartnerConfig) -> str:
+        """
+        Returns the calendar key of a partner, e.g. "livelo:CSB" or "esfera:Amazon".
+        """
+        return f"{program}:{partner.partner_code or partner.partner_name}"
+
+    def track_partner(self, key: str, partner: PartnerConfig) -> Optional[Window]:
+        """
+        Stores an analysed partner's window, using its campaign dates or else its legal terms.
+        """
+        if partner.campaign_from is not None and partner.campaign_to is not None:
+            self.add(key, partner.campaign_from, partner.campaign_to)
+            return self._windows[key]
+        return self.track_legal_terms(key, partner.legal_terms)
+
+    def active_on(self, day: date) -> List[str]:
+        """
+        Returns the keys whose campaign is active on a day.
+        """
+        with self._lock:
+            if self._dirty:
+                intervals = [(start.toordinal(), end.toordinal(), key) for key, (start, end) in self._windows.items()]
+                self._tree = _Node(intervals) if intervals else None
+                self._dirty = False
+            tree = self._tree
+        found: List[str] = []
+        if tree is not None:
+            tree.query(day.toordinal(), found)
+        return found
+
+    @staticmethod
+    def _between(entries: List[Tuple[date, str]], first: date, last: date) -> List[str]:
+        low = bisect.bisect_left(entries, (first,))
+        high = bisect.bisect_left(entries, (last + timedelta(days=1),))
+        return [key for _, key in entries[low:high]]
+
+    def starts_on(self, day: date) -> List[str]:
+        """
+        Returns the keys whose campaign starts on a day.
+        """
+        return self._between(self._starts, day, day)
+
+    def ends_on(self, day: date) -> List[str]:
+        """
+        Returns the keys whose campaign ends on a day.
+        """
+        return self._between(self._ends, day, day)
+
+    def starting_within(self, hours: float, now: Optional[datetime] = None) -> List[str]:
+        """
+        Returns the keys whose campaign starts (at midnight of its first day) in the next hours.
+        """
+        now = now or datetime.now()
+        first = now.date() + timedelta(days=1)
+        last = (now + timedelta(hours=hours)).date()
+        return self._between(self._starts, first, last) if first <= last else []
+
+    def ending_within(self, hours: float, now: Optional[datetime] = None) -> List[str]:
+        """
+        Returns the keys whose campaign ends (at the end of its last day) in the next hours.
+        """
+        now = now or datetime.now()
+        last = (now + timedelta(hours=hours)).date() - timedelta(days=1)
+        return self._between(self._ends, now.date(), last) if now.date() <= last else []
+
+    def next_start_after(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Returns the next campaign start (midnight of its first day) after now, if any.
+        """
+        now = now or datetime.now()
+        position = bisect.bisect_left(self._starts, (now.date() + timedelta(days=1),))
+        if position == len(self._starts):
+            return None
+        return datetime.combine(self._starts[position][0], datetime.min.time())
+
+    def is_boundary_day(self, key: str, day: Optional[date] = None) -> bool:
+        """
+        Returns True if day is the first or the last day of the key's campaign.
+        """
+        window = self._windows.get(key)
+        day = day or date.today()
+        return window is not None and day in window
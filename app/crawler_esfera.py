@@ -1,14 +1,25 @@
 # analisar pagina da livelo para ganho de pontos através de compras
 
-from decimal import Decimal
-from json import JSONDecodeError
 from typing import Type
 from xmlrpc.client import ResponseError
+import argparse
 from datetime import date
 import requests
 import re
 from bs4 import BeautifulSoup
-import json
+from app.services import json_codec
+from app.watchlist_artifact_class import WatchlistArtifact
+from app.notification_renderer_class import ESFERA_RENDERER
+from app.campaign_calendar_class import CampaignCalendar
+from app.sentence_analysis_cache_class import SENTENCE_CACHE
+from app.accumulation_parser import POINTS_SCALE, parse_accumulation, to_fixed
+from app.cycle_profiler_class import add_profile_arguments, profile_from_args
+from app.esfera_structured_fields_class import ESFERA_FIELD_STATS, extract_structured_terms, strip_tags
+from app.sources_class import EsferaTargetedSource
+
+CALENDAR = CampaignCalendar()
+# product ids of the watched partners, learned from the last full listing
+TARGETS_STATE_PATH = "database/esfera_targets.json"
 
 def validate_api_info(responseJSON) -> bool:
     error = []
@@ -31,19 +42,33 @@ def validate_api_info(responseJSON) -> bool:
 
     return
 
+def get_watched_campaigns(desired_stores: dict, full_listing: bool = False) -> list:
+    # refresh only the watched partners by product id; the whole category is listed periodically
+    source = EsferaTargetedSource(lambda item: item.get('seoUrlSlugDerived') in desired_stores,
+                                  state_path=TARGETS_STATE_PATH)
+    if full_listing:
+        source.force_full_listing()
+    list_data = {"items": list(source.fetch())}
+    try:
+        validate_api_info(list_data)
+    except Exception as e:
+        print(e)
+        exit()
+    return list_data['items']
+
 def get_campaigns():
     url_base = "https://www.esfera.com.vc/ccstoreui/v1/products"
     
     params = {'categoryId':'esf02163'}
     try:
-        response = requests.get(url_base, params=params)
+        response = requests.get(url_base, params=params, timeout=(5, 30))
         text = response.text
-        list_data = response.json()
+        list_data = json_codec.loads(response.content)
         
-    except JSONDecodeError:
+    except json_codec.JSONDecodeError:
         print("Erro ao ler JSON, texto retornado. ' "+str(text)+" '")
         exit()
-    except ResponseError:
+    except (ResponseError, requests.RequestException):
         print("Erro ao buscar na url :"+url_base)
         exit()
     
@@ -56,24 +81,26 @@ def get_campaigns():
         exit()
     return list_data['items']
 
-def validate_categories(sentences : list, categories : list, points_desired : Decimal) -> bool:
+# points are compared in fixed-point (hundredths of a point, see accumulation_parser)
+def validate_categories(sentences : list, categories : list, points_desired : int) -> bool:
     valid = False
     index = 0
-    previous_points = Decimal(0)
-    points = Decimal(0)
+    previous_points = 0
+    points = 0
     point_offered = []
     for terms in sentences:
         point_offered = []
         # procurando a pontuação numérica no termo
-        points_in_term = re.findall(r'\d+', terms)
+        points_in_term = SENTENCE_CACHE.analyse(terms).numbers
         #analisa os pontos presentes nos termos das sentencas
         for points in points_in_term:
-            point_offered.append(Decimal(points))
+            points_value = int(points) * POINTS_SCALE
+            point_offered.append(points_value)
             literal_points = str(1)+" ponto"
-            if(Decimal(points) > 1):
+            if(points_value > POINTS_SCALE):
                 literal_points = str(points) + " pontos"
             #print(literal_points)
-            previous_points = Decimal(points)
+            previous_points = points_value
         # em caso de o termo não ter pontuação, irá utilizar a anterior
         if(len(points_in_term) == 0):
             point_offered.append(previous_points)
@@ -97,7 +124,7 @@ def validate_categories(sentences : list, categories : list, points_desired : De
                     subterm_part = [terms]
                 # analisando a presença de categorias e pontuação desejadas no subtermo
                 for part in subterm_part:
-                    if(any(category in part for category in categories)  and point_offered[index] > points_desired):
+                    if(SENTENCE_CACHE.mentions_any(part, categories)  and point_offered[index] > points_desired):
                         valid = True
                         break
                     index = index + 1
@@ -107,12 +134,12 @@ def validate_categories(sentences : list, categories : list, points_desired : De
         else:
             #print(len(point_offered))
             # analisando a presença de categorias e pontuação desejadas no termo
-            if(any(category in terms for category in categories) and point_offered[0] >= points_desired):
+            if(SENTENCE_CACHE.mentions_any(terms, categories) and point_offered[0] >= points_desired):
                 valid = True
                 #print("achou a categoria desejada")
                 break
             # em de não encontrar a categoria específica, verifica a pontuação genérica
-            if 'demais categorias' in terms and point_offered[0] >=  points_desired:
+            if SENTENCE_CACHE.analyse(terms).other_categories and point_offered[0] >=  points_desired:
                 valid = True
                 break
     
@@ -121,7 +148,7 @@ def validate_categories(sentences : list, categories : list, points_desired : De
 # terms = "<p data-renderer-start-pos=\"358\">&bull;&nbsp; &nbsp; Para juntar pontos, acesse o hotsite atrav&eacute;s do bot&atilde;o &ldquo;Ir para o site do parceiro&rdquo;, escolha seus produtos e utilize as op&ccedil;&otilde;es de pagamentos dispon&iacute;veis no site.<br />\n&bull;&nbsp;&nbsp; &nbsp;O ac&uacute;mulo padr&atilde;o &eacute; de 2&nbsp;pontos a cada R$ 1 gasto, podendo ser alterado durante per&iacute;odos promocionais.&nbsp;<strong>Em per&iacute;odos promocionais, o limite de ac&uacute;mulo &eacute; de 200.000 pontos por CPF.</strong><br />\n&bull;&nbsp;&nbsp; &nbsp;O ac&uacute;mulo de pontos s&oacute; &eacute; v&aacute;lido para produtos vendidos e entregues pelo parceiro.</p>\n\n<p>&bull;&nbsp; &nbsp;&nbsp;Compra de Cart&atilde;o Presente (Gift Card/Cart&atilde;o Virtual) atrav&eacute;s do hotsite n&atilde;o ser&aacute; v&aacute;lido para ac&uacute;mulo de pontos.</p>\n\n<p data-renderer-start-pos=\"358\">&bull;&nbsp;&nbsp; &nbsp;O cr&eacute;dito dos pontos Esfera ser&aacute; realizado em 45 dias ap&oacute;s o recebimento do produto e/ou a retirada do produto na loja f&iacute;sica.<br />\n&bull;&nbsp;&nbsp; &nbsp;Os pontos acumulados ser&atilde;o v&aacute;lidos por 24 meses a contar da data do cr&eacute;dito no extrato da conta.<br />\n&bull;&nbsp;&nbsp; &nbsp;A pontua&ccedil;&atilde;o &eacute; v&aacute;lida apenas para compras efetuadas com o CPF do titular do cart&atilde;o de cr&eacute;dito. <strong>O cliente deve ter uma conta ativa na Esfera para receber os pontos.</strong><br />\n&bull;&nbsp;&nbsp; &nbsp;Essa promo&ccedil;&atilde;o n&atilde;o &eacute; cumulativa com outras promo&ccedil;&otilde;es ou com pagamentos efetuados com cupons de desconto, gift cards e vale-compra.</p>\n\n<p>&bull;&nbsp; &nbsp;&nbsp;Todas as op&ccedil;&otilde;es de pagamento dispon&iacute;veis no ato da compra s&atilde;o v&aacute;lidas para esta campanha.<br />\n&bull;&nbsp;&nbsp; &nbsp;Para uma melhor experi&ecirc;ncia e garantia do ac&uacute;mulo de pontos, n&atilde;o feche o hotsite antes de finalizar a compra. Caso voc&ecirc; saia da p&aacute;gina, entre novamente pelo link dispon&iacute;vel no bot&atilde;o &ldquo;Ir para o site do parceiro&rdquo;.<br />\n&bull;&nbsp;&nbsp; &nbsp;Confira o regulamento completo em <a href=\"https://clube.lojasrenner.com.br/b2b/juntecomesfera\">https://clube.lojasrenner.com.br/b2b/juntecomesfera</a></p>"
 
 
-def is_valid_legal_terms(legalTerms : str, points_desired : Decimal, max_amount : Decimal, categories : list) -> bool:
+def is_valid_legal_terms(legalTerms : str, points_desired : int, max_amount : int, categories : list) -> bool:
     valid = False
     # sem termos específicos, se supõe que não pontuação específica por categorias
     if(legalTerms is None):
@@ -130,7 +157,7 @@ def is_valid_legal_terms(legalTerms : str, points_desired : Decimal, max_amount
     # em caso de pontuação condicionada a valor de compra
     if 'compras acima de' in legalTerms:
         terms_part_pricestart = legalTerms.split('compras acima de ')
-        value_start = Decimal(terms_part_pricestart[1].split(" ")[0].replace(",",".").replace("R$",""))
+        value_start = to_fixed(terms_part_pricestart[1].replace(".",""))
         # verifica se o valor mínimo de compras presente nas regras é aceitável
         if(value_start > max_amount):
             return False
@@ -157,7 +184,7 @@ def is_valid_legal_terms(legalTerms : str, points_desired : Decimal, max_amount
     
     return valid    
 
-def check_desiredstores_promotions(desired_stores_config, stores_info) -> list:
+def check_desiredstores_promotions(desired_stores_config, stores_info, structured: bool = False) -> list:
     promotions_found = []
     for store in stores_info:
         if(store['seoUrlSlugDerived'] not in desired_stores_config):
@@ -166,15 +193,24 @@ def check_desiredstores_promotions(desired_stores_config, stores_info) -> list:
         store_dict = dict(store)
         # print(store_dict['esf_accumulationAmount'])
         print(store['seoUrlSlugDerived'])
-        parity_club = Decimal(str(store_dict['esf_accumulationAmount']).replace("Até ","").replace("até ","").replace(" pts","").replace(" pt","").replace("de ","").replace(" a ",""))
-        min_parity = Decimal(config['min_points'])
+        # consistent structured fields give the points per real and the window without parsing the HTML
+        terms = extract_structured_terms(store_dict) if structured else None
+        # "de 2 a 5 pts" -> (200, 500): the best rate of the range is compared
+        accumulation = terms.accumulation if terms is not None else parse_accumulation(store_dict['esf_accumulationAmount'])
+        parity_club = accumulation.max if accumulation is not None else 0
+        min_parity = to_fixed(config['min_points'])
         print(config['min_points'])
-        max_amount = 99999
+        # the numeric rate can never reach the minimum: skip the legal terms altogether
+        if(parity_club < min_parity):
+            continue
+        max_amount = to_fixed(99999)
         if('max_amount' in config):
-            max_amount = Decimal(config['max_amount'])
+            max_amount = to_fixed(config['max_amount'])
 
         legal_terms = ""
-        if(store_dict['esf_accumulationHowItWorks'] is not None):
+        if(terms is not None):
+            legal_terms = strip_tags(store_dict['esf_accumulationHowItWorks'])
+        elif(store_dict['esf_accumulationHowItWorks'] is not None):
             soup = BeautifulSoup(store_dict['esf_accumulationHowItWorks'], "lxml")
             legal_terms = soup.get_text().replace("•","")
         
@@ -182,7 +218,7 @@ def check_desiredstores_promotions(desired_stores_config, stores_info) -> list:
         if('categories' in config):
             categories = config['categories']
 
-        if parity_club >= min_parity and is_valid_legal_terms(legal_terms, min_parity, max_amount, categories) and can_send_notification(legal_terms):
+        if is_valid_legal_terms(legal_terms, min_parity, max_amount, categories) and can_send_notification(legal_terms, store['seoUrlSlugDerived'], terms.campaign if terms is not None else None):
             print("Promoção encontrada para "+str(config['name'])+", verificar produtos disponíveis")
             print("Acessar URL: "+str(store['esf_accumulationTargetURL']))
             print("")
@@ -192,43 +228,24 @@ def check_desiredstores_promotions(desired_stores_config, stores_info) -> list:
 
     return promotions_found
 
-def can_send_notification(legal_terms: str) -> bool:
+def can_send_notification(legal_terms: str, key: str = "", campaign = None) -> bool:
+    if(campaign is not None):
+        # window given by the structured offer dates
+        CALENDAR.add(key or legal_terms, *campaign)
+        return CALENDAR.is_boundary_day(key or legal_terms)
     if(legal_terms == ""):
         return True
-    # extract date(s) in legal terms
-    campaign_dates = re.findall('\d{2}[\/]\d{2}[\/]\d{2,4}', legal_terms)
-    can_send = False
-    if(len(campaign_dates) >= 2):
-        start_date = campaign_dates[0]
-        end_date = campaign_dates[1]
-        current_date = date.today().strftime("%d/%m/%Y")
-        if(str(current_date) == str(start_date) or str(current_date) == str(end_date)):
-            can_send = True
-    else:
-        # achando apenas uma data com formato esperado, irá tentar encontrar apenas o número referente ao dia(dd)
-        start_date = re.findall('[\ ]\d{2}[\ ]', legal_terms)
-        end_date = campaign_dates[0]
-        if(len(start_date) == 0):
-            print("Validade da campanha não fornecida")
-            can_send = False
-        else: 
-            current_day = date.today().strftime("%d")
-            current_date = date.today().strftime("%d/%m/%Y")
-            if(str(start_date[0]).rstrip().lstrip() == str(current_day) or str(current_date) == str(end_date)):
-                can_send = True
-    return can_send
+    # campaign windows are parsed once per partner and kept in the calendar index
+    key = key or legal_terms
+    if(CALENDAR.track_legal_terms(key, legal_terms) is None):
+        print("Validade da campanha não fornecida")
+        return False
+    # notify only on the first and on the last day of the campaign
+    return CALENDAR.is_boundary_day(key)
 
 def send_notification(to:list, campaigns : list):
     # formatando o texto a ser enviado por email
-    texto = "<table align='center'><tr><th><h1>Esfera - "+date.today().strftime("%d/%m/%Y")+"</h1></th></tr>"
-    text_categories = ""
-    for campaign in campaigns:
-        if('categories' not in campaign or len(campaign['categories']) == 0):
-            text_categories = " Sem categoria definida"
-        else:
-            text_categories = ", ".join(campaign['categories'])
-        texto += "<tr><td><strong>"+campaign['name']+"</strong><br/><p>Termos procurados: "+text_categories+"</p><p>"+campaign['legal_terms']+"</p><p>URL de acesso: "+campaign['url']+"</p><br/></td><tr/>"
-    texto += "</table>"
+    texto = ESFERA_RENDERER.render(campaigns)
     # sendinblue request information
     url = 'https://api.sendinblue.com/v3/smtp/email'
     key = "{your-key}"
@@ -240,7 +257,7 @@ def send_notification(to:list, campaigns : list):
         "htmlContent":texto
     }
     try:
-        sib_request = requests.post(url, json=payload, headers=headers)
+        sib_request = requests.post(url, json=payload, headers=headers, timeout=30)
     except ResponseError:
         print("Erro de resposta")
     except:
@@ -250,18 +267,44 @@ def send_notification(to:list, campaigns : list):
 
 # categories => livros; casa, mesa e banho; eletrodomésticos; eletroportáteis/portáteis; masculino; feminino; brinquedos; telefonia
 # lista de desejos
-file_data = open("database/esfera.json")
-desired_stores = json.load(file_data)
+def run(targeted: bool = False, full_listing: bool = False, structured: bool = False):
+    """
+    Executa um ciclo do crawler.
+    """
+    desired_stores = WatchlistArtifact.load_or_compile("database/esfera.json").as_config()
+
+    today = date.today()
+    print(today.strftime("%d/%m/%Y"))
+    if targeted:
+        available_campaigns = get_watched_campaigns(desired_stores, full_listing)
+    else:
+        available_campaigns = get_campaigns()
+    list_found = check_desiredstores_promotions(desired_stores, available_campaigns, structured)
+    print(SENTENCE_CACHE.report())
+    if structured:
+        print(ESFERA_FIELD_STATS.report())
+    count_stores = len(list_found)
+    send_to = []
+    if(count_stores == 0):
+        print("Nenhuma promoção encontrada!")
+    else:
+        send_to.append({"email":"{your-email}","name":"{ your-name }"})
+        print(str(count_stores)+" encontrados e serão incluídas na notificação")
+        send_notification(send_to, list_found)
+
+def main():
+    """
+    Função principal que orquestra a execução do crawler.
+    """
+    parser = argparse.ArgumentParser(description="Crawler Esfera")
+    parser.add_argument("--targeted", action="store_true", help="consulta apenas os parceiros monitorados por id")
+    parser.add_argument("--full-listing", action="store_true", help="força a listagem completa da categoria")
+    parser.add_argument("--structured-fields", action="store_true",
+                        help="usa os campos estruturados (pontos e datas da oferta) quando consistentes")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profile_from_args(args):
+        run(args.targeted, args.full_listing, args.structured_fields)
 
-today = date.today()
-print(today.strftime("%d/%m/%Y"))
-available_campaigns = get_campaigns()
-list_found = check_desiredstores_promotions(desired_stores, available_campaigns)
-count_stores = len(list_found)
-send_to = []
-if(count_stores == 0):
-    print("Nenhuma promoção encontrada!")
-else:
-    send_to.append({"email":"{your-email}","name":"{ your-name }"})
-    print(str(count_stores)+" encontrados e serão incluídas na notificação")
-    send_notification(send_to, list_found)
+if __name__ == "__main__":
+    main()
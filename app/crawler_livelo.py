@@ -1,16 +1,25 @@
 # analisar pagina da livelo para ganho de pontos através de compras
-from decimal import Decimal
-from json import JSONDecodeError
 from xmlrpc.client import ResponseError
+import argparse
 from datetime import date
 import requests
 import logging
+import os
 import re
 from bs4 import BeautifulSoup
-import json
+from app.services import json_codec
+from app.watchlist_artifact_class import WatchlistArtifact
+from app.campaign_calendar_class import CampaignCalendar
+from app.sentence_analysis_cache_class import SENTENCE_CACHE
+from app.accumulation_parser import POINTS_SCALE, to_fixed
+from app.sources_class import LiveloSource, LIVELO_PARITIES_ENDPOINT
+from app.notification_renderer_class import LIVELO_RENDERER
+from app.cycle_profiler_class import add_profile_arguments, profile_from_args
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+CALENDAR = CampaignCalendar()
+
 def validate_api_info(responseJSON) -> bool:
     error = []
     if(not isinstance(responseJSON,list)):
@@ -27,23 +36,17 @@ def validate_api_info(responseJSON) -> bool:
 
     return
 
-def get_campaigns(partners: str) -> list:
-    url_base = "https://apis.pontoslivelo.com.br/api-bff-partners-parities/v1/parities/active"
-    params = {'partnersCodes': partners}
-    try:
-        response = requests.get(url_base, params=params)
-        text = response.text
-        list_data = response.json()
-    except JSONDecodeError:
-        print("JSON text error: ' "+str(text)+" '")
-        exit()
-    except ResponseError:
-        print("URL error: "+url_base)
-        exit()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Erro na requisição para {url_base}: {e}")
-        raise
-    
+def get_campaigns(partners: str, workers: int = 4) -> list:
+    # codes are requested in concurrent chunks to stay below URL-length limits
+    source = LiveloSource(partners.split(","), max_workers=workers)
+    list_data = list(source.fetch())
+    # the client turns failed requests into empty chunks: never notify on a partial parity list
+    if not source.complete:
+        failed = sum(stat.failed for stat in source.chunk_stats)
+        message = f"{failed} de {len(source.chunk_stats)} requisições para {LIVELO_PARITIES_ENDPOINT} falharam"
+        logging.error(f"Erro na requisição: {message}")
+        raise requests.exceptions.RequestException(message)
+
     try:
         validate_api_info(list_data)
     except TypeError:
@@ -56,27 +59,29 @@ def get_campaigns(partners: str) -> list:
 
 # Ex: "Ganhe 4 pontos por real gasto na categoria de brinquedos e jogos e 1 ponto por real nas demais categorias para produtos vendidos e entregues por Amazon."
 # terms = [":1"," por real"]
-def validate_categories(sentences : list, categories : list, points_desired : Decimal) -> bool:
+# points are compared in fixed-point (hundredths of a point, see accumulation_parser)
+def validate_categories(sentences : list, categories : list, points_desired : int) -> bool:
     valid = False
     index = 0
-    previous_points = Decimal(0)
-    points = Decimal(0)
+    previous_points = 0
+    points = 0
     point_offered = []
     for terms in sentences:
         point_offered = []
         # check for numbers in terms
-        points_in_term = re.findall(r'\d+', terms)
+        points_in_term = SENTENCE_CACHE.analyse(terms).numbers
 
         # check the points provided in terms
         for points in points_in_term:
-            point_offered.append(Decimal(points))
+            points_value = int(points) * POINTS_SCALE
+            point_offered.append(points_value)
             literal_points = str(1)+" ponto"
 
-            if(Decimal(points) > 1):
+            if(points_value > POINTS_SCALE):
                 literal_points = str(points) + " pontos"
 
             print(literal_points)
-            previous_points = Decimal(points)
+            previous_points = points_value
 
         # if doesn't have points in term, use the previous value
         if(len(points_in_term) == 0):
@@ -99,10 +104,10 @@ def validate_categories(sentences : list, categories : list, points_desired : De
             subterm_part = [terms[:points_term_pos.start()],terms[points_term_pos.start():]]
             # check presence of categories and desired points on subterms
             for part in subterm_part:
-                if(any(category in part for category in categories)  and point_offered[index] >= points_desired):
+                if(SENTENCE_CACHE.mentions_any(part, categories)  and point_offered[index] >= points_desired):
                     valid = True
                     break
-                if 'demais categorias' in terms and point_offered[len(point_offered)-1] >=  points_desired:
+                if SENTENCE_CACHE.analyse(terms).other_categories and point_offered[len(point_offered)-1] >=  points_desired:
                     valid = True
                     break
                 index = index + 1
@@ -111,13 +116,13 @@ def validate_categories(sentences : list, categories : list, points_desired : De
                 break
         else:
             # check for categories and points in term
-            if(any(category in terms for category in categories) and point_offered[0] >= points_desired):
+            if(SENTENCE_CACHE.mentions_any(terms, categories) and point_offered[0] >= points_desired):
                 valid = True
                 print("category found")
                 break
             
             # if no category was found, get the stardard points
-            if ('demais categorias' in terms) and (len(point_offered) == 1 and point_offered[0] >=  points_desired):
+            if (SENTENCE_CACHE.analyse(terms).other_categories) and (len(point_offered) == 1 and point_offered[0] >=  points_desired):
                 valid = True
                 print(terms+" found categories")
                 break
@@ -126,7 +131,7 @@ def validate_categories(sentences : list, categories : list, points_desired : De
     return valid
 
 
-def is_valid_legal_terms(legalTerms : str, points_desired : Decimal, max_amount : Decimal, categories : list) -> bool:
+def is_valid_legal_terms(legalTerms : str, points_desired : int, max_amount : int, categories : list) -> bool:
     is_valid = False
     # no specific points by categories 
     if(legalTerms is None):
@@ -138,7 +143,7 @@ def is_valid_legal_terms(legalTerms : str, points_desired : Decimal, max_amount
     # if has mininum price to earn points with specific text
     if 'compras acima de' in legalTerms:
         terms_part_pricestart = legalTerms.split('compras acima de ')
-        value_start = Decimal(terms_part_pricestart[1].split(" ")[0].replace(",",".").replace("R$",""))
+        value_start = to_fixed(terms_part_pricestart[1].replace(".",""))
         
         # check if minimum price is acceptable
         if(value_start > max_amount):
@@ -173,11 +178,15 @@ def check_desiredstores_promotions(desired_stores_config : dict, stores_info : l
     for store in stores_info:
         config = dict(desired_stores_config[store['partnerCode']])
         store_dict = dict(store)
-        parity_club = Decimal(store_dict['parityClub'])
-        min_parity = Decimal(config['min_points'])
-        max_amount = 99999
+        parity_club = to_fixed(store_dict['parityClub'])
+        min_parity = to_fixed(config['min_points'])
+        print("Observing "+str(config['name']) + " - "+str(store_dict['parityClub'])+" - "+str(config['min_points']))
+        # the numeric rate can never reach the minimum: skip the legal terms altogether
+        if(parity_club < min_parity):
+            continue
+        max_amount = to_fixed(99999)
         if('max_amount' in config):
-            max_amount = Decimal(config['max_amount'])
+            max_amount = to_fixed(config['max_amount'])
 
         legal_terms = ""
         if(store_dict['legalTerms'] is not None):
@@ -186,8 +195,7 @@ def check_desiredstores_promotions(desired_stores_config : dict, stores_info : l
         categories = []
         if('categories' in config):
             categories = config['categories']
-        print("Observing "+str(config['name']) + " - "+str(parity_club)+" - "+str(min_parity))
-        if parity_club >= min_parity and is_valid_legal_terms(legal_terms, min_parity, max_amount, categories) and can_send_notification(legal_terms):
+        if is_valid_legal_terms(legal_terms, min_parity, max_amount, categories) and can_send_notification(legal_terms, store_dict['partnerCode']):
             print("Promoção encontrada para "+str(config['name']))
             campaign_url = url_base+str(config['name']).lower().replace(" ","")
             print("Acessar URL: "+campaign_url)
@@ -199,48 +207,20 @@ def check_desiredstores_promotions(desired_stores_config : dict, stores_info : l
     
     return promotions_found
 
-def can_send_notification(legal_terms: str) -> bool:
+def can_send_notification(legal_terms: str, key: str = "") -> bool:
     if(legal_terms == ""):
         return True
-    # extract date(s) in legal terms
-    campaign_dates = re.findall('\d{2}[\/]\d{2}[\/]\d{2,4}', legal_terms)
-    can_send = False
-    if(len(campaign_dates) == 2):
-        start_date = campaign_dates[0]
-        end_date = campaign_dates[1]
-        current_date = date.today().strftime("%d/%m/%Y")
-        if(str(current_date) == str(start_date) or str(current_date) == str(end_date)):
-            can_send = True
-    else:
-        # if has only one date with correct format, it will check fo additional number for day (dd)
-        start_date = re.findall('[\ ]\d{2}[\ ]', legal_terms)
-        end_date = campaign_dates[0]
-        if(len(start_date) == 0):
-            print("Campaign is lacking dates")
-            can_send = False
-        else: 
-            current_day = date.today().strftime("%d")
-            current_date = date.today().strftime("%d/%m/%Y")
-            if(str(start_date[0]).rstrip().lstrip() == str(current_day) or str(current_date) == str(end_date)):
-                can_send = True
-    return can_send
+    # campaign windows are parsed once per partner and kept in the calendar index
+    key = key or legal_terms
+    if(CALENDAR.track_legal_terms(key, legal_terms) is None):
+        print("Campaign is lacking dates")
+        return False
+    # notify only on the first and on the last day of the campaign
+    return CALENDAR.is_boundary_day(key)
 
 def send_notification(to:list, campaigns : list):
     # formatting text for email
-    texto = "<table align='center'><tr><th><h1>Livelo - "+date.today().strftime("%d/%m/%Y")+"</h1></th></tr>"
-    text_categories = ""
-    for campaign in campaigns:
-        if('categories' not in campaign or len(campaign['categories']) == 0):
-            text_categories = " No category"
-        else:
-            text_categories = ", ".join(campaign['categories'])
-        
-        text_lines = str(campaign['legal_terms']).split(". ")
-        desired_points = campaign['min_points']
-        full_terms = ".<br/>".join(text_lines)
-        texto += "<tr><td><strong>"+campaign['name']+"</strong><br/><p>Search Terms: "+text_categories+"</p><p>Minimum amount of points: "+str(desired_points)+"</p><p>"+full_terms+"</p><p>URL Access: "+campaign['url']+"</p></td><tr/>"
-
-    texto += "</table>"
+    texto = LIVELO_RENDERER.render(campaigns)
     # sendinblue request information
     url = 'https://api.sendinblue.com/v3/smtp/email'
     key = "{ you-key }"
@@ -252,7 +232,7 @@ def send_notification(to:list, campaigns : list):
         "htmlContent":texto
     }
     try:
-        sib_request = requests.post(url, json=payload, headers=headers)
+        sib_request = requests.post(url, json=payload, headers=headers, timeout=30)
         print(sib_request.json())
     except ResponseError:
         print("API Error")
@@ -267,23 +247,34 @@ def main():
     """
     Função principal que orquestra a execução do crawler.
     """
+    parser = argparse.ArgumentParser(description="Crawler Livelo")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests to the Livelo API")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profile_from_args(args):
+        run(args.workers)
+
+def run(workers: int = 4):
+    """
+    Executa um ciclo do crawler.
+    """
     logging.info(date.today().strftime("%d/%m/%Y"))
     # Lê o arquivo de configuração com as lojas desejadas
     try:
-        with open("database/livelo.json") as file_data:
-            desired_stores = json.load(file_data)
-    except (IOError, JSONDecodeError) as e:
+        desired_stores = WatchlistArtifact.load_or_compile("database/livelo.json").as_config()
+    except (IOError, json_codec.JSONDecodeError) as e:
         logging.error(f"Erro ao abrir ou interpretar o arquivo JSON: {e}")
         return
     stores_key_arr = ",".join(desired_stores.keys())
     
     try:
-        available_campaigns = get_campaigns(stores_key_arr)
+        available_campaigns = get_campaigns(stores_key_arr, workers)
     except Exception as e:
         logging.error(f"Erro ao obter campanhas: {e}")
         return
     print(available_campaigns)
     list_found = check_desiredstores_promotions(desired_stores, available_campaigns)
+    logging.info(SENTENCE_CACHE.report())
     count_stores = len(list_found)
     send_to = []
     if count_stores == 0:
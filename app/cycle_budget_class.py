@@ -0,0 +1,300 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from .partnersconfig_class import PartnerConfig
+from .services import json_codec
+
+# Sentinel put on the queue when the wrapped fetch has finished.
+_DONE = object()
+
+
+class StaleItem(dict):
+    """
+    A raw item (or normalised record) served from the last good cache instead of the live API.
+    """
+
+
+class SourceReport(NamedTuple):
+    """
+    Outcome of one source in a budgeted cycle.
+
+    status is "fresh" when the live fetch completed, "stale" when cached items were
+    used to fill in for a fetch that failed, lost some of its requests or ran out of
+    time, "partial" when some requests failed and nothing cached was missing, and
+    "failed" when nothing was fetched nor cached.
+    """
+    program: str
+    status: str
+    live_items: int
+    stale_items: int
+    seconds: float
+    reason: str
+
+
+class LastGoodCache:
+    """
+    Last complete set of raw items fetched from each source.
+
+    Kept in memory and, if a directory is given, in one JSON file per program so
+    that a restarted process can still fall back on it.
+    """
+    def __init__(self, directory: Optional[str] = None) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            directory (Optional[str]): Directory for the cache files; memory only if omitted.
+        """
+        self.directory = directory
+        self._items: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _path(self, program: str) -> str:
+        return os.path.join(self.directory, f"{program}.json")
+
+    def get(self, program: str) -> List[Dict[str, Any]]:
+        """
+        Returns the last good items of a program (empty if none are known).
+        """
+        if program not in self._items and self.directory and os.path.exists(self._path(program)):
+            try:
+                self._items[program] = json_codec.load(self._path(program))
+            except (OSError, json_codec.JSONDecodeError) as e:
+                logging.warning(f"Ignoring last good cache of {program}: {e}")
+        return self._items.get(program, [])
+
+    def put(self, program: str, items: List[Dict[str, Any]]) -> None:
+        """
+        Replaces the last good items of a program.
+        """
+        self._items[program] = items
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            json_codec.dump(items, self._path(program))
+
+
+def _item_key(item: Dict[str, Any]) -> Tuple[Any, Any]:
+    # Livelo items are identified by partner code, Esfera catalogue items by product id.
+    return item.get("partnerCode"), item.get("id")
+
+
+class BudgetedSource:
+    """
+    Wraps a pipeline source so that its fetch stops at the fetch deadline.
+
+    The wrapped fetch runs in its own thread. If it raises, returns nothing or is
+    still running at the deadline, it is abandoned (the thread stops at its next
+    item; requests in flight are bounded by the client timeout) and the items of
+    the last good fetch that were not yet yielded are served instead, marked stale.
+    Partners built from them have ``stale`` set. A fetch that finishes with its
+    source's ``complete`` flag unset (some requests failed) is filled in the same
+    way and does not replace the last good fetch.
+    """
+    def __init__(self, source: Any, budget: "CycleBudget") -> None:
+        self.source = source
+        self.budget = budget
+        self.program = source.program
+        self.match_field = source.match_field
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.source, name)
+
+    def _produce(self, outbox: "queue.Queue[Any]", abandoned: threading.Event) -> None:
+        def put(item: Any) -> bool:
+            while not abandoned.is_set():
+                try:
+                    outbox.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        items = self.source.fetch()
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        finally:
+            # Closing the generator cancels the requests it has not started yet.
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+        put(_DONE)
+
+    def fetch(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the live items until the deadline, then the missing ones from the last good fetch.
+        """
+        start = time.monotonic()
+        inbox: "queue.Queue[Any]" = queue.Queue(maxsize=256)
+        abandoned = threading.Event()
+        threading.Thread(target=self._produce, args=(inbox, abandoned), daemon=True,
+                         name=f"budgeted-{self.program}").start()
+        live: List[Dict[str, Any]] = []
+        reason = ""
+        try:
+            while True:
+                remaining = self.budget.fetch_deadline - time.monotonic()
+                try:
+                    item = inbox.get(timeout=max(0.0, remaining))
+                except queue.Empty:
+                    reason = f"fetch exceeded its {self.budget.fetch_seconds:.0f}s slice"
+                    break
+                if item is _DONE:
+                    if not live:
+                        reason = "no items returned"
+                    elif not getattr(self.source, "complete", True):
+                        # The client turns failed requests into empty responses: the fetch is partial.
+                        reason = "some requests failed"
+                    break
+                if isinstance(item, Exception):
+                    reason = f"fetch failed: {item}"
+                    break
+                live.append(item)
+                yield item
+        finally:
+            abandoned.set()
+        if not reason:
+            self.budget.cache.put(self.program, live)
+            self.budget.record(SourceReport(self.program, "fresh", len(live), 0, time.monotonic() - start, ""))
+            return
+        seen: Set[Tuple[Any, Any]] = {_item_key(item) for item in live}
+        stale = [StaleItem(item) for item in self.budget.cache.get(self.program) if _item_key(item) not in seen]
+        status = "stale" if stale else "partial" if live else "failed"
+        self.budget.record(SourceReport(self.program, status, len(live), len(stale), time.monotonic() - start,
+                                        reason))
+        logging.warning(f"{self.program}: {reason}; serving {len(stale)} items from the last good fetch")
+        yield from stale
+
+    def normalise(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Normalises an item with the wrapped source, keeping the stale mark.
+        """
+        record = self.source.normalise(item)
+        if record is not None and isinstance(item, StaleItem):
+            record = StaleItem(record)
+        return record
+
+    def analyse(self, record: Dict[str, Any]) -> PartnerConfig:
+        """
+        Analyses a record with the wrapped source and marks partners built from cached items.
+        """
+        partner = self.source.analyse(record)
+        partner.stale = isinstance(record, StaleItem)
+        return partner
+
+
+class CycleBudget:
+    """
+    Overall time budget of a crawl cycle.
+
+    The cycle deadline is start + seconds. Fetching gets the first fetch_share of
+    the budget: every source fetch (they run concurrently) must finish by the fetch
+    deadline or falls back on the last good cache. The remaining time is left for
+    analysing, matching and notifying.
+    """
+    def __init__(self, seconds: float = 600, fetch_share: float = 0.6,
+                 cache: Optional[LastGoodCache] = None) -> None:
+        """
+        Initializes the budget.
+
+        Args:
+            seconds (float): Time allowed for the whole cycle.
+            fetch_share (float): Share of the budget given to fetching (0-1).
+            cache (Optional[LastGoodCache]): Last good items per source; memory only if omitted.
+        """
+        if not 0 < fetch_share <= 1:
+            raise ValueError("fetch_share must be in (0, 1]")
+        self.seconds = seconds
+        self.fetch_share = fetch_share
+        self.cache = cache or LastGoodCache()
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.reports: List[SourceReport] = []
+        self._lock = threading.Lock()
+
+    @property
+    def fetch_seconds(self) -> float:
+        """
+        Returns the time slice given to fetching.
+        """
+        return self.seconds * self.fetch_share
+
+    @property
+    def fetch_deadline(self) -> float:
+        """
+        Returns the monotonic time by which every source fetch must have finished.
+        """
+        return self.started + self.fetch_seconds
+
+    @property
+    def deadline(self) -> float:
+        """
+        Returns the monotonic time by which the whole cycle should have finished.
+        """
+        return self.started + self.seconds
+
+    def start(self) -> None:
+        """
+        Starts the clock for a new cycle and clears the previous report.
+        """
+        self.started = time.monotonic()
+        self.finished = None
+        self.reports = []
+
+    def finish(self) -> None:
+        """
+        Stops the clock; logs a warning if the cycle ran over its budget.
+        """
+        self.finished = time.monotonic()
+        if self.over_budget:
+            logging.warning(f"Cycle took {self.elapsed:.1f}s, over its {self.seconds:.0f}s budget")
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Returns the seconds spent in the current (or last finished) cycle.
+        """
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def over_budget(self) -> bool:
+        """
+        Returns True if the cycle has taken longer than its budget.
+        """
+        return self.elapsed > self.seconds
+
+    def wrap(self, source: Any) -> BudgetedSource:
+        """
+        Returns the source wrapped so that its fetch respects the fetch deadline.
+        """
+        return BudgetedSource(source, self)
+
+    def record(self, report: SourceReport) -> None:
+        """
+        Adds the outcome of a source to the cycle report (called by BudgetedSource).
+        """
+        with self._lock:
+            self.reports.append(report)
+
+    def stale_sources(self) -> List[str]:
+        """
+        Returns the programs whose items came (partly) from the last good cache or are missing.
+        """
+        return [report.program for report in self.reports if report.status != "fresh"]
+
+    def report(self) -> str:
+        """
+        Returns a one-line summary of the cycle: elapsed time and the status of every source.
+        """
+        sources = "; ".join(
+            f"{report.program} {report.status} ({report.live_items} live"
+            + (f", {report.stale_items} stale: {report.reason}" if report.status != "fresh" else "")
+            + f", {report.seconds:.1f}s)"
+            for report in self.reports)
+        return f"cycle budget: {self.elapsed:.1f}s of {self.seconds:.0f}s; {sources or 'no sources'}"
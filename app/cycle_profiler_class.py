@@ -0,0 +1,242 @@
+import argparse
+import collections
+import contextlib
+import cProfile
+import importlib
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from typing import Any, Callable, ContextManager, Counter, Dict, Optional, Set, Tuple
+
+# Stages that can be profiled on their own, by alias or by their Class.method suffix.
+STAGES = {
+    "fetch": "app.services.restapi_class:RestApiClient.get",
+    "extract": "app.esfera_partners_list:EsferaPartnersList.extract_data",
+    "transform": "app.esfera_partners_list:EsferaPartnersList.transform_item",
+    "analyse": "app.partnersconfig_class:PartnerConfig.analyze_legal_terms_for_points",
+    "match": "app.watchlist_matcher_class:WatchlistMatcher.match",
+    "render": "app.notification_renderer_class:NotificationRenderer.render",
+}
+
+
+def resolve_stage(spec: str) -> Tuple[Any, str]:
+    """
+    Resolves a stage to the class (or module) and attribute to wrap.
+
+    Args:
+        spec (str): An alias from STAGES, a "module:Class.method" path, or the
+            "Class.method" suffix of a STAGES entry (e.g. "PartnerConfig.analyze_legal_terms_for_points").
+
+    Returns:
+        Tuple[Any, str]: The owner object and the attribute name.
+
+    Raises:
+        ValueError: If the stage cannot be resolved.
+    """
+    path = STAGES.get(spec)
+    if path is None and ":" in spec:
+        path = spec
+    if path is None:
+        path = next((value for value in STAGES.values() if value.endswith(":" + spec)), None)
+    if path is None:
+        raise ValueError(f"unknown stage '{spec}', use one of {', '.join(STAGES)} or module:Class.method")
+    module_name, _, qualname = path.partition(":")
+    owner: Any = importlib.import_module(module_name)
+    *parents, attribute = qualname.split(".")
+    for parent in parents:
+        owner = getattr(owner, parent)
+    if not hasattr(owner, attribute):
+        raise ValueError(f"{path} does not exist")
+    return owner, attribute
+
+
+class CycleProfiler:
+    """
+    Profiles a crawl cycle and writes the result to a file.
+
+    Two modes are available:
+        cprofile  deterministic profile of every thread, written as a pstats file
+                  (snakeviz, gprof2dot, pstats)
+        sample    samples the stacks of every thread at a fixed interval and writes
+                  them in the collapsed format read by flamegraph.pl and speedscope
+
+    With a stage, only the time spent inside that function (in any thread) is
+    profiled. Nothing is installed unless the profiler is started, so the entry
+    points pay no cost when profiling is off.
+
+    A thread can only disable its own cProfile. The other threads' profiles use a
+    clock that checks the stop flag, so each thread stops profiling itself at its
+    first event after stop() (an idle pool thread, when it runs its next task).
+    Profiles that may still be running are left out of the output.
+    """
+    def __init__(self, output: str, mode: str = "cprofile", stage: Optional[str] = None,
+                 interval: float = 0.005) -> None:
+        """
+        Initializes the profiler.
+
+        Args:
+            output (str): File the profile is written to.
+            mode (str): "cprofile" or "sample".
+            stage (Optional[str]): Only profile this function (see resolve_stage).
+            interval (float): Seconds between samples in sample mode.
+        """
+        if mode not in ("cprofile", "sample"):
+            raise ValueError(f"unknown profile mode '{mode}'")
+        self.output = output
+        self.mode = mode
+        self.stage = stage
+        self.interval = interval
+        self.samples: Counter[str] = collections.Counter()
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._depth: Dict[int, int] = {}
+        self._detached: Set[int] = set()
+        self._patched: Optional[Tuple[Any, str, Any]] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def __enter__(self) -> "CycleProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _thread_profile(self, clock: Optional[Callable[[], float]] = None) -> cProfile.Profile:
+        ident = threading.get_ident()
+        profile = self._profiles.get(ident)
+        if profile is None:
+            profile = self._profiles[ident] = cProfile.Profile(clock) if clock else cProfile.Profile()
+        return profile
+
+    def _thread_clock(self) -> float:
+        # Called by the thread's profile on every event: detaches it once profiling has stopped.
+        if self._stop.is_set():
+            sys.setprofile(None)
+            self._detached.add(threading.get_ident())
+        return time.perf_counter()
+
+    def _bootstrap_thread(self, frame: Any, event: str, arg: Any) -> None:
+        # Installed by threading.setprofile: replaces itself with the thread's own profile.
+        sys.setprofile(None)
+        self._thread_profile(self._thread_clock).enable()
+
+    def _wrap_stage(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        def profiled_stage(*args: Any, **kwargs: Any) -> Any:
+            ident = threading.get_ident()
+            depth = self._depth.get(ident, 0)
+            self._depth[ident] = depth + 1
+            if depth == 0 and self.mode == "cprofile":
+                self._thread_profile().enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth[ident] = depth
+                if depth == 0 and self.mode == "cprofile":
+                    self._thread_profile().disable()
+        return profiled_stage
+
+    def _patch_stage(self) -> None:
+        owner, attribute = resolve_stage(self.stage)
+        original = vars(owner).get(attribute, getattr(owner, attribute))
+        if isinstance(original, staticmethod):
+            replacement: Any = staticmethod(self._wrap_stage(original.__func__))
+        elif isinstance(original, classmethod):
+            replacement = classmethod(self._wrap_stage(original.__func__))
+        else:
+            replacement = self._wrap_stage(original)
+        setattr(owner, attribute, replacement)
+        self._patched = (owner, attribute, original)
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.stage and not self._depth.get(ident)):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        """
+        Starts profiling.
+        """
+        self._stop.clear()
+        if self.stage:
+            self._patch_stage()
+        if self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+        elif not self.stage:
+            threading.setprofile(self._bootstrap_thread)
+            self._thread_profile().enable()
+
+    def stop(self) -> None:
+        """
+        Stops profiling and writes the output file.
+        """
+        self._stop.set()
+        if self.mode == "sample" and self._sampler is not None:
+            self._sampler.join()
+        elif not self.stage:
+            threading.setprofile(None)
+            self._thread_profile().disable()
+        if self._patched is not None:
+            owner, attribute, original = self._patched
+            setattr(owner, attribute, original)
+            self._patched = None
+        self.write()
+
+    def write(self) -> None:
+        """
+        Writes the collected profile to the output file.
+        """
+        if self.mode == "sample":
+            with open(self.output, "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            return
+        stats = pstats.Stats()
+        current = threading.get_ident()
+        alive = {thread.ident for thread in threading.enumerate()}
+        skipped = 0
+        for ident, profile in list(self._profiles.items()):
+            running = self._depth.get(ident, 0) > 0 if self.stage else ident not in self._detached
+            if ident != current and ident in alive and running:
+                # Reading a profile while its thread updates it is not safe.
+                skipped += 1
+                continue
+            profile.create_stats()
+            # Threads that never reached the stage have empty profiles.
+            if profile.stats:
+                stats.add(profile)
+        if skipped:
+            logging.warning(f"Profile of {skipped} threads still running left out of {self.output}")
+        stats.dump_stats(self.output)
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the --profile options to an entry point's argument parser.
+    """
+    parser.add_argument("--profile", metavar="FILE", help="profile one cycle and write the result to FILE")
+    parser.add_argument("--profile-mode", choices=("cprofile", "sample"), default="cprofile",
+                        help="cprofile writes a pstats file, sample writes collapsed stacks for flame graphs")
+    parser.add_argument("--profile-stage", metavar="STAGE",
+                        help=f"only profile this function ({', '.join(STAGES)} or module:Class.method)")
+    parser.add_argument("--profile-interval", type=float, default=0.005, help="seconds between samples")
+
+
+def profile_from_args(args: argparse.Namespace) -> ContextManager[Any]:
+    """
+    Returns the profiler requested on the command line, or a no-op context if --profile was not given.
+    """
+    if not args.profile:
+        return contextlib.nullcontext()
+    return CycleProfiler(args.profile, args.profile_mode, args.profile_stage, args.profile_interval)
@@ -0,0 +1,265 @@
+import logging
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+from .partnersconfig_class import PartnerConfig
+from .pipeline_class import Pipeline
+from .response_archive_class import ArchiveEntry, ArchiveReader, ResponseArchive
+from .services import json_codec
+from .watchlist_matcher_class import WatchlistMatcher
+from .watchstore_class import WatchStore
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def response_items(data: Any) -> List[Dict[str, Any]]:
+    """
+    Returns the partner items of a decoded response (a Livelo list or an Esfera page).
+    """
+    if isinstance(data, dict):
+        return data.get("items") or []
+    return data if isinstance(data, list) else []
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Returns the peak resident memory of the process so far, in bytes (None if unknown).
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ReplaySource:
+    """
+    Source that serves a recorded cycle's responses instead of calling the API.
+
+    Responses are yielded in the order they were received. With a speed-up, each
+    one is held back until its recorded arrival time (counted from the first
+    request of the cycle) divided by the speed-up, so upstream latency is part
+    of the replay; with speed-up 0 they are served at once. Normalising and
+    analysing are delegated to the live source, so the code under test is the
+    current build's.
+    """
+    def __init__(self, source: Any, reader: ArchiveReader, origin: float, speedup: float = 0.0) -> None:
+        """
+        Initializes the replay source.
+
+        Args:
+            source (Any): Live source whose program's responses are replayed.
+            reader (ArchiveReader): Recorded cycle.
+            origin (float): Unix time of the cycle's first recorded request.
+            speedup (float): Replay speed relative to the recording (0 serves responses without waiting).
+        """
+        self.source = source
+        self.program = source.program
+        self.match_field = source.match_field
+        self.reader = reader
+        self.origin = origin
+        self.speedup = speedup
+        self.entries: List[ArchiveEntry] = sorted(reader.find(self.program),
+                                                  key=lambda entry: entry.started + entry.elapsed)
+        self.failed = 0
+
+    def _wait(self, entry: ArchiveEntry, clock: float) -> None:
+        if not self.speedup or not entry.started:
+            return
+        due = (entry.started + entry.elapsed - self.origin) / self.speedup
+        delay = due - (time.perf_counter() - clock)
+        if delay > 0:
+            time.sleep(delay)
+
+    def fetch(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the items of the recorded responses.
+        """
+        clock = time.perf_counter()
+        for entry in self.entries:
+            self._wait(entry, clock)
+            if not 200 <= entry.status < 400:
+                self.failed += 1
+                continue
+            try:
+                data = json_codec.loads(self.reader.read_entry(entry))
+            except (ValueError, json_codec.JSONDecodeError) as e:
+                logging.warning(f"Skipping recorded {self.program} response {entry.key}: {e}")
+                self.failed += 1
+                continue
+            yield from response_items(data)
+
+    def normalise(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Normalises an item with the live source.
+        """
+        return self.source.normalise(item)
+
+    def analyse(self, record: Dict[str, Any]) -> PartnerConfig:
+        """
+        Analyses a record with the live source.
+        """
+        return self.source.analyse(record)
+
+
+class CycleResult(NamedTuple):
+    """
+    Measurements of one replayed cycle.
+
+    peak_rss is the process peak so far (it never decreases); traced_peak is the
+    peak of Python allocations during the cycle, when tracing memory.
+    """
+    cycle: str
+    seconds: float
+    cpu_seconds: float
+    peak_rss: Optional[int]
+    traced_peak: Optional[int]
+    responses: int
+    failed_responses: int
+    partners: int
+    promotions: List[str]
+
+
+class CycleReplayer:
+    """
+    Feeds recorded cycles back through the full pipeline and measures each one.
+
+    Sources are built once and kept across cycles, like in the daemon, so caches
+    warm up as they would in production. Cycles run back to back: the idle time
+    between recorded cycles is not replayed.
+    """
+    def __init__(self, archive: ResponseArchive, sources: List[Any], matcher: WatchlistMatcher,
+                 speedup: float = 0.0, trace_memory: bool = False) -> None:
+        """
+        Initializes the replayer.
+
+        Args:
+            archive (ResponseArchive): Recorded cycles (the daemon's --archive directory).
+            sources (List[Any]): Live sources; their programs select the recorded responses.
+            matcher (WatchlistMatcher): Watch stores the partners are matched against.
+            speedup (float): Replay speed relative to the recording (0 serves responses without waiting).
+            trace_memory (bool): Measure the peak of Python allocations of every cycle (slower).
+        """
+        self.archive = archive
+        self.sources = sources
+        self.matcher = matcher
+        self.speedup = speedup
+        self.trace_memory = trace_memory
+
+    def cycles(self, since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+        """
+        Returns the recorded cycles between two cycle name prefixes (inclusive), e.g. "20250101".
+        """
+        return [cycle for cycle in self.archive.cycles()
+                if (since is None or cycle[:len(since)] >= since) and (until is None or cycle[:len(until)] <= until)]
+
+    def replay(self, cycle: str) -> CycleResult:
+        """
+        Replays one recorded cycle.
+        """
+        reader = self.archive.open(cycle)
+        origin = min((entry.started for entry in reader.entries if entry.started), default=0.0)
+        sources = [ReplaySource(source, reader, origin, self.speedup) for source in self.sources]
+        partners = []
+
+        def count(program: str, partner: PartnerConfig, watchstores: List[WatchStore]) -> None:
+            partners.append(program)
+        pipeline = Pipeline(sources, self.matcher, observers=[count])
+
+        if self.trace_memory:
+            tracemalloc.start()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            matches = pipeline.run()
+            seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+            traced_peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+        finally:
+            if self.trace_memory:
+                tracemalloc.stop()
+        promotions = sorted(f"{match.program}:{match.partner.partner_name or match.partner.partner_code}"
+                            for match in matches)
+        return CycleResult(cycle, seconds, cpu_seconds, peak_rss(), traced_peak,
+                           sum(len(source.entries) for source in sources),
+                           sum(source.failed for source in sources), len(partners), promotions)
+
+    def replay_all(self, since: Optional[str] = None, until: Optional[str] = None,
+                   on_cycle: Optional[Callable[[CycleResult], None]] = None) -> List[CycleResult]:
+        """
+        Replays the recorded cycles between two prefixes, oldest first.
+        """
+        results = []
+        for cycle in self.cycles(since, until):
+            result = self.replay(cycle)
+            if on_cycle is not None:
+                on_cycle(result)
+            results.append(result)
+        return results
+
+
+def _mb(size: Optional[int]) -> str:
+    return f"{size / 1024 ** 2:.1f}" if size is not None else "-"
+
+
+def format_result(result: CycleResult) -> str:
+    """
+    Returns a one-line report of a replayed cycle.
+    """
+    return (f"{result.cycle}  {result.seconds * 1000:8.1f} ms  cpu {result.cpu_seconds * 1000:8.1f} ms  "
+            f"rss {_mb(result.peak_rss):>7} MB  traced {_mb(result.traced_peak):>7} MB  "
+            f"{result.responses} responses ({result.failed_responses} failed)  {result.partners} partners  "
+            f"{len(result.promotions)} promotions")
+
+
+def summarise(results: List[CycleResult]) -> Dict[str, float]:
+    """
+    Returns the totals and medians of a replay.
+    """
+    if not results:
+        return {}
+    return {
+        "cycles": len(results),
+        "median_ms": statistics.median(result.seconds for result in results) * 1000,
+        "total_ms": sum(result.seconds for result in results) * 1000,
+        "cpu_ms": sum(result.cpu_seconds for result in results) * 1000,
+        "promotions": sum(len(result.promotions) for result in results),
+    }
+
+
+def compare(results: List[CycleResult], baseline: List[CycleResult]) -> List[str]:
+    """
+    Compares a replay with a baseline replay of the same cycles.
+
+    Returns:
+        List[str]: Report lines: metric changes, then the cycles whose promotions differ.
+    """
+    previous = {result.cycle: result for result in baseline}
+    shared = [result for result in results if result.cycle in previous]
+    if not shared:
+        return ["no cycles in common with the baseline"]
+    current, before = summarise(shared), summarise([previous[result.cycle] for result in shared])
+    lines = [f"{len(shared)} cycles in common with the baseline"]
+    for metric in ("median_ms", "total_ms", "cpu_ms"):
+        change = (current[metric] / before[metric] - 1) * 100 if before[metric] else 0.0
+        lines.append(f"{metric:>10}: {before[metric]:10.1f} -> {current[metric]:10.1f} ({change:+.1f}%)")
+    for result in shared:
+        found, expected = set(result.promotions), set(previous[result.cycle].promotions)
+        if found != expected:
+            lines.append(f"{result.cycle}: +{sorted(found - expected)} -{sorted(expected - found)}")
+    return lines
+
+
+def save_results(results: List[CycleResult], path: str) -> None:
+    """
+    Writes replay results to a JSON file (see load_results).
+    """
+    json_codec.dump([result._asdict() for result in results], path, indent=True)
+
+
+def load_results(path: str) -> List[CycleResult]:
+    """
+    Reads replay results written by save_results.
+    """
+    return [CycleResult(**row) for row in json_codec.load(path)]
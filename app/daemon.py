@@ -0,0 +1,358 @@
+"""
+Long-running tracker: runs a crawl cycle periodically and serves the results
+through the read-only query API.
+
+    python3 -m app.daemon --interval 900 --port 8080
+"""
+import argparse
+import logging
+import signal
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.campaign_calendar_class import CampaignCalendar
+from app.earn_rate_index_class import EarnRateIndex, EarnRateTracker
+from app.cycle_profiler_class import add_profile_arguments, profile_from_args
+from app.cycle_budget_class import CycleBudget, LastGoodCache
+from app.esfera_structured_fields_class import ESFERA_FIELD_STATS
+from app.main import build_sources, print_match, update_sources, LAST_GOOD_PATH, WATCHSTORES_PATH
+from app.partner_identity_map_class import PartnerIdentityMap
+from app.partnersconfig_class import PartnerConfig
+from app.pipeline_class import Pipeline, PromotionMatch
+from app.promotions_index_class import PromotionsIndex, PromotionsIndexBuilder
+from app.response_archive_class import ResponseArchive
+from app.record_exporter_class import RecordExporter, add_export_arguments, exporter_from_args
+from app.sentence_analysis_cache_class import SENTENCE_CACHE
+from app.services.query_api_class import QueryApiServer
+from app.stage_memory_class import StageMemoryTracker
+from app.thread_pool_runner_class import ThreadPoolRunner
+from app.tracker_checkpoint_class import TrackerCheckpoint
+from app.watchlist_reloader_class import WatchlistReloader
+
+CHECKPOINT_PATH = "./app/database/tracker.ckpt"
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+class TrackerDaemon:
+    """
+    Runs crawl cycles, keeps the campaign calendar and the cross-program earn-rate
+    index up to date and publishes the promotions index to the query API after
+    every cycle.
+
+    The watchlist file is checked before each cycle; edits are applied to the
+    matcher incrementally, without restarting the daemon.
+
+    With a checkpoint, the derived state (published partners, campaign calendar,
+    earn rates, legal-terms analyses, HTTP validators and Esfera product ids) is
+    saved every few cycles and on shutdown, and restored at startup, so a restarted
+    tracker serves data and makes conditional requests from its first cycle.
+    """
+    def __init__(self, server: QueryApiServer, watchlist_path: str = WATCHSTORES_PATH,
+                 interval: float = 900, memory: bool = False, runner: Optional[ThreadPoolRunner] = None,
+                 exporter: Optional[RecordExporter] = None, budget: Optional[CycleBudget] = None,
+                 currency_rates: Optional[Dict[str, float]] = None, checkpoint: Optional[TrackerCheckpoint] = None,
+                 checkpoint_every: int = 4, archive: Optional[ResponseArchive] = None,
+                 structured: bool = False) -> None:
+        """
+        Initializes the tracker.
+
+        Args:
+            server (QueryApiServer): Query API that receives the rebuilt index.
+            watchlist_path (str): Watch stores JSON file.
+            interval (float): Seconds between crawl cycles.
+            memory (bool): Run cycles stage by stage and log the memory used by each stage.
+            runner (Optional[ThreadPoolRunner]): Thread pool for page fetches and notification sends.
+            exporter (Optional[RecordExporter]): Writes every analysed partner of each cycle to files.
+            budget (Optional[CycleBudget]): Time budget of each cycle; defaults to two thirds of the interval.
+            currency_rates (Optional[Dict[str, float]]): Reais per unit of foreign currencies, used to rank
+                partners priced in them.
+            checkpoint (Optional[TrackerCheckpoint]): Where the derived state is saved and restored from.
+            checkpoint_every (int): Cycles between checkpoints.
+            archive (Optional[ResponseArchive]): Records every cycle's requests and raw responses, compressed.
+            structured (bool): Read Esfera points and campaign dates from the structured catalogue fields
+                when they are consistent.
+        """
+        self.server = server
+        self.interval = interval
+        self.reloader = WatchlistReloader(watchlist_path)
+        self.matcher = self.reloader.matcher
+        self.calendar = CampaignCalendar()
+        self.memory = memory
+        self.runner = runner
+        self.exporter = exporter
+        # Bounds alert latency when a partner API is degraded: slow sources fall back on their last good fetch.
+        self.budget = budget or CycleBudget(interval * 2 / 3, cache=LastGoodCache(LAST_GOOD_PATH))
+        self.structured = structured
+        self.pipeline = Pipeline(build_sources(self.matcher.watchstores(), runner, targeted=True, structured=structured),
+                                 self.matcher,
+                                 notifier=self.notify, runner=runner, budget=self.budget)
+        self.earn_rates = EarnRateIndex()
+        self.earn_rate_tracker = EarnRateTracker(self.earn_rates,
+                                                 PartnerIdentityMap.from_watchstores(self.matcher.watchstores()),
+                                                 currency_rates)
+        server.earn_rates = self.earn_rates
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.cycles = 0
+        self.archive = archive
+        self.index_records: List[Dict[str, Any]] = []
+
+    def refresh_watchlist(self) -> None:
+        """
+        Applies watchlist edits and expiries, updating the sources in place if the watched partners changed.
+        """
+        diff = self.reloader.poll()
+        expired = self.matcher.expire()
+        if diff or expired:
+            update_sources(self.pipeline.sources, self.matcher.watchstores())
+            self.earn_rate_tracker.identities = PartnerIdentityMap.from_watchstores(self.matcher.watchstores())
+
+    def track_campaign(self, program: str, partner: PartnerConfig, watchstores: list) -> None:
+        """
+        Pipeline observer that records every partner's campaign window in the calendar.
+        """
+        self.calendar.track_partner(CampaignCalendar.partner_key(program, partner), partner)
+
+    def notify(self, match: PromotionMatch) -> None:
+        """
+        Notifies a match on the first and last day of its campaign (or always, if it has no window).
+        """
+        key = CampaignCalendar.partner_key(match.program, match.partner)
+        if key not in self.calendar or self.calendar.is_boundary_day(key):
+            print_match(match)
+
+    def run_cycle(self) -> None:
+        """
+        Runs one crawl cycle and publishes the rebuilt promotions index.
+        """
+        self.refresh_watchlist()
+        builder = PromotionsIndexBuilder()
+        self.pipeline.observers = [self.track_campaign, builder, self.earn_rate_tracker]
+        programs = [source.program for source in self.pipeline.sources]
+        self.earn_rate_tracker.begin_cycle(programs)
+        if self.exporter is not None:
+            self.exporter.start_cycle()
+            self.pipeline.observers.append(self.exporter)
+        archive = self.archive.open_cycle() if self.archive is not None else None
+        # Exchanges are recorded with their timing, so archived cycles can be replayed (app.replay)
+        recorders = [(source.client, archive.recorder(source.program))
+                     for source in self.pipeline.sources] if archive else []
+        for client, recorder in recorders:
+            client.recorders.append(recorder)
+        ESFERA_FIELD_STATS.clear()
+        start = time.perf_counter()
+        try:
+            if self.memory:
+                tracker = StageMemoryTracker()
+                matches = self.pipeline.run_staged(tracker)
+                tracker.stop()
+                logging.info(f"Cycle memory by stage:\n{tracker.report()}")
+            else:
+                matches = self.pipeline.run()
+            self.earn_rate_tracker.end_cycle(self.completely_refreshed(programs))
+        finally:
+            if self.exporter is not None:
+                self.exporter.close()
+            for client, recorder in recorders:
+                client.recorders.remove(recorder)
+            if archive is not None:
+                archive.close()
+                self.archive.prune()
+        if archive is not None:
+            logging.info(f"Archived {len(archive.entries)} responses: {archive.raw_bytes} bytes "
+                         f"stored in {archive.size} bytes")
+        if self.exporter is not None:
+            logging.info(f"Exported {self.exporter.records} records to {len(self.exporter.files)} files "
+                         f"in {self.exporter.seconds:.2f}s")
+        self.index_records = builder.records
+        index = builder.build()
+        self.server.publish(index)
+        logging.info(f"Cycle finished in {time.perf_counter() - start:.1f}s: "
+                     f"{index.size} partners indexed, {len(self.earn_rates)} earn rates, {len(matches)} matches, "
+                     f"{len(self.calendar.active_on(datetime.now().date()))} active campaigns; "
+                     f"{SENTENCE_CACHE.report()}; {self.budget.report()}")
+        if self.structured:
+            logging.info(ESFERA_FIELD_STATS.report())
+        stale = self.budget.stale_sources()
+        if stale:
+            logging.warning(f"Stale sources this cycle: {', '.join(stale)}")
+        self.cycles += 1
+        if self.cycles % self.checkpoint_every == 0:
+            self.save_checkpoint()
+
+    def completely_refreshed(self, programs: List[str]) -> List[str]:
+        """
+        Returns the programs whose last fetch listed every partner: not a targeted refresh,
+        not cut short by a failed request and not served from the last good cache.
+        """
+        partial = set(self.budget.stale_sources())
+        partial.update(source.program for source in self.pipeline.sources
+                       if not getattr(source, "complete", True) or getattr(source, "targeted", False))
+        return [program for program in programs if program not in partial]
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """
+        Returns the derived state worth keeping across restarts, by section.
+        """
+        return {
+            "index": self.index_records,
+            "calendar": self.calendar.checkpoint(),
+            "earn_rates": self.earn_rates.checkpoint(),
+            "sentences": SENTENCE_CACHE.checkpoint(),
+            "sources": {source.program: {"http": source.client.checkpoint(),
+                                         **({"targets": source.checkpoint()} if hasattr(source, "checkpoint") else {})}
+                        for source in self.pipeline.sources},
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restores the sections of checkpoint_state(); a section that cannot be restored is skipped.
+        """
+        def restore(section: str, apply: Any) -> None:
+            if section not in state:
+                return
+            try:
+                apply(state[section])
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping checkpoint section {section}: {e}")
+
+        def restore_index(records: List[Dict[str, Any]]) -> None:
+            self.server.publish(PromotionsIndex(records))
+            self.index_records = records
+
+        def restore_sources(sources: Dict[str, Any]) -> None:
+            for source in self.pipeline.sources:
+                saved = sources.get(source.program, {})
+                source.client.restore(saved.get("http", []))
+                if "targets" in saved and hasattr(source, "restore"):
+                    source.restore(saved["targets"])
+                    # The catalogue merged with targeted refreshes is the last good fetch.
+                    source.seed_catalogue(self.budget.cache.get(source.program))
+
+        restore("index", restore_index)
+        restore("calendar", self.calendar.restore)
+        restore("earn_rates", self.earn_rates.restore)
+        restore("sentences", SENTENCE_CACHE.restore)
+        restore("sources", restore_sources)
+
+    def save_checkpoint(self) -> None:
+        """
+        Writes the checkpoint, if one is configured.
+        """
+        if self.checkpoint is None:
+            return
+        start = time.perf_counter()
+        try:
+            size = self.checkpoint.save(self.checkpoint_state())
+        except (OSError, TypeError, ValueError) as e:
+            logging.error(f"Checkpoint failed: {e}")
+            return
+        logging.info(f"Checkpoint written to {self.checkpoint.path}: {size} bytes in {time.perf_counter() - start:.2f}s")
+
+    def restore_checkpoint(self) -> bool:
+        """
+        Restores the checkpoint, if one is configured and valid; returns whether state was restored.
+        """
+        if self.checkpoint is None:
+            return False
+        state = self.checkpoint.load()
+        if state is None:
+            return False
+        self.restore_state(state)
+        logging.info(f"Restored checkpoint {self.checkpoint.path}: {len(self.index_records)} partners, "
+                     f"{len(self.calendar)} campaigns, {len(self.earn_rates)} earn rates, "
+                     f"{len(SENTENCE_CACHE)} sentences")
+        return True
+
+    def seconds_until_next_cycle(self, now: Optional[datetime] = None) -> float:
+        """
+        Returns the wait before the next cycle: the regular interval, shortened so
+        that a cycle runs right after a known campaign starts.
+        """
+        now = now or datetime.now()
+        next_start = self.calendar.next_start_after(now)
+        if next_start is None:
+            return self.interval
+        return max(0.0, min(self.interval, (next_start - now).total_seconds() + 60))
+
+    def run(self, once: bool = False) -> None:
+        """
+        Runs cycles until interrupted (or a single one if once is True).
+        """
+        while True:
+            try:
+                self.run_cycle()
+            except Exception as e:
+                # Keep serving the last published index if a cycle fails.
+                logging.error(f"Crawl cycle failed: {e}")
+            if once:
+                return
+            time.sleep(self.seconds_until_next_cycle())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Livelo/Esfera tracker daemon")
+    parser.add_argument("--watchlist", default=WATCHSTORES_PATH, help="watch stores JSON file")
+    parser.add_argument("--interval", type=float, default=900, help="seconds between crawl cycles")
+    parser.add_argument("--host", default="127.0.0.1", help="query API bind address")
+    parser.add_argument("--port", type=int, default=8080, help="query API port")
+    parser.add_argument("--once", action="store_true", help="run a single cycle and exit")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="threads for page fetches and notification sends (1 runs them sequentially)")
+    parser.add_argument("--memory", action="store_true", help="log per-stage memory usage (slow, diagnostic)")
+    parser.add_argument("--budget", type=float, metavar="SECONDS",
+                        help="time budget of each cycle (default: two thirds of the interval)")
+    parser.add_argument("--currency-rate", action="append", default=[], metavar="CURRENCY=REAIS",
+                        help="reais per unit of a foreign currency, e.g. U$=5.2 (repeatable)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, metavar="FILE",
+                        help="file the tracker state is saved to and restored from ('' disables it)")
+    parser.add_argument("--checkpoint-every", type=int, default=4, help="cycles between checkpoints")
+    parser.add_argument("--archive", metavar="DIR", help="record every cycle's requests and raw responses, compressed, in DIR")
+    parser.add_argument("--archive-retain", type=int, default=96, help="number of archived cycles kept")
+    parser.add_argument("--structured-fields", action="store_true",
+                        help="read Esfera points and campaign dates from the structured catalogue fields when consistent")
+    parser.add_argument("--fetch-share", type=float, default=0.6,
+                        help="share of the cycle budget given to fetching before falling back on cached data")
+    add_profile_arguments(parser)
+    add_export_arguments(parser)
+    args = parser.parse_args()
+
+    runner = ThreadPoolRunner(args.workers) if args.workers > 1 else None
+    server = QueryApiServer(args.host, args.port)
+    server.start()
+    logging.info(f"Query API listening on http://{args.host}:{server.server_port}")
+    # Containers are stopped with SIGTERM: exit through the finally block so the state is checkpointed.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    daemon: Optional[TrackerDaemon] = None
+    try:
+        budget = CycleBudget(args.budget or args.interval * 2 / 3, args.fetch_share, LastGoodCache(LAST_GOOD_PATH))
+        currency_rates = {currency: float(rate) for currency, _, rate in
+                          (option.partition("=") for option in args.currency_rate)}
+        daemon = TrackerDaemon(server, args.watchlist, args.interval, args.memory, runner, exporter_from_args(args),
+                               budget, currency_rates, TrackerCheckpoint(args.checkpoint) if args.checkpoint else None,
+                               args.checkpoint_every,
+                               ResponseArchive(args.archive, args.archive_retain) if args.archive else None,
+                               args.structured_fields)
+        daemon.restore_checkpoint()
+        if args.profile:
+            # Only the first cycle is profiled.
+            with profile_from_args(args):
+                daemon.run(once=True)
+            if args.once:
+                return
+            time.sleep(daemon.seconds_until_next_cycle())
+        daemon.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if daemon is not None:
+            daemon.save_checkpoint()
+        server.stop()
+        if runner is not None:
+            runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import heapq
+import itertools
+import threading
+from decimal import Decimal
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+from .partner_identity_map_class import PartnerIdentityMap, canonical_name
+from .partnersconfig_class import PartnerConfig
+from .watchstore_class import WatchStore
+
+# Category under which every partner is ranked, whatever its categories.
+ALL_CATEGORIES = ""
+# Reais per unit of each currency; partners priced in other currencies need a rate to be ranked.
+DEFAULT_CURRENCY_RATES: Dict[str, float] = {"": 1.0, "R$": 1.0, "BRL": 1.0}
+_ESFERA_CATEGORY_PREFIX = "esf_categorias_"
+
+
+class EarnRate(NamedTuple):
+    """
+    Points per real a program offers for a partner (and category).
+
+    points is fixed-point (see accumulation_parser).
+    """
+    partner_id: str
+    partner_name: str
+    category: str
+    program: str
+    points: int
+    campaign_to: Optional[str]
+
+
+_Key = Tuple[str, str]
+
+
+class EarnRateIndex:
+    """
+    Best effective points per real of every partner and category, across programs.
+
+    Each program's rates are kept separately and the best of them is maintained per
+    (partner, category). A max-heap per category over the best rates answers top-K
+    queries; a changed rate pushes a new heap entry and the superseded one is
+    discarded lazily when it surfaces (entries carry the version they were pushed
+    with). A heap is rebuilt when its stale entries outnumber the live ones.
+
+    Programs are refreshed independently: rates received between begin_refresh()
+    and end_refresh() replace that program's previous rates, and partners it no
+    longer lists are dropped. Queries may run from other threads.
+    """
+    def __init__(self) -> None:
+        self._rates: Dict[_Key, Dict[str, EarnRate]] = {}
+        self._best: Dict[_Key, EarnRate] = {}
+        self._version: Dict[_Key, int] = {}
+        self._heaps: Dict[str, List[Tuple[int, int, str]]] = {}
+        self._live: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._refreshing: Dict[str, Set[_Key]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._best)
+
+    def _reprioritise(self, key: _Key) -> None:
+        rates = self._rates.get(key)
+        best = max(rates.values(), key=lambda rate: rate.points) if rates else None
+        partner_id, category = key
+        previous = self._best.get(key)
+        if best is None:
+            self._rates.pop(key, None)
+            if self._best.pop(key, None) is not None:
+                self._version.pop(key)
+                self._live[category] -= 1
+            return
+        self._best[key] = best
+        if previous is not None and previous.points == best.points:
+            return
+        if previous is None:
+            self._live[category] = self._live.get(category, 0) + 1
+        version = next(self._sequence)
+        self._version[key] = version
+        heap = self._heaps.setdefault(category, [])
+        heapq.heappush(heap, (-best.points, version, partner_id))
+        if len(heap) > 2 * self._live[category] + 64:
+            self._compact(category)
+
+    def _compact(self, category: str) -> None:
+        heap = [(-rate.points, self._version[key], key[0]) for key, rate in self._best.items() if key[1] == category]
+        heapq.heapify(heap)
+        self._heaps[category] = heap
+
+    def update(self, rate: EarnRate) -> None:
+        """
+        Records the rate a program currently offers for a partner and category.
+        """
+        key = (rate.partner_id, rate.category)
+        with self._lock:
+            self._rates.setdefault(key, {})[rate.program] = rate
+            seen = self._refreshing.get(rate.program)
+            if seen is not None:
+                seen.add(key)
+            self._reprioritise(key)
+
+    def remove(self, program: str, partner_id: str, category: str = ALL_CATEGORIES) -> None:
+        """
+        Drops the rate of a program for a partner and category.
+        """
+        key = (partner_id, category)
+        with self._lock:
+            if self._rates.get(key, {}).pop(program, None) is not None:
+                self._reprioritise(key)
+
+    def begin_refresh(self, program: str) -> None:
+        """
+        Starts tracking which partners a program lists in its current refresh.
+        """
+        with self._lock:
+            self._refreshing[program] = set()
+
+    def end_refresh(self, program: str) -> None:
+        """
+        Drops the rates of the partners the program did not list since begin_refresh().
+        """
+        with self._lock:
+            seen = self._refreshing.pop(program, None)
+            if seen is None:
+                return
+            for key in [key for key, rates in self._rates.items() if program in rates and key not in seen]:
+                del self._rates[key][program]
+                self._reprioritise(key)
+
+    def top(self, k: int, category: str = ALL_CATEGORIES) -> List[EarnRate]:
+        """
+        Returns the k best current rates of a category, highest first.
+        """
+        found: List[EarnRate] = []
+        with self._lock:
+            heap = self._heaps.get(category, [])
+            popped: List[Tuple[int, int, str]] = []
+            while heap and len(found) < k:
+                entry = heapq.heappop(heap)
+                key = (entry[2], category)
+                if self._version.get(key) != entry[1]:
+                    continue  # superseded or removed
+                popped.append(entry)
+                found.append(self._best[key])
+            for entry in popped:
+                heapq.heappush(heap, entry)
+        return found
+
+    def checkpoint(self) -> List[List[Any]]:
+        """
+        Returns every program's rates as JSON-serialisable rows.
+        """
+        with self._lock:
+            return [list(rate) for rates in self._rates.values() for rate in rates.values()]
+
+    def restore(self, rows: List[List[Any]]) -> None:
+        """
+        Adds the rates of a checkpoint() to the index.
+        """
+        for row in rows:
+            self.update(EarnRate(*row))
+
+    def best(self, partner_id: str, category: str = ALL_CATEGORIES) -> List[EarnRate]:
+        """
+        Returns the rate of every program for a partner and category, highest first.
+        """
+        with self._lock:
+            rates = list(self._rates.get((partner_id, category), {}).values())
+        return sorted(rates, key=lambda rate: rate.points, reverse=True)
+
+
+def partner_categories(partner: PartnerConfig) -> List[str]:
+    """
+    Returns the normalised categories of a partner (Esfera catalogue categories).
+    """
+    categories = []
+    for category in getattr(partner, "categories", ()):
+        if category.startswith(_ESFERA_CATEGORY_PREFIX):
+            category = category[len(_ESFERA_CATEGORY_PREFIX):]
+        categories.append(canonical_name(category))
+    return categories
+
+
+class EarnRateTracker:
+    """
+    Pipeline observer that feeds every analysed partner into an EarnRateIndex.
+
+    The effective rate is the partner's best points per currency unit divided by
+    the currency value and by the currency's rate in reais. Partners priced in a
+    currency without a known rate are not ranked (they are listed in unpriced).
+    """
+    def __init__(self, index: EarnRateIndex, identities: PartnerIdentityMap,
+                 currency_rates: Optional[Mapping[str, float]] = None) -> None:
+        """
+        Initializes the tracker.
+
+        Args:
+            index (EarnRateIndex): Index to update.
+            identities (PartnerIdentityMap): Resolves partners to shared partner ids.
+            currency_rates (Optional[Mapping[str, float]]): Reais per unit of each currency,
+                added to DEFAULT_CURRENCY_RATES.
+        """
+        self.index = index
+        self.identities = identities
+        self.currency_rates = {**DEFAULT_CURRENCY_RATES, **(currency_rates or {})}
+        self.unpriced: Set[str] = set()
+        self._programs: Set[str] = set()
+
+    def begin_cycle(self, programs: List[str]) -> None:
+        """
+        Starts a refresh of the given programs.
+        """
+        self._programs = set()
+        for program in programs:
+            self.index.begin_refresh(program)
+
+    def end_cycle(self, programs: List[str]) -> None:
+        """
+        Ends the refresh of the programs; a program that listed nothing keeps its previous rates.
+
+        Only pass the programs whose fetch listed all their partners: the rates of the
+        partners a program did not list are dropped, so a targeted or partial refresh
+        must leave its program out.
+        """
+        for program in programs:
+            if program in self._programs:
+                self.index.end_refresh(program)
+
+    def effective_points(self, partner: PartnerConfig) -> Optional[int]:
+        """
+        Returns the fixed-point points per real of a partner, or None if its currency has no known rate.
+        """
+        rate = self.currency_rates.get((partner.currency or "").strip())
+        if rate is None:
+            return None
+        currency_value = Decimal(str(partner.currency_value or 1))
+        return int(Decimal(partner.points_fixed()) / currency_value / Decimal(str(rate)))
+
+    def __call__(self, program: str, partner: PartnerConfig, watchstores: List[WatchStore]) -> None:
+        self._programs.add(program)
+        partner_id = self.identities.resolve(program, partner)
+        if not partner_id:
+            return
+        points = self.effective_points(partner)
+        if points is None:
+            self.unpriced.add(f"{program}:{partner.partner_code or partner.partner_name}")
+            return
+        if points <= 0:
+            return
+        campaign_to = partner.campaign_to.isoformat() if partner.campaign_to else None
+        name = self.identities.name(partner_id)
+        for category in [ALL_CATEGORIES] + partner_categories(partner):
+            self.index.update(EarnRate(partner_id, name, category, program, points, campaign_to))
@@ -1,8 +1,10 @@
-import json
 import re
 from typing import List, Dict, Any, Union, Optional
 from bs4 import BeautifulSoup
 from .partnersconfig_class import PartnerConfig
+from .accumulation_parser import from_fixed, parse_accumulation
+from .esfera_structured_fields_class import extract_structured_terms, strip_tags, text_campaign_window
+from .services import json_codec
 
 class EsferaPartnersList:
     """
@@ -14,7 +16,7 @@ class EsferaPartnersList:
     include only those whose "displayName" appears in the provided list.
     """
     def __init__(self, data: Union[str, List[Dict[str, Any]], Dict[str, Any]], 
-                 watchstore_names: Optional[List[str]] = None) -> None:
+                 watchstore_names: Optional[List[str]] = None, structured: bool = False) -> None:
         """
         Initializes the extractor with either the path to the JSON file or the JSON data,
         and an optional filter for watchstore names.
@@ -24,14 +26,75 @@ class EsferaPartnersList:
                 for the JSON file or parsed JSON data.
             watchstore_names (Optional[List[str]]): If provided, only items with displayName 
                 in this list will be extracted.
+            structured (bool): Take points and campaign windows from the structured fields when
+                they are consistent (see transform_item).
         """
         if isinstance(data, str):
-            with open(data, 'r') as f:
-                self.data = json.load(f)
+            self.data = json_codec.load(data)
         else:
             self.data = data
 
         self.watchstore_names = watchstore_names if watchstore_names is not None else []
+        self.structured = structured
+
+    @staticmethod
+    def transform_item(item: Dict[str, Any], structured: bool = False) -> Dict[str, Any]:
+        """
+        Normalises a single Esfera catalogue item into the fields used by PartnerConfig.
+
+        The HTML in "esf_accumulationHowItWorks" is reduced to plain text and the
+        "esf_accumulationAmount" label is parsed once into a fixed-point range.
+        'parity_club' holds the highest points of that range.
+
+        In structured mode the points and campaign window are taken from the item's
+        structured fields when they are consistent (see extract_structured_terms):
+        the HTML is stripped with a regular expression instead of being parsed, the
+        campaign window is read from the offer dates or, when they are unset, from the
+        dated sentences of the text, and the record is marked 'structured' so the legal terms are
+        not analysed sentence by sentence. Other items take the text path.
+
+        Args:
+            item (Dict[str, Any]): A single entry of the "items" list.
+            structured (bool): Use the structured fields when they are consistent.
+
+        Returns:
+            Dict[str, Any]: Dictionary with 'partner_name', 'legal_terms', 'parity_club', 'accumulation'
+                and 'categories' (ids of the catalogue categories the partner is listed in); on the
+                fast path, also 'campaign_from', 'campaign_to' and 'structured'.
+        """
+        categories = [category.get("repositoryId") for category in item.get("parentCategories") or []
+                      if category.get("repositoryId")]
+        terms = extract_structured_terms(item) if structured else None
+        if terms is not None:
+            legal_terms = strip_tags(item.get("esf_accumulationHowItWorks"))
+            campaign = terms.campaign or text_campaign_window(legal_terms)
+            return {
+                "partner_name": item.get("displayName"),
+                "legal_terms": legal_terms,
+                "parity_club": from_fixed(terms.accumulation.max),
+                "accumulation": terms.accumulation,
+                "categories": categories,
+                "campaign_from": campaign[0] if campaign else None,
+                "campaign_to": campaign[1] if campaign else None,
+                "structured": True,
+            }
+
+        legal_terms = item.get("esf_accumulationHowItWorks")
+        if legal_terms:
+            # Remove HTML tags
+            soup = BeautifulSoup(legal_terms, 'html.parser')
+            legal_terms = soup.get_text()
+            # Remove extra spaces
+            legal_terms = re.sub(r'\s+', ' ', legal_terms).strip()
+
+        accumulation = parse_accumulation(item.get("esf_accumulationAmount"))
+        return {
+            "partner_name": item.get("displayName"),
+            "legal_terms": legal_terms,
+            "parity_club": from_fixed(accumulation.max) if accumulation else 0,
+            "accumulation": accumulation,
+            "categories": categories,
+        }
 
     def extract_data(self) -> List[Dict[str, Any]]:
         """
@@ -55,24 +118,7 @@ class EsferaPartnersList:
             if self.watchstore_names and display_name not in self.watchstore_names:
                 continue
 
-            # Extract and clean legal terms
-            legal_terms = item.get("esf_accumulationHowItWorks")
-            if legal_terms:
-                # Remove HTML tags
-                soup = BeautifulSoup(legal_terms, 'html.parser')
-                legal_terms = soup.get_text()
-                # Remove extra spaces
-                legal_terms = re.sub(r'\s+', ' ', legal_terms).strip()
-                
-            transformed_item = {
-                "partner_name": display_name,
-                "legal_terms": legal_terms,
-                "parity_club" : item.get("esf_accumulationAmount").lower()
-                                                                  .replace("pts", "")
-                                                                  .replace("pt", "")
-                                                                  .replace("pontos", "")
-                                                                  .strip()
-            }
+            transformed_item = self.transform_item(item, self.structured)
             # Create a PartnerConfig object using the factory method.
             partner = PartnerConfig.from_esfera_dict(transformed_item)
             partners.append(partner)
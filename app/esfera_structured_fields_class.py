@@ -0,0 +1,162 @@
+import html
+import re
+import threading
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from .accumulation_parser import AccumulationRange, parse_accumulation, to_fixed
+from .sentence_analysis_cache_class import SENTENCE_CACHE
+
+# "a cada real", "a cada 2 reais na fatura*"; other rules ("por contratação", "a cada dólar") are not per real.
+_PER_REAL_RULE_RE = re.compile(r'^a cada (?:(\d+) )?(?:real|reais)\b', re.IGNORECASE)
+# "1x1 <p> Ganhe <b>1</b> ponto a cada real", "<p> Ganhe até <b>1,5</b> pontos a cada real"
+_FACTOR_TEXT_RE = re.compile(r'ganhe\s+(?:at[eé]\s+)?(?:<b>\s*)?(\d+(?:[.,]\d+)?)', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_SENTENCE_SPLIT_RE = re.compile(r'[.;]')
+_FULL_DATE_RE = re.compile(r'\d{1,2}/\d{2}/\d{2,4}')
+# Offer dates are "dd-mm-yyyy HH:MM"; unset ones keep that template text.
+_OFFER_DATE_FORMAT = "%d-%m-%Y %H:%M"
+_EXPIRATION_FORMAT = "%d/%m/%Y"
+
+
+class StructuredTerms(NamedTuple):
+    """
+    Points and campaign window of an Esfera item, taken from its structured fields.
+
+    accumulation is per real (the amount divided by the rule's number of reais).
+    """
+    accumulation: AccumulationRange
+    campaign: Optional[Tuple[date, date]]
+
+
+def strip_tags(markup: Optional[str]) -> str:
+    """
+    Cheaply reduces the HTML legal terms to plain text (tags removed, entities decoded, whitespace collapsed).
+    """
+    return " ".join(html.unescape(_TAG_RE.sub(" ", markup or "")).replace("•", " ").split())
+
+
+def text_campaign_window(legal_terms: str) -> Optional[Tuple[date, date]]:
+    """
+    Finds the campaign window in plain-text legal terms, as the full text analysis would.
+
+    Only the sentences with a full date are analysed; the last window found wins.
+    """
+    window = None
+    for sentence in _SENTENCE_SPLIT_RE.split(legal_terms):
+        if _FULL_DATE_RE.search(sentence):
+            window = SENTENCE_CACHE.analyse(sentence).campaign or window
+    return window
+
+
+def _offer_date(value: Any) -> Optional[date]:
+    """
+    Parses an offer date; None if it is unset (missing or still the template).
+
+    Raises:
+        ValueError: If the value is set but not a valid date.
+    """
+    if not value or "yyyy" in str(value):
+        return None
+    return datetime.strptime(str(value).strip(), _OFFER_DATE_FORMAT).date()
+
+
+class StructuredFieldStats:
+    """
+    Counts how often the structured fields were used, and why the text analysis was used instead.
+    """
+    def __init__(self) -> None:
+        self.fast = 0
+        self.fallbacks: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        """
+        Resets the counters.
+        """
+        with self._lock:
+            self.fast = 0
+            self.fallbacks.clear()
+
+    def record(self, reason: Optional[str]) -> None:
+        """
+        Records a fast-path extraction (reason None) or a fallback to text analysis.
+        """
+        with self._lock:
+            if reason is None:
+                self.fast += 1
+            else:
+                self.fallbacks[reason] += 1
+
+    @property
+    def fast_ratio(self) -> float:
+        """
+        Returns the share of items extracted from the structured fields.
+        """
+        total = self.fast + sum(self.fallbacks.values())
+        return self.fast / total if total else 0.0
+
+    def report(self) -> str:
+        """
+        Returns a one-line summary of the fast path usage.
+        """
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.fallbacks.most_common())
+        return (f"esfera structured fields: {self.fast} fast / {sum(self.fallbacks.values())} text "
+                f"({self.fast_ratio:.1%})" + (f"; fallbacks by reason: {reasons}" if reasons else ""))
+
+
+def _structured_terms(item: Dict[str, Any]) -> Tuple[Optional[StructuredTerms], Optional[str]]:
+    accumulation = parse_accumulation(item.get("esf_accumulationAmount"))
+    if accumulation is None:
+        return None, "amount missing"
+    rule = _PER_REAL_RULE_RE.match((item.get("esf_accumulationRule") or "").strip())
+    if rule is None:
+        return None, "rule not per real"
+    reais = int(rule.group(1) or 1)
+    factor_value = item.get("esf_accumulationFactorValue")
+    if factor_value is not None and str(factor_value).strip() != str(reais):
+        return None, "factor value contradicts rule"
+    factor_text = _FACTOR_TEXT_RE.search(item.get("esf_accumulationFactor") or "")
+    if factor_text is not None and to_fixed(factor_text.group(1)) != accumulation.max:
+        return None, "factor text contradicts amount"
+
+    try:
+        start, end = _offer_date(item.get("esf_tempOfferInit")), _offer_date(item.get("esf_tempOfferEnd"))
+        expiration = item.get("esf_accumulationExpirationDate")
+        expires = datetime.strptime(expiration.strip(), _EXPIRATION_FORMAT).date() if expiration else None
+    except (ValueError, AttributeError):
+        return None, "invalid dates"
+    if (start is None) != (end is None) or (start is not None and start > end):
+        return None, "inconsistent offer dates"
+    if end is not None and expires is not None and end > expires:
+        return None, "offer ends after expiration"
+    per_real = AccumulationRange(accumulation.min // reais, accumulation.max // reais, accumulation.unit)
+    return StructuredTerms(per_real, (start, end) if start is not None else None), None
+
+
+def extract_structured_terms(item: Dict[str, Any],
+                             stats: Optional[StructuredFieldStats] = None) -> Optional[StructuredTerms]:
+    """
+    Reads the points and campaign window of an Esfera item from its structured fields.
+
+    The fields are used only when they are present and agree with each other: a
+    parseable "esf_accumulationAmount", a per-real "esf_accumulationRule" matching
+    "esf_accumulationFactorValue" and the "esf_accumulationFactor" text, and offer
+    dates that are either both unset or a valid window ending before
+    "esf_accumulationExpirationDate". Otherwise None is returned and the caller
+    analyses the legal terms text.
+
+    Args:
+        item (Dict[str, Any]): A raw catalogue item.
+        stats (Optional[StructuredFieldStats]): Counters to update; ESFERA_FIELD_STATS if omitted.
+
+    Returns:
+        Optional[StructuredTerms]: The structured terms, or None to fall back on the text.
+    """
+    terms, reason = _structured_terms(item)
+    (stats or ESFERA_FIELD_STATS).record(reason)
+    return terms
+
+
+# Shared by the pipeline source and the crawler, so the counters cover the whole process.
+ESFERA_FIELD_STATS = StructuredFieldStats()
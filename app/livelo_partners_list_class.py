@@ -1,6 +1,6 @@
-import json
 from typing import List, Dict, Union, Any, Optional
 from .partnersconfig_class import PartnerConfig
+from .services import json_codec
 
 class LiveloPartnersList:
     """
@@ -27,8 +27,7 @@ class LiveloPartnersList:
         """
         try:
             if isinstance(json_data, str):  # Assume it's a file path
-                with open(json_data, 'r') as f:
-                    data: List[Dict[str, Any]] = json.load(f)
+                data: List[Dict[str, Any]] = json_codec.load(json_data)
             elif isinstance(json_data, list):  # Assume it's a list of dictionaries
                 data = json_data
             else:
@@ -40,7 +39,7 @@ class LiveloPartnersList:
         except FileNotFoundError:
             print(f"Error: File not found: {json_data}")
             return []
-        except json.JSONDecodeError:
+        except json_codec.JSONDecodeError:
             print(f"Error: Failed to decode the JSON file: {json_data}")
             return []
         except (TypeError, KeyError) as e:
@@ -65,6 +64,9 @@ class LiveloPartnersList:
     def get_promotional_partners(self, desired_points: int, watchstores: Optional[List[Any]] = None) -> List[PartnerConfig]:
         """
         Returns a list of partners that are on promotion and offer desired points.
+
+        Partners are rejected on the watch list and promotion flag before their legal
+        terms (where the points are read from) are analysed.
         
         If a list of WatchStore objects is provided, only configurations matching a watch store
         (by comparing the partner code with the watch store's code) are considered.
@@ -77,14 +79,14 @@ class LiveloPartnersList:
             List[PartnerConfig]: List of partners on promotion.
         """
         promotional_partners = []
+        # Assume the matching is done by comparing config.partner_code to watchstore.code.
+        # (You may modify this logic to compare watchstore names if needed.)
+        watched_codes = {watch.code for watch in watchstores} if watchstores else None
         for config in self.configs:
             # If a list of watchstores is provided, ensure the partner is present in it
-            if watchstores:
-                # Assume the matching is done by comparing config.partner_code to watchstore.code.
-                # (You may modify this logic to compare watchstore names if needed.)
-                if not any(watch.code == config.partner_code for watch in watchstores):
-                    continue
-
+            if watched_codes is not None and config.partner_code not in watched_codes:
+                continue
+            # Cheap fields first: the legal terms are analysed only for watched partners on promotion
             if config.promotion and config.get_highest_point() >= desired_points:
                 promotional_partners.append(config)
         return promotional_partners
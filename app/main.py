@@ -1,42 +1,106 @@
-import json
-from app.services.restapi_class import RestApiClient
-from app.livelo_partners_list_class import LiveloPartnersList
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+from app.cycle_budget_class import CycleBudget, LastGoodCache
+from app.cycle_profiler_class import add_profile_arguments, profile_from_args
+from app.esfera_structured_fields_class import ESFERA_FIELD_STATS
 from app.watchstore_class import WatchStore
-from app.esfera_partners_list import EsferaPartnersList
+from app.watchlist_artifact_class import WatchlistArtifact, normalise_term
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.sources_class import LiveloSource, EsferaSource, EsferaTargetedSource
+from app.pipeline_class import Pipeline, PromotionMatch
+from app.record_exporter_class import add_export_arguments, exporter_from_args
+from app.thread_pool_runner_class import ThreadPoolRunner
 
-if __name__ == "__main__":
-    # Load watchstores data from JSON file and create WatchStore objects
-    with open("./app/database/watchstoreslist.json", "r") as f:
-        watchstores_data = json.load(f)
-    watchstores = [WatchStore.from_dict(item) for item in watchstores_data]
+WATCHSTORES_PATH = "./app/database/watchstoreslist.json"
+LAST_GOOD_PATH = "./app/database/last_good"
+
+
+def load_watchlist(path: str = WATCHSTORES_PATH) -> WatchlistArtifact:
+    # Map the compiled watchlist; it is recompiled only when the JSON file changes
+    return WatchlistArtifact.load_or_compile(path)
+
+
+def load_watchstores(path: str = WATCHSTORES_PATH) -> List[WatchStore]:
+    return load_watchlist(path).watchstores()
 
-    # Extract watchstore codes as a list and join them into a comma-separated string.
+
+def watched_esfera_item(watchstores: List[WatchStore]) -> Callable[[Dict[str, Any]], bool]:
+    # Esfera catalogue items are matched by store name
+    watched_names = {normalise_term(ws.name) for ws in watchstores}
+    return lambda item: normalise_term(item.get("displayName")) in watched_names
+
+
+def build_sources(watchstores: List[WatchStore], runner: Optional[ThreadPoolRunner] = None,
+                  targeted: bool = False, structured: bool = False) -> List[Any]:
+    # Livelo is matched by partner code, Esfera by store name
     watchstore_codes = [ws.code for ws in watchstores]
-    partners_codes = ",".join(watchstore_codes)
-    
-    watchstore_names = [ws.name for ws in watchstores]
-    partners_names = ",".join(watchstore_names)
-
-    # Create a RestApiClient instance; optionally set base_url and headers
-    # client = RestApiClient(base_url="https://apis.pontoslivelo.com.br", headers={"accept": "application/json"})
-    client = RestApiClient(base_url="https://www.esfera.com.vc", headers={"accept": "application/json"})
-    
-    # Example GET request
-    #expected_json = client.get("/api-bff-partners-parities/v1/parities/active", params={"partnersCodes": partners_codes})
-    expected_json = client.get("/ccstoreui/v1/products", params={"categoryId": "esf02163"})
-    # Extract data from response_esfera.json using the extractor
-    extractor = EsferaPartnersList(expected_json, partners_names)
-    partners_list = extractor.extract_data()
-
-    # Load partner configurations from JSON file
-    #config_list = PartnerConfigList("./app/database/response_livelo.json")
-    # Obtain promotional partners by passing the watchstores list as an optional parameter
-    #partners_list = config_list.get_promotional_partners(4, watchstores=watchstores)
-    
+    livelo = LiveloSource(watchstore_codes, max_workers=runner.workers) if runner else LiveloSource(watchstore_codes)
+    if not targeted:
+        return [livelo, EsferaSource(runner=runner, structured=structured)]
+    # Long-running processes refresh only the watched Esfera partners between full listings,
+    # merging them into the last full listing so that the unwatched partners stay indexed
+    return [livelo, EsferaTargetedSource(watched_esfera_item(watchstores), runner=runner, structured=structured,
+                                         keep_catalogue=True)]
+
+
+def update_sources(sources: List[Any], watchstores: List[WatchStore]) -> None:
+    # Point the sources at an edited watchlist in place, keeping their clients (HTTP validators)
+    # and the targeted source's known product ids
+    for source in sources:
+        if isinstance(source, LiveloSource):
+            source.partner_codes = [ws.code for ws in watchstores]
+        elif isinstance(source, EsferaTargetedSource):
+            source.watch(watched_esfera_item(watchstores))
+
+
+def print_match(match: PromotionMatch) -> None:
+    partner = match.partner
+    # Partners rebuilt from the last good fetch may be out of date
+    print(f"[{match.program}]{' [stale]' if partner.stale else ''} {partner}")
+    print(partner.partner_name)
+    if partner.has_active_campaign():
+        print("Active campaign")
+        print(f"{partner.campaign_from} until {partner.campaign_to}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Livelo/Esfera tracker")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="threads for page fetches and notification sends (1 runs them sequentially)")
+    parser.add_argument("--budget", type=float, metavar="SECONDS",
+                        help="time budget of the cycle; slow sources fall back on their last good fetch")
+    parser.add_argument("--structured-fields", action="store_true",
+                        help="read Esfera points and campaign dates from the structured catalogue fields when consistent")
+    add_profile_arguments(parser)
+    add_export_arguments(parser)
+    args = parser.parse_args()
+    watchlist = load_watchlist()
+    runner = ThreadPoolRunner(args.workers) if args.workers > 1 else None
+    exporter = exporter_from_args(args)
+    budget = CycleBudget(args.budget, cache=LastGoodCache(LAST_GOOD_PATH)) if args.budget else None
+
+    # Each partner is matched and printed as soon as its record arrives
     print("\nPromotional Partners:")
-    for partner in partners_list:
-        print(partner)
-        print(partner.partner_name)
-        if partner.has_active_campaign():
-            print("Active campaign")
-            print(f"{partner.campaign_from} until {partner.campaign_to}")
+    pipeline = Pipeline(build_sources(watchlist.watchstores(), runner, structured=args.structured_fields),
+                        WatchlistMatcher(artifact=watchlist),
+                        notifier=print_match, observers=[exporter] if exporter else None, runner=runner,
+                        budget=budget)
+    if exporter is not None:
+        exporter.start_cycle()
+    try:
+        with profile_from_args(args):
+            pipeline.run()
+    finally:
+        if runner is not None:
+            runner.shutdown()
+        if exporter is not None:
+            exporter.close()
+            print(f"Exported {exporter.records} records to {len(exporter.files)} files in {exporter.seconds:.2f}s")
+        if budget is not None:
+            print(budget.report())
+        if args.structured_fields:
+            print(ESFERA_FIELD_STATS.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+from collections import OrderedDict
+from datetime import date
+from string import Template
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Email layout shared by both programs, compiled once.
+_PAGE_TEMPLATE = Template("<table align='center'><tr><th><h1>$title - $day</h1></th></tr>$rows</table>")
+
+
+class NotificationRenderer:
+    """
+    Renders the HTML of the notification email sent for the campaigns found.
+
+    Each campaign row is rendered once and cached by (partner, URL, legal terms hash,
+    categories, minimum points), so the same campaign is not re-rendered for every
+    recipient or every run. A digest is assembled with a single join, which keeps
+    rendering linear in the number of campaigns.
+    """
+    def __init__(self, title: str, row_template: str, no_category: str,
+                 split_sentences: bool = False, max_fragments: int = 4096) -> None:
+        """
+        Initializes the renderer.
+
+        Args:
+            title (str): Title shown in the email header (e.g. "Livelo").
+            row_template (str): string.Template for one campaign, with the placeholders
+                $name, $categories, $min_points, $terms and $url.
+            no_category (str): Text used when the campaign has no categories.
+            split_sentences (bool): Put each sentence of the legal terms on its own line.
+            max_fragments (int): Maximum number of rendered campaigns kept in the cache.
+        """
+        self.title = title
+        self.row_template = Template(row_template)
+        self.no_category = no_category
+        self.split_sentences = split_sentences
+        self.max_fragments = max_fragments
+        self.hits = 0
+        self.misses = 0
+        self._fragments: "OrderedDict[Hashable, str]" = OrderedDict()
+
+    @staticmethod
+    def fragment_key(campaign: Dict[str, Any]) -> Tuple[Any, ...]:
+        """
+        Returns the cache key of a campaign row.
+        """
+        legal_terms = str(campaign.get('legal_terms', ''))
+        return (campaign['name'], campaign.get('url', ''),
+                hashlib.sha1(legal_terms.encode('utf-8')).digest(),
+                tuple(campaign.get('categories') or ()), campaign.get('min_points'))
+
+    def render_fragment(self, campaign: Dict[str, Any]) -> str:
+        """
+        Returns the HTML row of a campaign, rendering it only on the first request.
+
+        Args:
+            campaign (Dict[str, Any]): Campaign with 'name', 'legal_terms', 'url' and optionally
+                'categories' and 'min_points'.
+
+        Returns:
+            str: The HTML row.
+        """
+        key = self.fragment_key(campaign)
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self.hits += 1
+            self._fragments.move_to_end(key)
+            return fragment
+
+        self.misses += 1
+        categories = campaign.get('categories')
+        legal_terms = str(campaign['legal_terms'])
+        if self.split_sentences:
+            legal_terms = ".<br/>".join(legal_terms.split(". "))
+        fragment = self.row_template.substitute(
+            name=campaign['name'],
+            categories=", ".join(categories) if categories else self.no_category,
+            min_points=campaign.get('min_points', ''),
+            terms=legal_terms,
+            url=campaign['url'],
+        )
+        self._fragments[key] = fragment
+        if len(self._fragments) > self.max_fragments:
+            self._fragments.popitem(last=False)
+        return fragment
+
+    def render(self, campaigns: List[Dict[str, Any]], day: Optional[date] = None) -> str:
+        """
+        Renders the full email for a list of campaigns.
+
+        Args:
+            campaigns (List[Dict[str, Any]]): Campaigns to include, in order.
+            day (Optional[date]): Date shown in the header; defaults to today.
+
+        Returns:
+            str: The email HTML.
+        """
+        day = day or date.today()
+        rows = "".join([self.render_fragment(campaign) for campaign in campaigns])
+        return _PAGE_TEMPLATE.substitute(title=self.title, day=day.strftime("%d/%m/%Y"), rows=rows)
+
+    def render_digests(self, campaigns_by_recipient: Dict[str, List[Dict[str, Any]]],
+                       day: Optional[date] = None) -> Dict[str, str]:
+        """
+        Renders one email per recipient; campaigns shared by recipients are rendered once.
+
+        Args:
+            campaigns_by_recipient (Dict[str, List[Dict[str, Any]]]): Campaigns for each recipient.
+            day (Optional[date]): Date shown in the header; defaults to today.
+
+        Returns:
+            Dict[str, str]: The email HTML for each recipient.
+        """
+        return {recipient: self.render(campaigns, day) for recipient, campaigns in campaigns_by_recipient.items()}
+
+
+LIVELO_RENDERER = NotificationRenderer(
+    title="Livelo",
+    row_template="<tr><td><strong>$name</strong><br/><p>Search Terms: $categories</p>"
+                 "<p>Minimum amount of points: $min_points</p><p>$terms</p><p>URL Access: $url</p></td><tr/>",
+    no_category=" No category",
+    split_sentences=True,
+)
+
+ESFERA_RENDERER = NotificationRenderer(
+    title="Esfera",
+    row_template="<tr><td><strong>$name</strong><br/><p>Termos procurados: $categories</p>"
+                 "<p>$terms</p><p>URL de acesso: $url</p><br/></td><tr/>",
+    no_category=" Sem categoria definida",
+)
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+from .partnersconfig_class import PartnerConfig
+from .services import json_codec
+from .watchstore_class import WatchStore
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+def canonical_name(name: Optional[str]) -> str:
+    """
+    Normalises a partner name or slug into a program-independent key.
+
+    Accents, case, punctuation and repeated whitespace are ignored, so "Casas Bahia",
+    "casas-bahia" and "CASAS  BAHIA" share the key "casas bahia".
+    """
+    decomposed = unicodedata.normalize("NFKD", (name or "").casefold())
+    ascii_name = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_NON_ALNUM_RE.sub(" ", ascii_name).split())
+
+
+class PartnerIdentityMap:
+    """
+    Maps the program-specific identity of a partner to a shared partner id.
+
+    Esfera identifies partners by display name (or slug), Livelo by partner code
+    and, when present, name. The partner id is the canonical name; Livelo codes are
+    tied to it through aliases, which come from the watch stores (each one pairs a
+    Livelo code with the store name) or from an aliases file. Codes seen alongside
+    a name are learned as well.
+    """
+    def __init__(self) -> None:
+        self._ids: Dict[str, str] = {}
+        self.names: Dict[str, str] = {}
+
+    @staticmethod
+    def _code_key(program: str, code: str) -> str:
+        return f"{program}:{code}"
+
+    def add_alias(self, alias: str, partner_name: str, program: Optional[str] = None) -> str:
+        """
+        Ties an alias (a name, slug or, with program, a partner code) to a partner.
+
+        Args:
+            alias (str): Name, slug or partner code.
+            partner_name (str): Display name of the partner.
+            program (Optional[str]): Program of a partner code alias ("livelo").
+
+        Returns:
+            str: The partner id.
+        """
+        partner_id = self._ids.get(canonical_name(partner_name)) or canonical_name(partner_name)
+        self._ids[canonical_name(partner_name)] = partner_id
+        self._ids[self._code_key(program, alias) if program else canonical_name(alias)] = partner_id
+        self.names.setdefault(partner_id, partner_name)
+        return partner_id
+
+    @classmethod
+    def from_watchstores(cls, watchstores: Iterable[WatchStore], aliases_path: Optional[str] = None
+                         ) -> "PartnerIdentityMap":
+        """
+        Builds the map from the watch stores and, optionally, an aliases file.
+
+        The aliases file maps a display name to its other names, slugs and
+        "program:code" keys, e.g. {"Casas Bahia": ["casasbahia", "livelo:CSB"]}.
+        """
+        identities = cls()
+        for watchstore in watchstores:
+            if watchstore.name and watchstore.code:
+                identities.add_alias(watchstore.code, watchstore.name, program="livelo")
+        if aliases_path:
+            aliases: Dict[str, List[str]] = json_codec.load(aliases_path)
+            for partner_name, names in aliases.items():
+                for alias in names:
+                    program, _, code = alias.partition(":")
+                    if code:
+                        identities.add_alias(code, partner_name, program=program)
+                    else:
+                        identities.add_alias(alias, partner_name)
+        return identities
+
+    def resolve(self, program: str, partner: PartnerConfig) -> str:
+        """
+        Returns the partner id of an analysed partner, learning its code if it is new.
+
+        Args:
+            program (str): Program the partner belongs to.
+            partner (PartnerConfig): Analysed partner.
+
+        Returns:
+            str: The partner id (empty if the partner has neither code nor name).
+        """
+        code_key = self._code_key(program, partner.partner_code) if partner.partner_code else ""
+        name_key = canonical_name(partner.partner_name)
+        partner_id = (self._ids.get(code_key) if code_key else None) or self._ids.get(name_key) or name_key or code_key
+        if not partner_id:
+            return ""
+        if code_key and name_key:
+            self._ids.setdefault(code_key, partner_id)
+        self.names.setdefault(partner_id, partner.partner_name or partner.partner_code)
+        return partner_id
+
+    def name(self, partner_id: str) -> str:
+        """
+        Returns the display name of a partner id.
+        """
+        return self.names.get(partner_id, partner_id)
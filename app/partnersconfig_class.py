@@ -5,6 +5,20 @@ Classe para representar e manipular dados do arquivo retorno.json ou response_es
 import re
 from typing import List, Tuple, Optional
 from datetime import datetime, date
+from .accumulation_parser import AccumulationRange, POINTS_SCALE, to_fixed
+from .sentence_analysis_cache_class import SENTENCE_CACHE
+
+_SENTENCE_SPLIT_RE = re.compile(r'[.;]')
+
+
+def _as_date(value) -> Optional[date]:
+    """
+    Returns a date, parsing ISO strings (records that went through JSON).
+    """
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10]) if value else None
+    return value
+
 
 class PartnerConfig:
     """
@@ -16,7 +30,9 @@ class PartnerConfig:
                  url: str = "", separator: str = "",
                  parityBau: int = 0, separatorSlug: str = "",
                  campaign_from: Optional[datetime] = None,
-                 campaign_to: Optional[datetime] = None):
+                 campaign_to: Optional[datetime] = None,
+                 accumulation: Optional[AccumulationRange] = None,
+                 analyse: bool = True):
         """
         Initializes a PartnerConfig instance.
 
@@ -42,6 +58,9 @@ class PartnerConfig:
             separatorSlug (str): Separator slug.
             campaign_from (Optional[datetime]): Campaign start date.
             campaign_to (Optional[datetime]): Campaign end date.
+            accumulation (Optional[AccumulationRange]): Parsed accumulation range (Esfera).
+            analyse (bool): Analyse the legal terms for points and campaign dates; False when they
+                were already taken from structured fields.
         """
         self.partner_code = partnerCode
         self.partner_name = partnerName
@@ -49,16 +68,27 @@ class PartnerConfig:
         self.currency_value = currencyValue
         self.parity = parity
         self.parity_club = parityClub
-        self.legal_terms = legalTerms if legalTerms is not None else ""
         self.url = url
         self.separator = separator
         self.parity_bau = parityBau
         self.promotion = promotion
         self.separator_slug = separatorSlug
-        self.campaign_from = campaign_from
-        self.campaign_to = campaign_to
-        self.max_points = 1
-        self.analyze_legal_terms_for_points()
+        self.accumulation = accumulation
+        # Set when the partner was built from cached data because its source was slow or down.
+        self.stale = False
+        # Catalogue categories the partner is listed in (Esfera only).
+        self.categories: List[str] = []
+        self._points_fixed: Optional[int] = None
+        # The legal terms are analysed on first access to max_points, the campaign dates or
+        # the sentence breakdown, so partners rejected on their numeric fields never pay for it.
+        self._analysis: Optional[List[Tuple[str, List[int]]]] = None
+        self._campaign_from = campaign_from
+        self._campaign_to = campaign_to
+        self.legal_terms = legalTerms if legalTerms is not None else ""
+        # A partner created without legal terms reports 1 point; replaced terms start from 0.
+        self._max_points = 1
+        if not analyse:
+            self.max_points = 0
 
     def __repr__(self):
         """
@@ -73,66 +103,133 @@ class PartnerConfig:
     def getParityClub(self) -> int:
         return self.parity_club
 
+    @property
+    def legal_terms(self) -> str:
+        return self._legal_terms
+
+    @legal_terms.setter
+    def legal_terms(self, legal_terms: str) -> None:
+        # New terms are analysed again on the next access
+        self._legal_terms = legal_terms
+        self._analysis = None
+        self._max_points = 0
+        self._points_fixed = None
+
+    def _analysed(self) -> List[Tuple[str, List[int]]]:
+        if self._analysis is None:
+            self.analyze_legal_terms_for_points()
+        return self._analysis
+
+    @property
+    def max_points(self) -> int:
+        """
+        Highest points per real found in the legal terms (analysed on first access).
+        """
+        self._analysed()
+        return self._max_points
+
+    @max_points.setter
+    def max_points(self, points: int) -> None:
+        # An explicit value stands in for the analysis (e.g. points read from structured fields)
+        if self._analysis is None:
+            self._analysis = []
+        self._max_points = points
+        self._points_fixed = None
+
+    @property
+    def campaign_from(self) -> Optional[date]:
+        """
+        Campaign start date, from the constructor or the legal terms (analysed on first access).
+        """
+        self._analysed()
+        return self._campaign_from
+
+    @campaign_from.setter
+    def campaign_from(self, value: Optional[date]) -> None:
+        self._analysed()
+        self._campaign_from = value
+
+    @property
+    def campaign_to(self) -> Optional[date]:
+        """
+        Campaign end date, from the constructor or the legal terms (analysed on first access).
+        """
+        self._analysed()
+        return self._campaign_to
+
+    @campaign_to.setter
+    def campaign_to(self, value: Optional[date]) -> None:
+        self._analysed()
+        self._campaign_to = value
+
+    @property
+    def sentences(self) -> List[Tuple[str, List[int]]]:
+        """
+        Sentence breakdown of the legal terms with the points found in each (analysed on first access).
+        """
+        return list(self._analysed())
+
     def analyze_legal_terms_for_points(self): #-> List[Tuple[str, List[int]]]:
         """
         Analyzes the legal terms text, breaks it into sentences, and extracts integer points
         from each sentence, considering only points specified as "X points per real" or similar.
         Ignores numbers that are part of dates. Also, extracts campaign dates.
 
+        The results are kept on the instance; max_points, the campaign dates and
+        sentences run this on first access.
+
         Returns:
             List[Tuple[str, List[int]]]: A list of tuples. Each tuple contains a sentence
                                          and a list of integer points found in that sentence.
                                          Returns an empty list if legalTerms is empty.
         """
+        results: List[Tuple[str, List[int]]] = []
+        self._analysis = results
+        self._points_fixed = None
         if not self.legal_terms:
             return []
 
-        sentences = re.split(r'[.;]', self.legal_terms)
-        results: List[Tuple[str, List[int]]] = []
+        sentences = _SENTENCE_SPLIT_RE.split(self.legal_terms)
 
         for sentence in sentences:
-            sentence = sentence.strip()
-            if sentence:
-                # Find points using specific patterns, ignoring dates
-                points = []
-                patterns = [
-                    r'(\d+)\s+pontos\s+por\s+real',
-                    r'(\d+)\s+pontos\s+por\s+R\$\s*1',
-                    r'(\d+)\s+pontos\s+a\s+cada\s+real',
-                    r'(\d+)\s+pontos\s+a\s+cada\s+R\$\s*1'
-                ]
-                for pattern in patterns:
-                    match = re.search(pattern, sentence)
-                    if match:
-                        points.append(int(match.group(1)))
-                results.append((sentence, points))
-                # Extract campaign dates, ex: "de 1 a 30/04/2023"
-                date_match = re.search(r'de (\d{1,2}) a (\d{1,2}/\d{2}/\d{2,4})', sentence)
-                print(sentence)
-                if date_match:
-                    try:
-                        from_day = int(date_match.group(1))
-                        to_date_str = date_match.group(2)
-                        from_date_str = f"{from_day:02d}/{to_date_str.split('/')[1]}/{to_date_str.split('/')[2]}"
-                        self.campaign_from = datetime.strptime(from_date_str, '%d/%m/%Y').date()
-                        self.campaign_to = datetime.strptime(to_date_str, '%d/%m/%Y').date()
-                    except (ValueError, IndexError) as e:
-                        print(f"Error parsing date in sentence '{sentence}': {e}")
+            if sentence.strip():
+                # Boilerplate sentences are shared by many partners: each one is analysed once
+                analysis = SENTENCE_CACHE.analyse(sentence)
+                results.append((analysis.sentence, list(analysis.points)))
+                if analysis.campaign is not None:
+                    self._campaign_from, self._campaign_to = analysis.campaign
 
         all_points = []
         for _, points in results:
             all_points.extend(points)
-        self.max_points = max(all_points) if all_points else 0
+        self._max_points = max(all_points) if all_points else 0
+        return list(results)
+
+    def parity_fixed(self) -> int:
+        """
+        Returns the points per real given by the numeric fields alone, in fixed-point.
+
+        This is the parsed accumulation range (or the club parity), without analysing
+        the legal terms; points_fixed() is never lower.
+        """
+        return self.accumulation.max if self.accumulation is not None else to_fixed(self.parity_club)
+
+    def points_fixed(self) -> int:
+        """
+        Returns the best points per real offered, in fixed-point (see accumulation_parser).
+
+        Considers the parsed accumulation range (or the club parity) and the highest
+        value found in the legal terms. Computed once per analysis.
+        """
+        if self._points_fixed is None:
+            self._points_fixed = max(self.parity_fixed(), (self.max_points or 0) * POINTS_SCALE)
+        return self._points_fixed
 
     def get_highest_point(self) -> int:
         """
         Returns the highest point value found in the legal terms.
         """
-        analysis_results = self.analyze_legal_terms_for_points()
-        all_points = []
-        for _, points in analysis_results:
-            all_points.extend(points)
-        return max(all_points) if all_points else 0
+        return self.max_points
 
     def has_active_campaign(self) -> bool:
         """
@@ -156,17 +253,28 @@ class PartnerConfig:
         Since response_esfera.json does not provide all required fields, defaults are used for the rest.
 
         Args:
-            data (dict): A dictionary representing a partner from response_esfera.json.
+            data (dict): A dictionary representing a partner from response_esfera.json
+                (see EsferaPartnersList.transform_item), possibly after a JSON round trip.
 
         Returns:
             PartnerConfig: A PartnerConfig instance with mapped data.
         """
-        return cls(
+        accumulation = data.get("accumulation")
+        if isinstance(accumulation, (list, tuple)):
+            accumulation = AccumulationRange(*accumulation)
+        partner = cls(
             partnerCode = "", 
             partnerName = data.get("partner_name", ""),   # Using name from esfera response as partner code
             parity = 0,                           # Default value; not present in esfera data
             parityClub = data.get("parity_club", ""),
             legalTerms = data.get("legal_terms", ""),
-            promotion = False
+            promotion = False,
+            campaign_from = _as_date(data.get("campaign_from")),
+            campaign_to = _as_date(data.get("campaign_to")),
+            accumulation = accumulation,
+            # Points and campaign dates of structured records were read from the catalogue fields
+            analyse = not data.get("structured")
         )
+        partner.categories = list(data.get("categories") or [])
+        return partner
 
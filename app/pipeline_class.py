@@ -0,0 +1,254 @@
+"""
+Streaming pipeline: fetch -> normalise -> analyse -> match -> notify.
+
+Every stage is a generator running in its own thread and stages are linked by
+bounded queues. A partner record flows through the whole chain as soon as its
+source yields it, so memory stays flat and the first alert can go out before the
+full catalogue has been downloaded.
+"""
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from .cycle_budget_class import CycleBudget
+from .partnersconfig_class import PartnerConfig
+from .stage_memory_class import StageMemoryTracker
+from .thread_pool_runner_class import ThreadPoolRunner
+from .watchlist_matcher_class import WatchlistMatcher
+from .watchstore_class import WatchStore
+
+# Sentinel put on a queue when the producing stage has finished.
+_DONE = object()
+
+
+class _StageError:
+    """
+    Wraps an exception raised inside a stage so it can be re-raised by the consumer.
+    """
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class PromotionMatch(NamedTuple):
+    """
+    A partner that satisfied at least one watch store.
+    """
+    program: str
+    partner: PartnerConfig
+    watchstores: List[WatchStore]
+
+
+class Pipeline:
+    """
+    Runs one crawl cycle over a set of sources.
+
+    Sources must provide ``program``, ``match_field``, ``fetch()``, ``normalise(item)``
+    and ``analyse(record)`` (see sources_class).
+    """
+    def __init__(self, sources: List[Any], matcher: WatchlistMatcher,
+                 notifier: Optional[Callable[[PromotionMatch], None]] = None,
+                 queue_size: int = 32,
+                 observers: Optional[List[Callable[[str, PartnerConfig, List[WatchStore]], None]]] = None,
+                 runner: Optional[ThreadPoolRunner] = None, budget: Optional[CycleBudget] = None) -> None:
+        """
+        Initializes the pipeline.
+
+        Args:
+            sources (List[Any]): Sources to fetch partner records from.
+            matcher (WatchlistMatcher): Matcher holding the watch stores.
+            notifier (Optional[Callable[[PromotionMatch], None]]): Called once for every match, as soon as it is found.
+            queue_size (int): Capacity of each queue between stages.
+            observers (Optional[List[Callable]]): Called from the match stage with (program, partner, watchstores)
+                for every analysed partner, matched or not.
+            runner (Optional[ThreadPoolRunner]): If given, notifications are sent on its thread pool so a
+                slow send does not hold up matching; the cycle still waits for them before returning.
+            budget (Optional[CycleBudget]): If given, every cycle runs under this time budget and source
+                fetches that fail or miss the fetch deadline fall back on their last good items.
+        """
+        self.sources = sources
+        self.matcher = matcher
+        self.notifier = notifier
+        self.queue_size = queue_size
+        self.observers = observers or []
+        self.runner = runner
+        self.budget = budget
+        self._stop = threading.Event()
+
+    def _cycle_sources(self) -> List[Any]:
+        """
+        Starts the budget clock and returns the sources of the cycle, wrapped if a budget is set.
+        """
+        if self.budget is None:
+            return self.sources
+        self.budget.start()
+        return [self.budget.wrap(source) for source in self.sources]
+
+    def run(self) -> List[PromotionMatch]:
+        """
+        Runs a full cycle and returns the matches found.
+        """
+        return list(self.stream())
+
+    def run_staged(self, tracker: StageMemoryTracker) -> List[PromotionMatch]:
+        """
+        Runs a full cycle one stage at a time, measuring the memory of each stage.
+
+        Every stage finishes before the next one starts, so all intermediate results
+        are held at once; this mode is meant for memory instrumentation only. Sources
+        decode each response as they page through it, so the fetch stage includes
+        decoding; benchmarks.esfera_memory_stages measures decoding on its own.
+
+        Args:
+            tracker (StageMemoryTracker): Tracker that records the fetch, extract, analyse, match and notify stages.
+
+        Returns:
+            List[PromotionMatch]: The matches found.
+        """
+        sources = self._cycle_sources()
+        with tracker.stage("fetch"):
+            items = []
+            for source in sources:
+                try:
+                    items.extend((source, item) for item in source.fetch())
+                except Exception as e:
+                    logging.error(f"Error fetching {source.program} partners: {e}")
+        with tracker.stage("extract"):
+            records = list(self._normalise(items))
+        with tracker.stage("analyse"):
+            partners = list(self._analyse(records))
+            # Legal terms are analysed lazily: read the points so the analysis happens in this stage
+            for _, partner in partners:
+                partner.max_points
+        with tracker.stage("match"):
+            matches = list(self._match(partners))
+        with tracker.stage("notify"):
+            if self.notifier is not None:
+                for match in matches:
+                    self.notifier(match)
+        if self.budget is not None:
+            self.budget.finish()
+        return matches
+
+    def stream(self) -> Iterator[PromotionMatch]:
+        """
+        Runs a cycle, yielding each match right after it has been notified (or, with
+        a runner, right after its notification has been submitted).
+
+        Raises:
+            Exception: Any error raised by the normalise, analyse or match stages.
+        """
+        self._stop.clear()
+        raw = self._queue()
+        normalised = self._queue()
+        analysed = self._queue()
+        matched = self._queue()
+
+        threads = [threading.Thread(target=self._fetch_all, args=(self._cycle_sources(), raw), daemon=True)]
+        for stage, inbox, outbox in ((self._normalise, raw, normalised),
+                                     (self._analyse, normalised, analysed),
+                                     (self._match, analysed, matched)):
+            threads.append(threading.Thread(target=self._run_stage, args=(stage, inbox, outbox), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            for match in self._drain(matched):
+                self._notify(match)
+                yield match
+            if self.runner is not None:
+                self.runner.wait()
+            if self.budget is not None:
+                self.budget.finish()
+        finally:
+            # Unblock producers if the consumer stopped early or a stage failed.
+            self._stop.set()
+
+    def _notify(self, match: PromotionMatch) -> None:
+        if self.notifier is None:
+            return
+        if self.runner is not None:
+            self.runner.submit(self.notifier, match)
+        else:
+            self.notifier(match)
+
+    def _queue(self) -> "queue.Queue[Any]":
+        return queue.Queue(maxsize=self.queue_size)
+
+    def _put(self, outbox: "queue.Queue[Any]", item: Any) -> bool:
+        """
+        Puts an item on a bounded queue, giving up if the pipeline was stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, inbox: "queue.Queue[Any]") -> Iterator[Any]:
+        """
+        Yields items from a queue until the producing stage signals completion.
+        """
+        while True:
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+
+    def _run_stage(self, stage: Callable[[Iterable[Any]], Iterator[Any]],
+                   inbox: "queue.Queue[Any]", outbox: "queue.Queue[Any]") -> None:
+        try:
+            for item in stage(self._drain(inbox)):
+                if not self._put(outbox, item):
+                    return
+        except BaseException as error:
+            self._put(outbox, _StageError(error))
+            return
+        self._put(outbox, _DONE)
+
+    def _fetch_all(self, sources: List[Any], outbox: "queue.Queue[Any]") -> None:
+        """
+        Fetches every source concurrently into the same queue.
+        """
+        workers = [threading.Thread(target=self._fetch_source, args=(source, outbox), daemon=True)
+                   for source in sources]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self._put(outbox, _DONE)
+
+    def _fetch_source(self, source: Any, outbox: "queue.Queue[Any]") -> None:
+        try:
+            for item in source.fetch():
+                if not self._put(outbox, (source, item)):
+                    return
+        except Exception as e:
+            # A failing source must not prevent the others from being processed.
+            logging.error(f"Error fetching {source.program} partners: {e}")
+
+    def _normalise(self, items: Iterable[Tuple[Any, Any]]) -> Iterator[Tuple[Any, Any]]:
+        for source, item in items:
+            record = source.normalise(item)
+            if record is not None:
+                yield source, record
+
+    def _analyse(self, records: Iterable[Tuple[Any, Any]]) -> Iterator[Tuple[Any, PartnerConfig]]:
+        for source, record in records:
+            yield source, source.analyse(record)
+
+    def _match(self, partners: Iterable[Tuple[Any, PartnerConfig]]) -> Iterator[PromotionMatch]:
+        for source, partner in partners:
+            watchstores = self.matcher.match(partner, source.match_field)
+            for observer in self.observers:
+                observer(source.program, partner, watchstores)
+            if watchstores:
+                yield PromotionMatch(source.program, partner, watchstores)
@@ -0,0 +1,156 @@
+import bisect
+import hashlib
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from .partnersconfig_class import PartnerConfig
+from .watchlist_matcher_class import WatchlistMatcher
+from .watchstore_class import WatchStore
+from .services import json_codec
+from .accumulation_parser import from_fixed
+
+# A pre-serialised response: (body, etag)
+Response = Tuple[bytes, str]
+
+
+class PromotionsIndex:
+    """
+    Immutable, pre-serialised index of the promotions found in one crawl cycle.
+
+    Every record is encoded once, when the index is built. Partner and active
+    campaign responses are stored whole; a "points >= N" response is a prefix of
+    the records sorted by points, joined from the encoded records on request (its
+    ETag is precomputed), so memory does not grow with the number of thresholds:
+
+        - promotions with at least N points,
+        - promotions of a given partner (by code or name),
+        - campaigns active on the day the index was built.
+    """
+    def __init__(self, records: List[Dict[str, Any]], built_on: Optional[date] = None) -> None:
+        """
+        Builds the index.
+
+        Args:
+            records (List[Dict[str, Any]]): Records as produced by PromotionsIndex.record.
+            built_on (Optional[date]): Day used for the "active campaigns" query; defaults to today.
+        """
+        self.built_on = built_on or date.today()
+        self.size = len(records)
+        by_points = sorted(records, key=lambda record: record["points"], reverse=True)
+        self._encoded: List[bytes] = [json_codec.dumps(record) for record in by_points]
+
+        # Distinct point values in ascending order, with the number of records and the ETag
+        # of the response for "points >= value".
+        self._thresholds: List[float] = sorted({record["points"] for record in records})
+        self._ends: List[int] = [self._count_at_least(by_points, threshold) for threshold in self._thresholds]
+        self._etags: List[str] = self._prefix_etags(self._encoded, self._ends)
+        self._empty = self._serialise([])
+
+        partners: Dict[str, List[bytes]] = {}
+        for record, encoded in zip(by_points, self._encoded):
+            for key in {record["partner_code"], WatchlistMatcher.normalise_name(record["partner_name"])}:
+                if key:
+                    partners.setdefault(key, []).append(encoded)
+        self._by_partner: Dict[str, Response] = {key: self._serialise(items) for key, items in partners.items()}
+
+        self._active = self._serialise([encoded for record, encoded in zip(by_points, self._encoded)
+                                        if record["campaign_from"] and record["campaign_to"]
+                                        and record["campaign_from"] <= self.built_on.isoformat() <= record["campaign_to"]])
+
+    @staticmethod
+    def _count_at_least(records: List[Dict[str, Any]], threshold: float) -> int:
+        # records are sorted by descending points
+        low, high = 0, len(records)
+        while low < high:
+            middle = (low + high) // 2
+            if records[middle]["points"] >= threshold:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @staticmethod
+    def _join(encoded: List[bytes]) -> bytes:
+        return b"[" + b",".join(encoded) + b"]"
+
+    @classmethod
+    def _serialise(cls, encoded: List[bytes]) -> Response:
+        body = cls._join(encoded)
+        return body, '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    @staticmethod
+    def _prefix_etags(encoded: List[bytes], ends: List[int]) -> List[str]:
+        # One running hash over the records gives the ETag of every prefix in a single pass.
+        digest = hashlib.sha1(b"[")
+        etags: Dict[int, str] = {}
+        hashed = 0
+        for end in sorted(set(ends)):
+            for position in range(hashed, end):
+                digest.update(b"," + encoded[position] if position else encoded[position])
+            hashed = end
+            closed = digest.copy()
+            closed.update(b"]")
+            etags[end] = '"' + closed.hexdigest() + '"'
+        return [etags[end] for end in ends]
+
+    @staticmethod
+    def record(program: str, partner: PartnerConfig, watchstores: List[WatchStore]) -> Dict[str, Any]:
+        """
+        Converts an analysed partner into the JSON-ready record stored in the index.
+
+        Args:
+            program (str): Program the partner belongs to ("livelo" or "esfera").
+            partner (PartnerConfig): Analysed partner configuration.
+            watchstores (List[WatchStore]): Watch stores matched by the partner.
+
+        Returns:
+            Dict[str, Any]: The record.
+        """
+        return {
+            "program": program,
+            "partner_code": partner.partner_code,
+            "partner_name": partner.partner_name,
+            "parity_club": partner.parity_club,
+            "points": float(from_fixed(WatchlistMatcher.partner_points(partner))),
+            "promotion": partner.promotion,
+            "campaign_from": partner.campaign_from.isoformat() if partner.campaign_from else None,
+            "campaign_to": partner.campaign_to.isoformat() if partner.campaign_to else None,
+            "watchers": [watchstore.name for watchstore in watchstores],
+        }
+
+    def promotions(self, min_points: float) -> Response:
+        """
+        Returns the response with every promotion offering at least min_points.
+        """
+        position = bisect.bisect_left(self._thresholds, min_points)
+        if position == len(self._thresholds):
+            return self._empty
+        return self._join(self._encoded[:self._ends[position]]), self._etags[position]
+
+    def partner(self, key: str) -> Optional[Response]:
+        """
+        Returns the response for a partner code or name, or None if it is unknown.
+        """
+        return self._by_partner.get(key) or self._by_partner.get(WatchlistMatcher.normalise_name(key))
+
+    def active_campaigns(self) -> Response:
+        """
+        Returns the response with the campaigns active on the day the index was built.
+        """
+        return self._active
+
+
+class PromotionsIndexBuilder:
+    """
+    Pipeline observer that collects the records of a cycle and builds a PromotionsIndex.
+    """
+    def __init__(self) -> None:
+        self.records: List[Dict[str, Any]] = []
+
+    def __call__(self, program: str, partner: PartnerConfig, watchstores: List[WatchStore]) -> None:
+        self.records.append(PromotionsIndex.record(program, partner, watchstores))
+
+    def build(self) -> PromotionsIndex:
+        """
+        Builds the index from the records collected so far.
+        """
+        return PromotionsIndex(self.records)
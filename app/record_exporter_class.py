@@ -0,0 +1,247 @@
+import argparse
+import csv
+import gzip
+import io
+import os
+import time
+from typing import Any, BinaryIO, Dict, List, Optional
+from .accumulation_parser import from_fixed, to_fixed
+from .partnersconfig_class import PartnerConfig
+from .services import json_codec
+from .watchstore_class import WatchStore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency, only needed for the parquet format
+    pyarrow = None
+
+FORMATS = ("ndjson", "csv", "parquet")
+FIELDS = ["cycle", "program", "partner_code", "partner_name", "parity", "parity_club", "max_points", "points",
+          "campaign_from", "campaign_to", "watchers", "stale"]
+
+
+def export_record(cycle: str, program: str, partner: PartnerConfig, watchstores: List[WatchStore]) -> Dict[str, Any]:
+    """
+    Flattens an analysed partner into an export record.
+
+    Args:
+        cycle (str): Identifier of the crawl cycle.
+        program (str): Program the partner belongs to ("livelo" or "esfera").
+        partner (PartnerConfig): Analysed partner.
+        watchstores (List[WatchStore]): Watch stores the partner matched (may be empty).
+
+    Returns:
+        Dict[str, Any]: Record with the keys of FIELDS.
+    """
+    return {
+        "cycle": cycle,
+        "program": program,
+        "partner_code": partner.partner_code or "",
+        "partner_name": partner.partner_name or "",
+        "parity": float(from_fixed(to_fixed(partner.parity))),
+        "parity_club": float(from_fixed(to_fixed(partner.parity_club))),
+        "max_points": partner.max_points or 0,
+        "points": float(from_fixed(partner.points_fixed())),
+        "campaign_from": partner.campaign_from.isoformat() if partner.campaign_from else None,
+        "campaign_to": partner.campaign_to.isoformat() if partner.campaign_to else None,
+        "watchers": [watchstore.name for watchstore in watchstores],
+        "stale": partner.stale,
+    }
+
+
+class RecordExporter:
+    """
+    Pipeline observer that streams every analysed partner of a cycle to files.
+
+    Records are buffered and written in batches (one row group per batch for
+    parquet), so memory stays constant whatever the size of the cycle. A new file
+    is started every max_records records. Files are written under a temporary name
+    and renamed when complete, so readers never pick up a partial file.
+
+    Formats:
+        ndjson   one JSON object per line (optionally gzip-compressed)
+        csv      header plus one row per record; watchers are joined with ";" (optionally gzip-compressed)
+        parquet  columnar, requires pyarrow; compress selects zstd
+    """
+    def __init__(self, directory: str, format: str = "ndjson", compress: bool = False,
+                 max_records: int = 100000, buffer_records: int = 1000, prefix: str = "partners") -> None:
+        """
+        Initializes the exporter.
+
+        Args:
+            directory (str): Directory the files are written to (created if missing).
+            format (str): "ndjson", "csv" or "parquet".
+            compress (bool): Compress the files (gzip for ndjson/csv, zstd for parquet).
+            max_records (int): Records per file before rotating to a new one.
+            buffer_records (int): Records buffered before each write.
+            prefix (str): File name prefix.
+
+        Raises:
+            ValueError: If the format is unknown or parquet is requested without pyarrow.
+        """
+        if format not in FORMATS:
+            raise ValueError(f"unknown export format '{format}', choose from {', '.join(FORMATS)}")
+        if format == "parquet" and pyarrow is None:
+            raise ValueError("the parquet export format requires pyarrow")
+        self.directory = directory
+        self.format = format
+        self.compress = compress
+        self.max_records = max_records
+        self.buffer_records = buffer_records
+        self.prefix = prefix
+        self.cycle = ""
+        self.files: List[str] = []
+        self.records = 0
+        self.seconds = 0.0
+        self._buffer: List[Dict[str, Any]] = []
+        self._file: Optional[BinaryIO] = None
+        self._raw: Optional[BinaryIO] = None
+        self._text: Optional[io.TextIOWrapper] = None
+        self._csv: Any = None
+        self._parquet: Any = None
+        self._path = ""
+        self._part = 0
+        self._in_file = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start_cycle(self, cycle: Optional[str] = None) -> None:
+        """
+        Starts exporting a new cycle; files of the previous cycle are closed first.
+
+        Args:
+            cycle (Optional[str]): Cycle identifier; defaults to the current local time.
+        """
+        self.close()
+        self.cycle = cycle or time.strftime("%Y%m%dT%H%M%S")
+        self.files = []
+        self.records = 0
+        self.seconds = 0.0
+        self._part = 0
+
+    def __enter__(self) -> "RecordExporter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __call__(self, program: str, partner: PartnerConfig, watchstores: List[WatchStore]) -> None:
+        self._buffer.append(export_record(self.cycle, program, partner, watchstores))
+        if len(self._buffer) >= self.buffer_records:
+            self.flush()
+
+    def _extension(self) -> str:
+        if self.format == "parquet":
+            return "parquet"
+        return self.format + (".gz" if self.compress else "")
+
+    def _open(self) -> None:
+        self._path = os.path.join(self.directory,
+                                  f"{self.prefix}-{self.cycle}-{self._part:04d}.{self._extension()}")
+        self._part += 1
+        self._in_file = 0
+        temporary = self._path + ".tmp"
+        if self.format == "parquet":
+            self._parquet = pyarrow.parquet.ParquetWriter(temporary, _parquet_schema(),
+                                                          compression="zstd" if self.compress else "none")
+            return
+        raw = open(temporary, "wb", buffering=1 << 20)
+        self._file = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if self.compress else raw
+        self._raw = raw
+        if self.format == "csv":
+            self._text = io.TextIOWrapper(self._file, encoding="utf-8", newline="")
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(FIELDS)
+
+    def _close_file(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        elif self._file is not None:
+            if self._text is not None:
+                self._text.flush()
+                self._text.detach()
+                self._text = None
+                self._csv = None
+            self._file.close()
+            if self._file is not self._raw:
+                self._raw.close()
+            self._file = None
+        else:
+            return
+        os.replace(self._path + ".tmp", self._path)
+        self.files.append(self._path)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        if self.format == "parquet":
+            columns = {field: [record[field] for record in records] for field in FIELDS}
+            self._parquet.write_table(pyarrow.table(columns, schema=_parquet_schema()))
+        elif self.format == "csv":
+            self._csv.writerows([[";".join(value) if field == "watchers" else value
+                                  for field, value in ((field, record[field]) for field in FIELDS)]
+                                 for record in records])
+        else:
+            self._file.write(b"".join(json_codec.dumps(record) + b"\n" for record in records))
+
+    def flush(self) -> None:
+        """
+        Writes the buffered records, rotating files when they reach max_records.
+        """
+        start = time.perf_counter()
+        records, self._buffer = self._buffer, []
+        while records:
+            if self._file is None and self._parquet is None:
+                self._open()
+            room = self.max_records - self._in_file
+            batch, records = records[:room], records[room:]
+            self._write(batch)
+            self._in_file += len(batch)
+            self.records += len(batch)
+            if self._in_file >= self.max_records:
+                self._close_file()
+        self.seconds += time.perf_counter() - start
+
+    def close(self) -> None:
+        """
+        Writes the remaining records and closes the current file.
+        """
+        self.flush()
+        start = time.perf_counter()
+        self._close_file()
+        self.seconds += time.perf_counter() - start
+
+
+def _parquet_schema() -> Any:
+    return pyarrow.schema([
+        ("cycle", pyarrow.string()),
+        ("program", pyarrow.string()),
+        ("partner_code", pyarrow.string()),
+        ("partner_name", pyarrow.string()),
+        ("parity", pyarrow.float64()),
+        ("parity_club", pyarrow.float64()),
+        ("max_points", pyarrow.int64()),
+        ("points", pyarrow.float64()),
+        ("campaign_from", pyarrow.string()),
+        ("campaign_to", pyarrow.string()),
+        ("watchers", pyarrow.list_(pyarrow.string())),
+        ("stale", pyarrow.bool_()),
+    ])
+
+
+def add_export_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the --export options to an entry point's argument parser.
+    """
+    parser.add_argument("--export", metavar="DIR", help="write every analysed partner of each cycle to DIR")
+    parser.add_argument("--export-format", choices=FORMATS, default="ndjson", help="export file format")
+    parser.add_argument("--export-compress", action="store_true", help="compress the export files")
+    parser.add_argument("--export-max-records", type=int, default=100000, help="records per export file")
+
+
+def exporter_from_args(args: argparse.Namespace) -> Optional[RecordExporter]:
+    """
+    Returns the exporter requested on the command line, or None if --export was not given.
+    """
+    if not args.export:
+        return None
+    return RecordExporter(args.export, args.export_format, args.export_compress, args.export_max_records)
@@ -0,0 +1,53 @@
+"""
+Replays cycles recorded by the tracker daemon (--archive) through the full pipeline,
+offline, and reports the latency, CPU time, memory and promotions of each cycle.
+
+    python3 -m app.replay app/database/archive --since 20250101 --until 20250107 --output antes.json
+    python3 -m app.replay app/database/archive --since 20250101 --until 20250107 --baseline antes.json
+    python3 -m app.replay app/database/archive --since 20250101 --speedup 60   # upstream latency / 60
+
+Both runs see the same recorded responses, so two builds can be compared on
+identical traffic. The watch stores are the current ones, not those of the
+recording.
+"""
+import argparse
+from app.cycle_replay_class import CycleReplayer, compare, format_result, load_results, save_results, summarise
+from app.main import WATCHSTORES_PATH, build_sources, load_watchlist
+from app.response_archive_class import ResponseArchive
+from app.watchlist_matcher_class import WatchlistMatcher
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline replay of recorded tracker cycles")
+    parser.add_argument("directory", help="archive directory recorded by the daemon (--archive)")
+    parser.add_argument("--since", help="first cycle, or a prefix of it (e.g. 20250101)")
+    parser.add_argument("--until", help="last cycle, or a prefix of it")
+    parser.add_argument("--speedup", type=float, default=0,
+                        help="replay speed relative to the recording; 0 serves responses without waiting")
+    parser.add_argument("--watchlist", default=WATCHSTORES_PATH, help="watch stores JSON file")
+    parser.add_argument("--structured-fields", action="store_true",
+                        help="read Esfera points and campaign dates from the structured catalogue fields")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure the peak Python allocations of every cycle (slower)")
+    parser.add_argument("--output", metavar="FILE", help="write the per-cycle results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with the results of another build")
+    args = parser.parse_args()
+
+    watchlist = load_watchlist(args.watchlist)
+    replayer = CycleReplayer(ResponseArchive(args.directory, retain=0),
+                             build_sources(watchlist.watchstores(), structured=args.structured_fields),
+                             WatchlistMatcher(artifact=watchlist), args.speedup, args.trace_memory)
+    results = replayer.replay_all(args.since, args.until, on_cycle=lambda result: print(format_result(result)))
+    if not results:
+        print("Nenhum ciclo gravado no intervalo")
+        return
+    print(", ".join(f"{metric}: {round(value, 1)}" for metric, value in summarise(results).items()))
+    if args.output:
+        save_results(results, args.output)
+    if args.baseline:
+        for line in compare(results, load_results(args.baseline)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, BinaryIO, Callable, List, NamedTuple, Optional
+from urllib.parse import urlencode
+from .services import json_codec
+from .services.restapi_class import Exchange, RequestKey
+
+# File layout (little endian):
+#   header:  magic, format version, flags (reserved), creation time (unix seconds)
+#   records: every response body, zlib-compressed on its own
+#   index:   zlib-compressed JSON list of [source, key, offset, length, raw length, CRC32 of the raw body,
+#            request time (unix seconds), seconds until the body was received, HTTP status]
+#   trailer: index offset, index length, magic
+# Version 1 indexes lack the last three columns; they are still read.
+MAGIC = b"RZA1"
+VERSION = 2
+HEADER = struct.Struct("<4sHHd")
+TRAILER = struct.Struct("<QI4s")
+EXTENSION = ".rza"
+
+
+class ArchiveEntry(NamedTuple):
+    """
+    One archived response: where its compressed body is, how large it was and when it was received.
+
+    started, elapsed and status are 0.0, 0.0 and 200 for responses archived without timing.
+    """
+    source: str
+    key: str
+    offset: int
+    length: int
+    raw_length: int
+    crc: int
+    started: float = 0.0
+    elapsed: float = 0.0
+    status: int = 200
+
+
+def request_label(url: str, key: RequestKey) -> str:
+    """
+    Returns a readable key for an archived request, e.g. "https://host/path?a=1&b=2".
+    """
+    _, params = key
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+class ArchiveWriter:
+    """
+    Appends the responses of one cycle to an archive file.
+
+    Bodies are compressed one by one as they arrive, so memory does not depend on
+    the size of the cycle. The index and trailer are written by close(), which
+    then renames the file into place; an archive that was never closed is not
+    listed.
+    """
+    def __init__(self, path: str, level: int = 6) -> None:
+        """
+        Creates the archive file.
+
+        Args:
+            path (str): Final path of the archive.
+            level (int): zlib compression level.
+        """
+        self.path = path
+        self.level = level
+        self.entries: List[ArchiveEntry] = []
+        self.raw_bytes = 0
+        self._file: Optional[BinaryIO] = open(path + ".tmp", "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, time.time()))
+        self._offset = HEADER.size
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def add(self, source: str, key: str, content: bytes, started: float = 0.0, elapsed: float = 0.0,
+            status: int = 200) -> None:
+        """
+        Archives one response body.
+
+        Args:
+            source (str): Source the response belongs to (e.g. "esfera").
+            key (str): Request the response answers (see request_label).
+            content (bytes): Raw response body.
+            started (float): Unix time the request was sent.
+            elapsed (float): Seconds until the response body was received.
+            status (int): HTTP status (0 if no response arrived).
+        """
+        compressed = zlib.compress(content, self.level)
+        with self._lock:
+            if self._file is None:
+                raise ValueError("archive is closed")
+            self._file.write(compressed)
+            self.entries.append(ArchiveEntry(source, key, self._offset, len(compressed), len(content),
+                                             zlib.crc32(content), started, elapsed, status))
+            self._offset += len(compressed)
+            self.raw_bytes += len(content)
+
+    def hook(self, source: str) -> Callable[[str, RequestKey, bytes], None]:
+        """
+        Returns a RestApiClient response hook that archives the responses under a source.
+        """
+        return lambda url, key, content: self.add(source, request_label(url, key), content)
+
+    def recorder(self, source: str) -> Callable[[Exchange], None]:
+        """
+        Returns a RestApiClient recorder that archives every exchange, with its timing, under a source.
+        """
+        return lambda exchange: self.add(source, request_label(exchange.url, exchange.key), exchange.content,
+                                         exchange.started, exchange.elapsed, exchange.status)
+
+    def close(self) -> None:
+        """
+        Writes the index and the trailer and moves the archive into place.
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            index = zlib.compress(json_codec.dumps([list(entry) for entry in self.entries]), self.level)
+            self._file.write(index)
+            self._file.write(TRAILER.pack(self._offset, len(index), MAGIC))
+            self._file.close()
+            self._file = None
+        os.replace(self.path + ".tmp", self.path)
+
+    @property
+    def size(self) -> int:
+        """
+        Returns the size of the archive file in bytes.
+        """
+        return os.path.getsize(self.path if self._file is None else self.path + ".tmp")
+
+
+class ArchiveReader:
+    """
+    Random access to the responses of an archived cycle.
+
+    Opening an archive reads only the trailer and the index; reading a response
+    seeks to its record and decompresses that record alone.
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Opens an archive and reads its index.
+
+        Raises:
+            ValueError: If the file is not a complete archive of this version.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            magic, version, _, self.created = HEADER.unpack(header)
+            if magic != MAGIC or not 1 <= version <= VERSION:
+                raise ValueError(f"{path} is not a response archive of version {VERSION} or earlier")
+            f.seek(-TRAILER.size, os.SEEK_END)
+            index_offset, index_length, trailer_magic = TRAILER.unpack(f.read(TRAILER.size))
+            if trailer_magic != MAGIC:
+                raise ValueError(f"{path} is incomplete")
+            f.seek(index_offset)
+            self.entries = [ArchiveEntry(*row) for row in json_codec.loads(zlib.decompress(f.read(index_length)))]
+
+    def read_entry(self, entry: ArchiveEntry) -> bytes:
+        """
+        Returns the raw body of an archived response.
+
+        Raises:
+            ValueError: If the record does not match its checksum.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(entry.offset)
+            content = zlib.decompress(f.read(entry.length))
+        if zlib.crc32(content) != entry.crc:
+            raise ValueError(f"{entry.key} is corrupt in {self.path}")
+        return content
+
+    def find(self, source: str, key: Optional[str] = None) -> List[ArchiveEntry]:
+        """
+        Returns the entries of a source, optionally only those whose key contains key.
+        """
+        return [entry for entry in self.entries if entry.source == source and (key is None or key in entry.key)]
+
+    def read(self, source: str, key: Optional[str] = None) -> List[bytes]:
+        """
+        Returns the raw bodies of a source's responses (see find), in the order they were archived.
+        """
+        return [self.read_entry(entry) for entry in self.find(source, key)]
+
+
+class ResponseArchive:
+    """
+    Directory of per-cycle response archives ("<cycle>.rza"), keeping the newest ones.
+    """
+    def __init__(self, directory: str, retain: int = 96, level: int = 6) -> None:
+        """
+        Initializes the archive directory (created if missing).
+
+        Args:
+            directory (str): Directory of the archive files.
+            retain (int): Number of cycles kept; older archives are deleted when a cycle is closed.
+            level (int): zlib compression level.
+        """
+        self.directory = directory
+        self.retain = retain
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, cycle: str) -> str:
+        """
+        Returns the path of a cycle's archive.
+        """
+        return os.path.join(self.directory, cycle + EXTENSION)
+
+    def cycles(self) -> List[str]:
+        """
+        Returns the archived cycles, oldest first.
+        """
+        return sorted(name[:-len(EXTENSION)] for name in os.listdir(self.directory) if name.endswith(EXTENSION))
+
+    def open_cycle(self, cycle: Optional[str] = None) -> ArchiveWriter:
+        """
+        Starts the archive of a cycle (named after the current time by default).
+        """
+        return ArchiveWriter(self.path(cycle or time.strftime("%Y%m%dT%H%M%S")), self.level)
+
+    def open(self, cycle: str) -> ArchiveReader:
+        """
+        Opens the archive of a cycle for reading.
+        """
+        return ArchiveReader(self.path(cycle))
+
+    def prune(self) -> None:
+        """
+        Deletes the archives beyond the newest retain cycles.
+        """
+        for cycle in self.cycles()[:-self.retain] if self.retain else []:
+            try:
+                os.remove(self.path(cycle))
+            except OSError as e:
+                logging.warning(f"Could not delete archive {cycle}: {e}")
@@ -0,0 +1,192 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+# "X pontos por real" and its variants; numbers that are part of dates are not matched.
+_POINTS_PATTERNS = [re.compile(pattern) for pattern in (
+    r'(\d+)\s+pontos\s+por\s+real',
+    r'(\d+)\s+pontos\s+por\s+R\$\s*1',
+    r'(\d+)\s+pontos\s+a\s+cada\s+real',
+    r'(\d+)\s+pontos\s+a\s+cada\s+R\$\s*1',
+)]
+# Campaign dates, ex: "de 1 a 30/04/2023"
+_CAMPAIGN_RE = re.compile(r'de (\d{1,2}) a (\d{1,2}/\d{2}/\d{2,4})')
+_NUMBER_RE = re.compile(r'\d+')
+
+
+class SentenceAnalysis(NamedTuple):
+    """
+    Everything extracted from one sentence of legal terms.
+    """
+    sentence: str
+    points: Tuple[int, ...]
+    numbers: Tuple[str, ...]
+    campaign: Optional[Tuple[date, date]]
+    other_categories: bool
+
+
+def normalise_sentence(sentence: str) -> str:
+    """
+    Normalises a sentence for caching (surrounding and repeated whitespace removed).
+    """
+    return " ".join(sentence.split())
+
+
+class SentenceAnalysisCache:
+    """
+    Analyses legal-terms sentences once and shares the result.
+
+    Legal terms are mostly boilerplate repeated across partners and polls ("Consulte
+    o regulamento", payment conditions, crediting deadlines), so each normalised
+    sentence is analysed the first time it is seen and the result, including the
+    interned sentence, is reused afterwards. Category lookups are cached per
+    (sentence, categories) pair. The least recently used sentences are evicted once
+    max_sentences is reached.
+
+    The cache is shared by the pipeline's worker threads, so every access to the
+    dictionaries is done under a lock; the analysis itself runs outside of it.
+    """
+    def __init__(self, max_sentences: int = 65536) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            max_sentences (int): Maximum number of analysed sentences kept.
+        """
+        self.max_sentences = max_sentences
+        self.hits = 0
+        self.misses = 0
+        self.category_hits = 0
+        self.category_misses = 0
+        self._analyses: "OrderedDict[str, SentenceAnalysis]" = OrderedDict()
+        self._categories: "OrderedDict[Hashable, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._analyses)
+
+    def clear(self) -> None:
+        """
+        Drops every cached analysis and resets the counters.
+        """
+        with self._lock:
+            self._analyses.clear()
+            self._categories.clear()
+            self.hits = self.misses = self.category_hits = self.category_misses = 0
+
+    @staticmethod
+    def _analyse(sentence: str) -> SentenceAnalysis:
+        points = []
+        for pattern in _POINTS_PATTERNS:
+            match = pattern.search(sentence)
+            if match:
+                points.append(int(match.group(1)))
+        campaign = None
+        date_match = _CAMPAIGN_RE.search(sentence)
+        if date_match:
+            try:
+                from_day = int(date_match.group(1))
+                to_date_str = date_match.group(2)
+                from_date_str = f"{from_day:02d}/{to_date_str.split('/')[1]}/{to_date_str.split('/')[2]}"
+                campaign = (datetime.strptime(from_date_str, '%d/%m/%Y').date(),
+                            datetime.strptime(to_date_str, '%d/%m/%Y').date())
+            except (ValueError, IndexError) as e:
+                print(f"Error parsing date in sentence '{sentence}': {e}")
+        return SentenceAnalysis(sentence, tuple(points), tuple(_NUMBER_RE.findall(sentence)), campaign,
+                                'demais categorias' in sentence)
+
+    def analyse(self, sentence: str) -> SentenceAnalysis:
+        """
+        Returns the analysis of a sentence, computing it only on the first request.
+
+        Args:
+            sentence (str): A sentence (or sub-sentence) of legal terms.
+
+        Returns:
+            SentenceAnalysis: Points per real, raw numbers, campaign dates and whether
+                the sentence refers to "demais categorias".
+        """
+        key = normalise_sentence(sentence)
+        with self._lock:
+            analysis = self._analyses.get(key)
+            if analysis is not None:
+                self.hits += 1
+                self._analyses.move_to_end(key)
+                return analysis
+            self.misses += 1
+        analysis = self._analyse(key)
+        with self._lock:
+            # Another thread may have analysed the same sentence meanwhile: keep a single copy.
+            analysis = self._analyses.setdefault(key, analysis)
+            if len(self._analyses) > self.max_sentences:
+                self._analyses.popitem(last=False)
+        return analysis
+
+    def mentions_any(self, sentence: str, categories: Sequence[str]) -> bool:
+        """
+        Returns True if the sentence contains any of the categories (cached per sentence and categories).
+        """
+        key = (normalise_sentence(sentence), tuple(categories))
+        with self._lock:
+            found = self._categories.get(key)
+            if found is not None:
+                self.category_hits += 1
+                self._categories.move_to_end(key)
+                return found
+            self.category_misses += 1
+        found = any(category in key[0] for category in categories)
+        with self._lock:
+            self._categories[key] = found
+            if len(self._categories) > self.max_sentences:
+                self._categories.popitem(last=False)
+        return found
+
+    def checkpoint(self) -> List[List[Any]]:
+        """
+        Returns the cached analyses as JSON-serialisable rows, least recently used first.
+        """
+        with self._lock:
+            analyses = list(self._analyses.values())
+        return [[analysis.sentence, list(analysis.points), list(analysis.numbers),
+                 [day.isoformat() for day in analysis.campaign] if analysis.campaign else None,
+                 analysis.other_categories]
+                for analysis in analyses]
+
+    def restore(self, rows: List[List[Any]]) -> None:
+        """
+        Adds the analyses of a checkpoint() to the cache.
+        """
+        analyses = []
+        for sentence, points, numbers, campaign, other_categories in rows[-self.max_sentences:]:
+            if campaign:
+                campaign = (date.fromisoformat(campaign[0]), date.fromisoformat(campaign[1]))
+            analyses.append(SentenceAnalysis(sentence, tuple(points), tuple(numbers), campaign, other_categories))
+        with self._lock:
+            for analysis in analyses:
+                self._analyses[analysis.sentence] = analysis
+            while len(self._analyses) > self.max_sentences:
+                self._analyses.popitem(last=False)
+
+    @property
+    def hit_ratio(self) -> float:
+        """
+        Returns the share of sentence analyses served from the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        """
+        Returns a one-line summary of the cache effectiveness.
+        """
+        category_total = self.category_hits + self.category_misses
+        category_ratio = self.category_hits / category_total if category_total else 0.0
+        return (f"sentence cache: {len(self)} sentences, {self.hits} hits / {self.misses} misses "
+                f"({self.hit_ratio:.1%}); category lookups: {self.category_hits} hits / "
+                f"{self.category_misses} misses ({category_ratio:.1%})")
+
+
+# Shared by every PartnerConfig and by the crawlers, so boilerplate is analysed once per process.
+SENTENCE_CACHE = SentenceAnalysisCache()
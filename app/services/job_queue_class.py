@@ -0,0 +1,241 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from app.services import json_codec
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result BLOB,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+"""
+
+
+class Job(NamedTuple):
+    """
+    A leased job; lease identifies this lease of the job (a job leased again after
+    its lease expired gets a new one).
+    """
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    key: Optional[str]
+    lease: str
+
+
+class JobQueue:
+    """
+    Durable job queue stored in a SQLite file.
+
+    Any number of processes may open the same file: leasing a job happens inside an
+    immediate write transaction, so each job is handed to one worker at a time. A
+    lease expires after lease_seconds (see renewing() for longer jobs); if the worker
+    crashes before completing the job, it becomes available again and is retried, up
+    to max_attempts times. Outcomes are only recorded by the current lease holder, so
+    a stalled worker whose lease was taken over cannot overwrite them.
+
+    Jobs enqueued with an idempotency key are only stored once, so a retried job can
+    safely enqueue its follow-up jobs again.
+    """
+    def __init__(self, path: str, lease_seconds: float = 60, max_attempts: int = 3,
+                 retry_delay: float = 5) -> None:
+        """
+        Opens (and creates, if needed) the queue.
+
+        Args:
+            path (str): SQLite database file.
+            lease_seconds (float): How long a leased job is reserved for its worker.
+            max_attempts (int): Attempts before a job is marked as failed.
+            retry_delay (float): Base delay before a failed job is retried; doubled on every attempt.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        # Autocommit mode: transactions are opened explicitly where needed.
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        self._db.close()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], key: Optional[str] = None, delay: float = 0) -> int:
+        """
+        Adds a job to the queue.
+
+        Args:
+            kind (str): Job type, used by workers to pick a handler.
+            payload (Dict[str, Any]): JSON-serialisable job arguments.
+            key (Optional[str]): Idempotency key; a job with the same key is only stored once.
+            delay (float): Seconds before the job becomes available.
+
+        Returns:
+            int: The id of the new job, or of the existing job with the same key.
+        """
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO jobs (kind, payload, idempotency_key, available_at) VALUES (?, ?, ?, ?)",
+            (kind, json_codec.dumps(payload), key, time.time() + delay))
+        if cursor.rowcount == 0:
+            return self._db.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()[0]
+        return cursor.lastrowid
+
+    def lease(self, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+        """
+        Reserves the oldest available job.
+
+        Jobs whose lease expired (their worker died or stalled) are available again,
+        unless they have used up max_attempts: those are marked as failed.
+
+        Args:
+            kinds (Optional[Iterable[str]]): Only lease jobs of these types.
+
+        Returns:
+            Optional[Job]: The leased job, or None if there is nothing to do.
+        """
+        now = time.time()
+        query = ("SELECT id, kind, payload, attempts, idempotency_key FROM jobs "
+                 "WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?))")
+        params: List[Any] = [PENDING, now, LEASED, now]
+        if kinds is not None:
+            kinds = list(kinds)
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params += kinds
+        query += " ORDER BY id LIMIT 1"
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute("UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL "
+                             "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                             (FAILED, "lease expired on the last attempt", LEASED, now, self.max_attempts))
+            row = self._db.execute(query, params).fetchone()
+            if row is None:
+                self._db.execute("COMMIT")
+                return None
+            job_id, kind, payload, attempts, key = row
+            lease = f"{self.owner}:{uuid.uuid4().hex}"
+            self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ? WHERE id = ?",
+                (LEASED, lease, now + self.lease_seconds, job_id))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return Job(job_id, kind, json_codec.loads(payload), attempts + 1, key, lease)
+
+    def _extend(self, db: sqlite3.Connection, job: Job) -> bool:
+        return db.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                          (time.time() + self.lease_seconds, job.id, job.lease, LEASED)).rowcount > 0
+
+    def extend(self, job: Job) -> bool:
+        """
+        Renews the lease of a job that is still being worked on; False if the lease was lost.
+        """
+        return self._extend(self._db, job)
+
+    @contextmanager
+    def renewing(self, job: Job) -> Iterator[None]:
+        """
+        Keeps a job's lease renewed while the block runs, so a job slower than lease_seconds
+        is not leased (and run) a second time.
+
+        The lease is renewed every third of lease_seconds from a background thread, with its
+        own connection (SQLite connections stay in the thread that opened them).
+        """
+        stop = threading.Event()
+
+        def renew() -> None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                while not stop.wait(max(self.lease_seconds / 3, 0.01)):
+                    self._extend(db, job)
+            finally:
+                db.close()
+
+        thread = threading.Thread(target=renew, daemon=True, name=f"lease-{job.id}")
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _finish(self, job: Job, assignments: str, values: Iterable[Any]) -> bool:
+        # Only the current lease holder may record an outcome.
+        return self._db.execute(f"UPDATE jobs SET {assignments}, lease_owner = NULL, lease_expires = NULL "
+                                "WHERE id = ? AND lease_owner = ?", (*values, job.id, job.lease)).rowcount > 0
+
+    def complete(self, job: Job, result: Any = None) -> bool:
+        """
+        Marks a job as done and stores its JSON-serialisable result; False if the lease was lost.
+        """
+        return self._finish(job, "status = ?, result = ?", (DONE, json_codec.dumps(result)))
+
+    def fail(self, job: Job, error: str) -> bool:
+        """
+        Records a failed attempt; the job is retried with exponential backoff until max_attempts.
+
+        Returns:
+            bool: False if the lease was lost (the outcome was not recorded).
+        """
+        if job.attempts >= self.max_attempts:
+            return self._finish(job, "status = ?, error = ?", (FAILED, error))
+        delay = self.retry_delay * 2 ** (job.attempts - 1)
+        return self._finish(job, "status = ?, error = ?, available_at = ?", (PENDING, error, time.time() + delay))
+
+    def postpone(self, job: Job, delay: float) -> bool:
+        """
+        Returns a job to the queue without counting the attempt (e.g. its inputs are not ready yet).
+
+        Returns:
+            bool: False if the lease was lost.
+        """
+        return self._finish(job, "status = ?, attempts = attempts - 1, available_at = ?",
+                            (PENDING, time.time() + delay))
+
+    def outstanding(self, key_prefix: str = "") -> int:
+        """
+        Returns the number of pending or leased jobs whose idempotency key starts with key_prefix.
+        """
+        return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?) "
+                                "AND substr(idempotency_key, 1, ?) = ?",
+                                (PENDING, LEASED, len(key_prefix), key_prefix)).fetchone()[0]
+
+    def results(self, kind: str, key_prefix: str = "") -> List[Any]:
+        """
+        Returns the results of the finished jobs of a type whose idempotency key starts with key_prefix.
+        """
+        rows = self._db.execute("SELECT result FROM jobs WHERE status = ? AND kind = ? AND substr(idempotency_key, 1, ?) = ? "
+                                "ORDER BY id", (DONE, kind, len(key_prefix), key_prefix))
+        return [json_codec.loads(result) for result, in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of jobs per status.
+        """
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
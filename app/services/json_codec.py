@@ -0,0 +1,95 @@
+"""
+JSON codec used everywhere the project reads or writes JSON.
+
+orjson is used when it is installed; otherwise the standard library json module is
+used. Decoding accepts bytes directly, so HTTP bodies and files do not need to be
+turned into text first. Encoding always returns UTF-8 bytes.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# orjson.JSONDecodeError is a subclass of json.JSONDecodeError, so callers can catch this
+# regardless of the backend in use.
+JSONDecodeError = json.JSONDecodeError
+
+Data = Union[bytes, bytearray, memoryview, str]
+
+
+def _default(value: Any) -> Any:
+    """
+    Converts values the encoders do not handle natively.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        # NamedTuples (e.g. AccumulationRange) are encoded as lists, as the json module does
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def loads(data: Data) -> Any:
+    """
+    Decodes a JSON document from bytes or text.
+
+    Args:
+        data (Data): The JSON document.
+
+    Returns:
+        Any: The decoded value.
+
+    Raises:
+        JSONDecodeError: If the document is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(value: Any, indent: bool = False) -> bytes:
+    """
+    Encodes a value as UTF-8 JSON.
+
+    Args:
+        value (Any): The value to encode; Decimal and date values are supported.
+        indent (bool): Pretty-print with two-space indentation.
+
+    Returns:
+        bytes: The encoded document.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(value, default=_default, ensure_ascii=False,
+                      indent=2 if indent else None).encode("utf-8")
+
+
+def load(path: str) -> Any:
+    """
+    Reads and decodes a JSON file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        JSONDecodeError: If the file is not valid JSON.
+    """
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump(value: Any, path: str, indent: bool = False) -> None:
+    """
+    Encodes a value and writes it to a JSON file.
+    """
+    with open(path, "wb") as f:
+        f.write(dumps(value, indent=indent))
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from app.accumulation_parser import from_fixed
+from app.earn_rate_index_class import ALL_CATEGORIES, EarnRate, EarnRateIndex
+from app.partner_identity_map_class import canonical_name
+from app.promotions_index_class import PromotionsIndex
+from app.services import json_codec
+
+
+def _earn_rates_response(rates: List[EarnRate]) -> Tuple[bytes, str]:
+    body = json_codec.dumps([{**rate._asdict(), "points": float(from_fixed(rate.points))} for rate in rates])
+    return body, '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """
+    Serves the read-only endpoints from the server's current PromotionsIndex.
+
+    Endpoints:
+        GET /promotions?min_points=N
+        GET /partners/<code or name>
+        GET /campaigns/active
+        GET /earn-rates/top?k=N&category=C
+        GET /earn-rates/partners/<name>?category=C
+    """
+    server: "QueryApiServer"
+
+    def do_GET(self) -> None:
+        # Read the reference once: the crawler may publish a new index at any time.
+        index = self.server.index
+        url = urlparse(self.path)
+        response: Optional[Tuple[bytes, str]] = None
+
+        if url.path == "/promotions":
+            try:
+                min_points = float(parse_qs(url.query).get("min_points", ["0"])[0])
+            except ValueError:
+                self._send_error(400, "min_points must be a number")
+                return
+            response = index.promotions(min_points)
+        elif url.path.startswith("/partners/"):
+            response = index.partner(unquote(url.path[len("/partners/"):]))
+        elif url.path == "/campaigns/active":
+            response = index.active_campaigns()
+        elif url.path.startswith("/earn-rates/") and self.server.earn_rates is not None:
+            query = parse_qs(url.query)
+            category = canonical_name(query.get("category", [ALL_CATEGORIES])[0])
+            if url.path == "/earn-rates/top":
+                try:
+                    k = int(query.get("k", ["20"])[0])
+                except ValueError:
+                    self._send_error(400, "k must be an integer")
+                    return
+                response = _earn_rates_response(self.server.earn_rates.top(k, category))
+            elif url.path.startswith("/earn-rates/partners/"):
+                partner_id = canonical_name(unquote(url.path[len("/earn-rates/partners/"):]))
+                rates = self.server.earn_rates.best(partner_id, category)
+                response = _earn_rates_response(rates) if rates else None
+
+        if response is None:
+            self._send_error(404, "not found")
+            return
+
+        body, etag = response
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        body = ('{"error": "' + message + '"}').encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep the tracker's stdout for crawl output.
+        pass
+
+
+class QueryApiServer(ThreadingHTTPServer):
+    """
+    Small read-only HTTP API over the latest PromotionsIndex.
+
+    The crawler publishes a freshly built index after every cycle; publishing only
+    swaps a reference, so requests never wait for the crawler. The earn-rate
+    endpoints read the EarnRateIndex the crawler keeps up to date, if one is set.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080,
+                 index: Optional[PromotionsIndex] = None, earn_rates: Optional[EarnRateIndex] = None) -> None:
+        """
+        Initializes the server (it is not started until start() is called).
+
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind; 0 picks a free port.
+            index (Optional[PromotionsIndex]): Initial index; an empty one is used if omitted.
+            earn_rates (Optional[EarnRateIndex]): Cross-program earn-rate index served under /earn-rates.
+        """
+        super().__init__((host, port), _QueryHandler)
+        self.index = index or PromotionsIndex([])
+        self.earn_rates = earn_rates
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, index: PromotionsIndex) -> None:
+        """
+        Atomically replaces the index served by the API.
+        """
+        self.index = index
+
+    def start(self) -> None:
+        """
+        Serves requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops serving requests and closes the socket.
+        """
+        self.shutdown()
+        self.server_close()
@@ -1,20 +1,127 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 import requests
-from typing import Dict, Any, Optional, Union
+from urllib3.util.request import ACCEPT_ENCODING
+from app.services import json_codec
+from typing import Callable, Dict, Any, List, NamedTuple, Optional, Tuple, Union
+
+RequestKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Validator(NamedTuple):
+    """
+    HTTP validators of a GET response, with the body they validate.
+    """
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content: bytes
+
+class Exchange(NamedTuple):
+    """
+    A GET request and its response, as captured in record mode.
+
+    started is the Unix time the request was sent and elapsed the seconds until its
+    body was received; status is 0 when no response arrived. A 304 carries the
+    remembered body it stands for.
+    """
+    url: str
+    key: RequestKey
+    started: float
+    elapsed: float
+    status: int
+    content: bytes
 
 class RestApiClient:
     """
     A simple REST API client that performs HTTP requests and returns JSON responses.
+
+    Concurrent identical GET requests (same URL and parameters) are coalesced: the
+    first caller performs the request and every other caller waiting at the same
+    time receives the same parsed result. The result object is shared, so callers
+    must treat it as read-only.
+
+    GET responses carrying an ETag or Last-Modified header are remembered; the next
+    identical request is made conditional and a 304 reuses the remembered body.
+
+    Compressed transfer is requested explicitly with every encoding the installed
+    urllib3 can decode (gzip and deflate, plus br and zstd when brotli or zstandard
+    are installed); bytes_transferred counts what actually crossed the wire.
+    Response hooks receive the raw body of every successful GET (e.g. to archive it).
+
+    In record mode (any recorder registered) every GET exchange, failed ones
+    included, is passed to the recorders with its timing, so a cycle can be
+    replayed offline (see cycle_replay_class).
     """
-    def __init__(self, base_url: str = "", headers: Optional[Dict[str, str]] = None) -> None:
+    def __init__(self, base_url: str = "", headers: Optional[Dict[str, str]] = None,
+                 pool_size: int = 10, coalesce: bool = True,
+                 timeout: Optional[Union[float, Tuple[float, float]]] = (5, 30),
+                 max_validators: int = 1024) -> None:
         """
         Initializes the REST API client.
 
+        Requests go through a pooled session, so concurrent calls reuse keep-alive connections.
+
         Args:
             base_url (str): Base URL for the API endpoints.
             headers (Optional[Dict[str, str]]): Optional headers to include in each request.
+            pool_size (int): Maximum number of connections kept open per host.
+            coalesce (bool): Share in-flight GET requests between concurrent callers.
+            timeout (Optional[Union[float, Tuple[float, float]]]): Connect and read timeouts in seconds, so a
+                stalled upstream cannot hang a request forever (None waits indefinitely).
+            max_validators (int): Maximum number of responses remembered for conditional requests.
         """
         self.base_url = base_url
-        self.headers = headers or {}
+        self.headers = {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.coalesce = coalesce
+        self.timeout = timeout
+        self.coalesced_requests = 0
+        # Decoded response bodies received by GET requests, and their size on the wire.
+        self.bytes_received = 0
+        self.bytes_transferred = 0
+        self.response_hooks: List[Callable[[str, RequestKey, bytes], None]] = []
+        self.recorders: List[Callable[[Exchange], None]] = []
+        self.not_modified = 0
+        self.max_validators = max_validators
+        self._validators: "OrderedDict[RequestKey, Validator]" = OrderedDict()
+        self._inflight: Dict[RequestKey, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def _request_key(url: str, params: Optional[Dict[str, Any]]) -> RequestKey:
+        return url, tuple(sorted((str(key), str(value)) for key, value in (params or {}).items()))
+
+    def _join_or_lead(self, url: str, params: Optional[Dict[str, Any]]) -> Tuple[Future, bool]:
+        """
+        Returns the in-flight future for a request and whether the caller must perform it.
+        """
+        key = self._request_key(url, params)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced_requests += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _lead(self, future: Future, url: str, params: Optional[Dict[str, Any]]) -> None:
+        """
+        Performs the request for every waiter of the future and releases the in-flight slot.
+        """
+        try:
+            future.set_result(self._get(url, params))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(self._request_key(url, params), None)
 
     def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Optional[Union[Dict[str, Any], list]]:
         """
@@ -28,17 +135,134 @@ class RestApiClient:
             Optional[Union[Dict[str, Any], list]]: Parsed JSON response if successful; otherwise, None.
         """
         url = self.base_url + endpoint
+        if not self.coalesce:
+            return self._get(url, params)
+        future, leader = self._join_or_lead(url, params)
+        if leader:
+            self._lead(future, url, params)
+        return future.result()
+
+    async def get_async(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Optional[Union[Dict[str, Any], list]]:
+        """
+        Asyncio version of get; the request runs in the loop's default executor.
+
+        In-flight requests are shared with threaded callers of get as well.
+
+        Args:
+            endpoint (str): API endpoint (relative or absolute) to call.
+            params (Optional[Dict[str, Any]]): Query parameters for the request.
+
+        Returns:
+            Optional[Union[Dict[str, Any], list]]: Parsed JSON response if successful; otherwise, None.
+        """
+        loop = asyncio.get_running_loop()
+        url = self.base_url + endpoint
+        if not self.coalesce:
+            return await loop.run_in_executor(None, self._get, url, params)
+        future, leader = self._join_or_lead(url, params)
+        if leader:
+            loop.run_in_executor(None, self._lead, future, url, params)
+        return await asyncio.wrap_future(future)
+
+    def _conditional_headers(self, key: RequestKey) -> Tuple[Dict[str, str], Optional[Validator]]:
+        with self._inflight_lock:
+            validator = self._validators.get(key)
+            if validator is not None:
+                self._validators.move_to_end(key)
+        if validator is None:
+            return self.headers, None
+        headers = dict(self.headers)
+        if validator.etag:
+            headers["If-None-Match"] = validator.etag
+        if validator.last_modified:
+            headers["If-Modified-Since"] = validator.last_modified
+        return headers, validator
+
+    def _remember(self, key: RequestKey, response: requests.Response) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._inflight_lock:
+            if etag or last_modified:
+                self._validators[key] = Validator(etag, last_modified, response.content)
+                self._validators.move_to_end(key)
+                if len(self._validators) > self.max_validators:
+                    self._validators.popitem(last=False)
+            else:
+                self._validators.pop(key, None)
+
+    @staticmethod
+    def _wire_size(response: requests.Response) -> int:
+        """
+        Returns the number of body bytes received for a response, before decompression.
+        """
+        raw = getattr(response, "raw", None)
+        if raw is not None and hasattr(raw, "tell"):
+            try:
+                return raw.tell()
+            except (OSError, ValueError):
+                pass
+        if response.headers.get("Content-Encoding") and response.headers.get("Content-Length", "").isdigit():
+            return int(response.headers["Content-Length"])
+        return len(response.content)
+
+    def _record(self, url: str, key: RequestKey, started: float, clock: float, status: int, content: bytes) -> None:
+        exchange = Exchange(url, key, started, time.perf_counter() - clock, status, content)
+        for recorder in self.recorders:
+            recorder(exchange)
+
+    def _get(self, url: str, params: Optional[Dict[str, Any]]) -> Optional[Union[Dict[str, Any], list]]:
+        key = self._request_key(url, params)
+        headers, validator = self._conditional_headers(key)
+        started, clock = time.time(), time.perf_counter()
         try:
-            response = requests.get(url, params=params, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+            response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and validator is not None:
+                with self._inflight_lock:
+                    self.not_modified += 1
+                content = validator.content
+            else:
+                response.raise_for_status()
+                content = response.content
+                with self._inflight_lock:
+                    self.bytes_received += len(content)
+                    self.bytes_transferred += self._wire_size(response)
+                self._remember(key, response)
+            if self.recorders:
+                self._record(url, key, started, clock, response.status_code, content)
+            for hook in self.response_hooks:
+                hook(url, key, content)
+            return json_codec.loads(content)
         except requests.RequestException as e:
+            if self.recorders:
+                failed = getattr(e, "response", None)
+                self._record(url, key, started, clock, failed.status_code if failed is not None else 0,
+                             failed.content if failed is not None else b"")
             print(f"GET request failed for {url}: {e}")
             return None
         except ValueError:
             print("The response content is not valid JSON.")
             return None
 
+    def checkpoint(self) -> List[List[Any]]:
+        """
+        Returns the remembered validators as JSON-serialisable rows, least recently used first.
+        """
+        with self._inflight_lock:
+            return [[url, [list(pair) for pair in params], validator.etag, validator.last_modified,
+                     validator.content.decode("utf-8")]
+                    for (url, params), validator in self._validators.items()]
+
+    def restore(self, rows: List[List[Any]]) -> None:
+        """
+        Adds the validators of a checkpoint() to the client.
+        """
+        with self._inflight_lock:
+            for url, params, etag, last_modified, content in rows[-self.max_validators:]:
+                key = (url, tuple((name, value) for name, value in params))
+                self._validators[key] = Validator(etag, last_modified, content.encode("utf-8"))
+            while len(self._validators) > self.max_validators:
+                self._validators.popitem(last=False)
+
     def post(self, endpoint: str, data: Optional[Any] = None, json_data: Optional[Dict[str, Any]] = None) -> Optional[Union[Dict[str, Any], list]]:
         """
         Performs a POST request to the specified endpoint.
@@ -53,9 +277,10 @@ class RestApiClient:
         """
         url = self.base_url + endpoint
         try:
-            response = requests.post(url, data=data, json=json_data, headers=self.headers)
+            response = self.session.post(url, data=data, json=json_data, headers=self.headers,
+                                         timeout=self.timeout)
             response.raise_for_status()
-            return response.json()
+            return json_codec.loads(response.content)
         except requests.RequestException as e:
             print(f"POST request failed for {url}: {e}")
             return None
@@ -0,0 +1,465 @@
+"""
+Partner sources for the streaming pipeline.
+
+Each source knows how to fetch raw records from its program's API, normalise them
+into PartnerConfig fields and build the analysed PartnerConfig.
+"""
+import inspect
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from .esfera_partners_list import EsferaPartnersList
+from .partnersconfig_class import PartnerConfig
+from .services import json_codec
+from .services.restapi_class import RestApiClient
+from .thread_pool_runner_class import ThreadPoolRunner
+
+LIVELO_BASE_URL = "https://apis.pontoslivelo.com.br"
+LIVELO_PARITIES_ENDPOINT = "/api-bff-partners-parities/v1/parities/active"
+ESFERA_BASE_URL = "https://www.esfera.com.vc"
+ESFERA_PRODUCTS_ENDPOINT = "/ccstoreui/v1/products"
+ESFERA_PARTNERS_CATEGORY = "esf02163"
+
+# Defaults for splitting Livelo partner codes: a chunk is closed when it reaches either
+# limit, keeping the query string well below common URL-length limits.
+LIVELO_CHUNK_SIZE = 40
+LIVELO_MAX_QUERY_LENGTH = 1500
+
+# Number of recent fetches whose outcome EsferaTargetedSource keeps in refresh_stats.
+REFRESH_STATS_KEPT = 48
+
+# Keyword arguments accepted by PartnerConfig, used to drop unknown API fields.
+_PARTNER_CONFIG_FIELDS = frozenset(inspect.signature(PartnerConfig.__init__).parameters) - {"self"}
+
+
+def chunk_codes(codes: List[str], chunk_size: int = LIVELO_CHUNK_SIZE,
+                max_query_length: int = LIVELO_MAX_QUERY_LENGTH) -> List[List[str]]:
+    """
+    Splits partner codes into chunks for the comma-joined "partnersCodes" parameter.
+
+    Duplicated and empty codes are dropped. A chunk is closed when it holds chunk_size
+    codes or when adding another code would make the joined value longer than
+    max_query_length characters.
+
+    Args:
+        codes (List[str]): Partner codes.
+        chunk_size (int): Maximum number of codes per chunk.
+        max_query_length (int): Maximum length of the joined codes of a chunk.
+
+    Returns:
+        List[List[str]]: The chunks, in the original code order.
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    seen: Set[str] = set()
+    for code in codes:
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        added_length = len(code) + (1 if current else 0)
+        if current and (len(current) >= chunk_size or length + added_length > max_query_length):
+            chunks.append(current)
+            current, length, added_length = [], 0, len(code)
+        current.append(code)
+        length += added_length
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ChunkStat(NamedTuple):
+    """
+    Outcome of a single Livelo chunk request.
+    """
+    codes: int
+    records: int
+    seconds: float
+    failed: bool = False
+
+
+class LiveloSource:
+    """
+    Source for Livelo active parities, matched against watch stores by partner code.
+
+    Partner codes are split into chunks that are requested concurrently over the
+    client's pooled session. Records are yielded as each chunk completes and are
+    de-duplicated by partner code.
+    """
+    program = "livelo"
+    match_field = "code"
+
+    def __init__(self, partner_codes: List[str], client: Optional[RestApiClient] = None,
+                 chunk_size: int = LIVELO_CHUNK_SIZE, max_query_length: int = LIVELO_MAX_QUERY_LENGTH,
+                 max_workers: int = 4) -> None:
+        """
+        Initializes the Livelo source.
+
+        Args:
+            partner_codes (List[str]): Livelo partner codes to fetch.
+            client (Optional[RestApiClient]): Client to use; one pointing to the Livelo API is created if omitted.
+            chunk_size (int): Maximum number of codes per request.
+            max_query_length (int): Maximum length of the joined codes per request.
+            max_workers (int): Maximum number of chunk requests in flight.
+        """
+        self.partner_codes = partner_codes
+        self.client = client or RestApiClient(base_url=LIVELO_BASE_URL, headers={"accept": "application/json"},
+                                              pool_size=max_workers)
+        self.chunk_size = chunk_size
+        self.max_query_length = max_query_length
+        self.max_workers = max_workers
+        self.chunk_stats: List[ChunkStat] = []
+        self.complete = False
+
+    def chunks(self) -> List[List[str]]:
+        """
+        Returns the partner code chunks requested by fetch().
+        """
+        return chunk_codes(self.partner_codes, self.chunk_size, self.max_query_length)
+
+    def fetch_chunk(self, codes: List[str]) -> List[Dict[str, Any]]:
+        """
+        Requests the parity records of one chunk of partner codes.
+        """
+        start = time.perf_counter()
+        data = self.client.get(LIVELO_PARITIES_ENDPOINT, params={"partnersCodes": ",".join(codes)})
+        records = data if isinstance(data, list) else []
+        stat = ChunkStat(len(codes), len(records), time.perf_counter() - start, not isinstance(data, list))
+        self.chunk_stats.append(stat)
+        logging.info(f"Livelo chunk: {stat.codes} codes, {stat.records} records in {stat.seconds:.3f}s")
+        return records
+
+    def fetch(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the raw parity records for the configured partner codes.
+
+        Per-chunk latency is available in ``chunk_stats`` once the fetch has finished, and
+        ``complete`` tells whether every chunk was received.
+        """
+        self.chunk_stats = []
+        self.complete = False
+        chunks = self.chunks()
+        if not chunks:
+            self.complete = True
+            return
+        seen: Set[str] = set()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            futures = [executor.submit(self.fetch_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for record in future.result():
+                    code = record.get("partnerCode")
+                    if code in seen:
+                        continue
+                    seen.add(code)
+                    yield record
+        self.complete = not any(stat.failed for stat in self.chunk_stats)
+
+    def normalise(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keeps only the fields PartnerConfig understands.
+        """
+        return {key: value for key, value in item.items() if key in _PARTNER_CONFIG_FIELDS}
+
+    def analyse(self, record: Dict[str, Any]) -> PartnerConfig:
+        """
+        Builds the analysed PartnerConfig for a normalised record.
+        """
+        return PartnerConfig(**record)
+
+
+class EsferaSource:
+    """
+    Source for the Esfera partner catalogue, matched against watch stores by name.
+
+    The catalogue is requested page by page, so the first partners are available to
+    the next stages before the whole listing has been downloaded. With a runner, the
+    pages after the first one (which gives the total) are requested concurrently and
+    yielded in catalogue order.
+    """
+    program = "esfera"
+    match_field = "name"
+
+    def __init__(self, client: Optional[RestApiClient] = None,
+                 category_id: str = ESFERA_PARTNERS_CATEGORY, page_size: int = 50,
+                 runner: Optional[ThreadPoolRunner] = None, structured: bool = False) -> None:
+        """
+        Initializes the Esfera source.
+
+        Args:
+            client (Optional[RestApiClient]): Client to use; one pointing to the Esfera API is created if omitted.
+            category_id (str): Catalogue category that lists the partner stores.
+            page_size (int): Number of items requested per page.
+            runner (Optional[ThreadPoolRunner]): Thread pool used to request pages concurrently.
+            structured (bool): Read points and campaign windows from the structured catalogue fields
+                when they are consistent (see EsferaPartnersList.transform_item).
+        """
+        self.client = client or RestApiClient(base_url=ESFERA_BASE_URL, headers={"accept": "application/json"},
+                                              pool_size=runner.workers if runner else 10)
+        self.category_id = category_id
+        self.page_size = page_size
+        self.runner = runner
+        self.structured = structured
+        self.complete = False
+
+    def fetch_page(self, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Requests one page of the catalogue.
+
+        Args:
+            offset (int): Index of the first item of the page.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: The page items and the total number of items in the catalogue.
+        """
+        page = self.client.get(ESFERA_PRODUCTS_ENDPOINT,
+                               params={"categoryId": self.category_id, "offset": offset, "limit": self.page_size})
+        if not isinstance(page, dict):
+            return [], 0
+        return page.get("items") or [], page.get("totalResults", 0)
+
+    def fetch(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the raw catalogue items, one page at a time.
+
+        ``complete`` tells, once the fetch has finished, whether every page was received.
+        """
+        self.complete = False
+        items, total = self.fetch_page(0)
+        yield from items
+        if not items:
+            return
+        if self.runner is not None:
+            offsets = range(len(items), total, self.page_size)
+            complete = True
+            for page in self.runner.map_ordered(lambda offset: self.fetch_page(offset)[0], offsets):
+                complete = complete and bool(page)
+                yield from page
+            self.complete = complete
+            return
+        offset = len(items)
+        while offset < total:
+            items, _ = self.fetch_page(offset)
+            if not items:
+                return
+            yield from items
+            offset += len(items)
+        self.complete = True
+
+    def normalise(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cleans the HTML legal terms and accumulation label of a catalogue item.
+        """
+        return EsferaPartnersList.transform_item(item, self.structured)
+
+    def analyse(self, record: Dict[str, Any]) -> PartnerConfig:
+        """
+        Builds the analysed PartnerConfig for a normalised record.
+        """
+        return PartnerConfig.from_esfera_dict(record)
+
+
+def _catalogue_key(item: Dict[str, Any]) -> str:
+    # Catalogue items are identified by product id; the name stands in for items without one.
+    return item.get("id") or item.get("displayName") or ""
+
+
+class RefreshStat(NamedTuple):
+    """
+    Outcome of one EsferaTargetedSource fetch.
+    """
+    mode: str
+    items: int
+    bytes: int
+    seconds: float
+
+
+class EsferaTargetedSource(EsferaSource):
+    """
+    Esfera source that refreshes only the watched partners.
+
+    A full catalogue listing is used to learn the product ids of the watched
+    partners. The following fetches request only those products by id, in
+    concurrent batches, so their cost grows with the watchlist rather than with
+    the catalogue. A full listing is repeated every full_listing_every fetches to
+    discover partners that joined the catalogue (or the watchlist).
+
+    The known ids can be kept in a state file, so short-lived processes such as the
+    crawler benefit as well.
+
+    With keep_catalogue, the items of the last full listing are kept by product id;
+    a targeted refresh replaces the watched ones and yields the others as they were
+    last listed, so consumers that index the whole catalogue (the daemon) keep
+    seeing every partner between full listings.
+    """
+    def __init__(self, is_watched: Callable[[Dict[str, Any]], bool], client: Optional[RestApiClient] = None,
+                 category_id: str = ESFERA_PARTNERS_CATEGORY, page_size: int = 50,
+                 runner: Optional[ThreadPoolRunner] = None, full_listing_every: int = 24,
+                 ids_per_request: int = 20, state_path: Optional[str] = None, structured: bool = False,
+                 keep_catalogue: bool = False) -> None:
+        """
+        Initializes the targeted Esfera source.
+
+        Args:
+            is_watched (Callable[[Dict[str, Any]], bool]): Tells whether a raw catalogue item is watched.
+            client (Optional[RestApiClient]): Client to use; one pointing to the Esfera API is created if omitted.
+            category_id (str): Catalogue category that lists the partner stores.
+            page_size (int): Number of items requested per page in full listings.
+            runner (Optional[ThreadPoolRunner]): Thread pool for concurrent requests; batches use a
+                private pool if omitted.
+            full_listing_every (int): A full listing is done once every this many fetches.
+            ids_per_request (int): Product ids requested per call.
+            state_path (Optional[str]): JSON file where the known product ids are kept between runs.
+            structured (bool): Read points and campaign windows from the structured catalogue fields
+                when they are consistent.
+            keep_catalogue (bool): Keep the last full listing and merge every targeted refresh into it,
+                so that each fetch yields the whole catalogue.
+        """
+        super().__init__(client, category_id, page_size, runner, structured)
+        self.is_watched = is_watched
+        self.keep_catalogue = keep_catalogue
+        self.full_listing_every = full_listing_every
+        self.ids_per_request = ids_per_request
+        self.state_path = state_path
+        self.product_ids: List[str] = []
+        self.fetches_since_full_listing = full_listing_every
+        self.catalogue: Dict[str, Dict[str, Any]] = {}
+        self.targeted = False
+        self.refresh_stats: Deque[RefreshStat] = deque(maxlen=REFRESH_STATS_KEPT)
+        self._load_state()
+
+    def _load_state(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            state = json_codec.load(self.state_path)
+        except (OSError, json_codec.JSONDecodeError) as e:
+            logging.warning(f"Ignoring Esfera targets state {self.state_path}: {e}")
+            return
+        self.restore(state)
+
+    def _save_state(self) -> None:
+        if self.state_path:
+            json_codec.dump(self.checkpoint(), self.state_path)
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        Returns the known product ids and the position in the full-listing schedule.
+        """
+        return {"product_ids": self.product_ids, "fetches_since_full_listing": self.fetches_since_full_listing}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """
+        Restores the state returned by checkpoint().
+        """
+        self.product_ids = list(state.get("product_ids") or [])
+        self.fetches_since_full_listing = int(state.get("fetches_since_full_listing", self.full_listing_every))
+
+    def force_full_listing(self) -> None:
+        """
+        Makes the next fetch list the whole catalogue (e.g. after the watchlist changed).
+        """
+        self.fetches_since_full_listing = self.full_listing_every
+
+    def watch(self, is_watched: Callable[[Dict[str, Any]], bool]) -> None:
+        """
+        Changes which catalogue items are watched (e.g. after a watchlist edit).
+
+        The product ids of the newly watched partners are looked up in the kept
+        catalogue, so no full listing is needed; partners missing from it are found
+        by the next scheduled full listing. Without a kept catalogue, the next fetch
+        lists the whole catalogue.
+        """
+        self.is_watched = is_watched
+        if not self.catalogue:
+            self.force_full_listing()
+            return
+        self.product_ids = [item["id"] for item in self.catalogue.values() if item.get("id") and is_watched(item)]
+
+    def seed_catalogue(self, items: List[Dict[str, Any]]) -> None:
+        """
+        Fills an empty kept catalogue with the items of an earlier fetch (e.g. the last good cache after a restart).
+        """
+        if self.keep_catalogue and not self.catalogue:
+            self.catalogue = {_catalogue_key(item): item for item in items}
+
+    def fetch_products(self, product_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Requests a batch of catalogue items by product id; None if the request failed.
+        """
+        data = self.client.get(ESFERA_PRODUCTS_ENDPOINT, params={"productIds": ",".join(product_ids)})
+        if isinstance(data, dict):
+            return data.get("items") or []
+        return data if isinstance(data, list) else None
+
+    def _full_listing(self) -> Iterator[Dict[str, Any]]:
+        product_ids = []
+        catalogue: Dict[str, Dict[str, Any]] = {}
+        for item in super().fetch():
+            if self.is_watched(item) and item.get("id"):
+                product_ids.append(item["id"])
+            if self.keep_catalogue:
+                catalogue[_catalogue_key(item)] = item
+            yield item
+        self.product_ids = product_ids
+        # A listing cut short by a failed page only adds to the kept catalogue.
+        self.catalogue = catalogue if self.complete else {**self.catalogue, **catalogue}
+        self.fetches_since_full_listing = 1
+
+    def _targeted(self) -> Iterator[Dict[str, Any]]:
+        batches = chunk_codes(self.product_ids, self.ids_per_request)
+        if self.runner is not None:
+            pages = self.runner.map_ordered(self.fetch_products, batches)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max(1, min(4, len(batches))))
+            pages = executor.map(self.fetch_products, batches)
+        returned: Set[str] = set()
+        answered: Set[str] = set()
+        failed = False
+        try:
+            for batch, items in zip(batches, pages):
+                if items is None:
+                    failed = True
+                    continue
+                answered.update(batch)
+                for item in items:
+                    returned.add(item.get("id"))
+                    if self.keep_catalogue:
+                        self.catalogue[_catalogue_key(item)] = item
+                    yield item
+        finally:
+            if self.runner is None:
+                executor.shutdown(wait=False)
+        # Products missing from an answered batch are forgotten until the next full listing; the
+        # products of a failed batch are kept (and served from the kept catalogue).
+        forgotten = answered - returned
+        for product_id in forgotten:
+            self.catalogue.pop(product_id, None)
+        self.product_ids = [product_id for product_id in self.product_ids if product_id not in forgotten]
+        self.fetches_since_full_listing += 1
+        yield from [item for key, item in self.catalogue.items() if key not in returned]
+        self.complete = not failed
+
+    def fetch(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the watched catalogue items, or the whole catalogue when a full listing is due
+        (or always, with keep_catalogue).
+
+        Once the fetch has finished, ``complete`` tells whether every request was answered
+        and ``targeted`` whether only the watched products were requested.
+        """
+        self.complete = False
+        known = self.catalogue if self.keep_catalogue else self.product_ids
+        full = not known or self.fetches_since_full_listing >= self.full_listing_every
+        self.targeted = not full
+        start, start_bytes, count = time.perf_counter(), getattr(self.client, "bytes_received", 0), 0
+        for item in (self._full_listing() if full else self._targeted()):
+            count += 1
+            yield item
+        stat = RefreshStat("full" if full else "targeted", count,
+                           getattr(self.client, "bytes_received", 0) - start_bytes, time.perf_counter() - start)
+        self.refresh_stats.append(stat)
+        logging.info(f"Esfera {stat.mode} refresh: {stat.items} items, {stat.bytes} bytes in {stat.seconds:.3f}s")
+        self._save_state()
@@ -0,0 +1,119 @@
+import contextlib
+import tracemalloc
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+class StageMemory(NamedTuple):
+    """
+    Memory used by one stage, in bytes.
+
+    peak is the highest allocation above the level at the start of the stage,
+    retained is what was still allocated when the stage finished and high_water
+    is the process-wide traced peak reached during the stage.
+    """
+    stage: str
+    peak: int
+    retained: int
+    high_water: int
+    top: List[Tuple[str, int]]
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class StageMemoryTracker:
+    """
+    Opt-in memory instrumentation based on tracemalloc.
+
+    Each stage is wrapped in stage(name); the tracker records the peak and retained
+    bytes of the stage and, optionally, the source lines that allocated the most
+    memory during it (by comparing tracemalloc snapshots taken around the stage).
+
+    Tracing slows Python code down considerably, so this is meant for diagnostic
+    runs only. Stages must run one after the other: tracemalloc counts every
+    thread, so overlapping stages cannot be told apart.
+    """
+    def __init__(self, top_sites: int = 5) -> None:
+        """
+        Initializes the tracker.
+
+        Args:
+            top_sites (int): Number of allocation sites reported per stage (0 skips the snapshots).
+        """
+        self.top_sites = top_sites
+        self.stages: List[StageMemory] = []
+        self._started = False
+
+    def start(self) -> None:
+        """
+        Starts tracing allocations (no-op if tracemalloc is already tracing).
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """
+        Stops tracing if this tracker started it.
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def _snapshot(self) -> Optional[tracemalloc.Snapshot]:
+        if not self.top_sites:
+            return None
+        # Leave out the memory held by tracemalloc and by the tracker itself.
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                          tracemalloc.Filter(False, __file__)])
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Measures the memory used by the code run inside the block.
+
+        Args:
+            name (str): Stage name, e.g. "fetch", "decode" or "analyse".
+        """
+        self.start()
+        before_snapshot = self._snapshot()
+        before, _ = tracemalloc.get_traced_memory()
+        # reset_peak() is only available from Python 3.9; without it the peak
+        # may include an earlier, higher stage.
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, high_water = tracemalloc.get_traced_memory()
+            top: List[Tuple[str, int]] = []
+            if before_snapshot is not None:
+                differences = self._snapshot().compare_to(before_snapshot, "lineno")
+                top = [(f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size_diff)
+                       for stat in differences[:self.top_sites] if stat.size_diff > 0]
+            self.stages.append(StageMemory(name, high_water - before, current - before, high_water, top))
+
+    @property
+    def high_water(self) -> int:
+        """
+        Returns the highest traced memory reached across all stages.
+        """
+        return max((stage.high_water for stage in self.stages), default=0)
+
+    def report(self) -> str:
+        """
+        Returns a table with the peak and retained memory of every stage and its top allocation sites.
+        """
+        lines = [f"{'stage':<12} {'peak':>12} {'retained':>12} {'high water':>12}"]
+        for stage in self.stages:
+            lines.append(f"{stage.stage:<12} {_format_bytes(stage.peak):>12} {_format_bytes(stage.retained):>12} "
+                         f"{_format_bytes(stage.high_water):>12}")
+            for site, size in stage.top:
+                lines.append(f"    {_format_bytes(size):>12}  {site}")
+        lines.append(f"high water mark: {_format_bytes(self.high_water)}")
+        return "\n".join(lines)
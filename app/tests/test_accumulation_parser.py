@@ -0,0 +1,34 @@
+from decimal import Decimal
+import pytest
+from app.accumulation_parser import AccumulationRange, from_fixed, parse_accumulation, to_fixed
+from app.esfera_partners_list import EsferaPartnersList
+from app.partnersconfig_class import PartnerConfig
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 pt", AccumulationRange(100, 100, "pts")),
+    ("2 pts", AccumulationRange(200, 200, "pts")),
+    ("0,5 pt", AccumulationRange(50, 50, "pts")),
+    ("Até 1,5 pts", AccumulationRange(0, 150, "pts")),
+    ("de 2 a 5 pts", AccumulationRange(200, 500, "pts")),
+    ("de 2 a 16 pts", AccumulationRange(200, 1600, "pts")),
+    ("3 pontos", AccumulationRange(300, 300, "pts")),
+    (None, None),
+    ("consulte", None),
+])
+def test_parse_accumulation(text, expected):
+    assert parse_accumulation(text) == expected
+
+def test_fixed_point_conversions():
+    assert to_fixed(4) == 400
+    assert to_fixed("1,5") == 150
+    assert to_fixed(Decimal("2.25")) == 225
+    assert to_fixed("sem pontos") == 0
+    assert from_fixed(150) == Decimal("1.5")
+
+def test_esfera_range_uses_highest_rate():
+    record = EsferaPartnersList.transform_item({"displayName": "Casas Bahia",
+                                                "esf_accumulationAmount": "de 2 a 5 pts",
+                                                "esf_accumulationHowItWorks": None})
+    partner = PartnerConfig.from_esfera_dict(record)
+    assert partner.parity_club == Decimal(5)
+    assert partner.points_fixed() == 500
@@ -0,0 +1,42 @@
+import datetime
+from app.campaign_calendar_class import CampaignCalendar, extract_campaign_window
+
+def d(day, month=2, year=2025):
+    return datetime.date(year, month, day)
+
+def test_extract_campaign_window():
+    assert extract_campaign_window("Campanha válida de 11 a 13/02/2025. Consulte o regulamento.") == (d(11), d(13))
+    assert extract_campaign_window("Válida de 28 a 03/03/2025.") == (d(28), d(3, 3))
+    assert extract_campaign_window("De 01/02/2025 até 05/02/2025.") == (d(1), d(5))
+    assert extract_campaign_window("Consulte o regulamento.") is None
+
+def test_active_on_uses_interval_index():
+    calendar = CampaignCalendar()
+    calendar.add("livelo:CSB", d(11), d(13))
+    calendar.add("livelo:EXT", d(10), d(20))
+    calendar.add("esfera:Amazon", d(1, 3), d(5, 3))
+    assert sorted(calendar.active_on(d(12))) == ["livelo:CSB", "livelo:EXT"]
+    assert calendar.active_on(d(9)) == []
+    calendar.remove("livelo:EXT")
+    assert calendar.active_on(d(15)) == []
+    assert calendar.active_on(d(1, 3)) == ["esfera:Amazon"]
+
+def test_starting_and_ending_queries():
+    calendar = CampaignCalendar()
+    calendar.add("a", d(11), d(13))
+    calendar.add("b", d(12), d(12))
+    now = datetime.datetime(2025, 2, 10, 20, 0)
+    assert calendar.starting_within(6, now) == ["a"]
+    assert sorted(calendar.starting_within(48, now)) == ["a", "b"]
+    assert calendar.ending_within(24, datetime.datetime(2025, 2, 12, 8, 0)) == ["b"]
+    assert calendar.starts_on(d(12)) == ["b"]
+    assert calendar.ends_on(d(13)) == ["a"]
+    assert calendar.next_start_after(now) == datetime.datetime(2025, 2, 11)
+
+def test_track_legal_terms_only_reparses_changes():
+    calendar = CampaignCalendar()
+    assert calendar.track_legal_terms("livelo:CSB", "Válida de 11 a 13/02/2025.") == (d(11), d(13))
+    assert calendar.is_boundary_day("livelo:CSB", d(13))
+    assert not calendar.is_boundary_day("livelo:CSB", d(12))
+    assert calendar.track_legal_terms("livelo:CSB", "Sem datas.") is None
+    assert "livelo:CSB" not in calendar
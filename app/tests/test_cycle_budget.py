@@ -0,0 +1,69 @@
+import threading
+from app.cycle_budget_class import CycleBudget, LastGoodCache
+from app.partnersconfig_class import PartnerConfig
+from app.pipeline_class import Pipeline
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchstore_class import WatchStore
+
+class ScriptedSource:
+    program = "livelo"
+    match_field = "code"
+
+    def __init__(self, codes, hang_after=None, error=None, complete=True):
+        self.codes = codes
+        self.complete = complete
+        self.hang_after = hang_after
+        self.error = error
+        self.release = threading.Event()
+
+    def fetch(self):
+        for i, code in enumerate(self.codes):
+            if i == self.hang_after:
+                self.release.wait(5)
+            yield {"partnerCode": code, "parity": 5, "parityClub": 5, "legalTerms": "", "promotion": True}
+        if self.error:
+            raise self.error
+
+    def normalise(self, item):
+        return item
+
+    def analyse(self, record):
+        return PartnerConfig(**record)
+
+def run_cycle(source, budget):
+    matcher = WatchlistMatcher([WatchStore(code, code, "2099-12-31", 1) for code in ("A", "B", "C")])
+    return {match.partner.partner_code: match.partner.stale for match in Pipeline([source], matcher, budget=budget).run()}
+
+def test_fresh_fetch_refreshes_the_last_good_cache(tmp_path):
+    budget = CycleBudget(10, cache=LastGoodCache(str(tmp_path)))
+    assert run_cycle(ScriptedSource(["A", "B"]), budget) == {"A": False, "B": False}
+    assert [report.status for report in budget.reports] == ["fresh"]
+    assert budget.stale_sources() == []
+    assert [item["partnerCode"] for item in LastGoodCache(str(tmp_path)).get("livelo")] == ["A", "B"]
+
+def test_slow_fetch_falls_back_on_stale_items():
+    budget = CycleBudget(0.5, fetch_share=0.5)
+    run_cycle(ScriptedSource(["A", "B", "C"]), budget)
+    slow = ScriptedSource(["A", "B", "C"], hang_after=1)
+    partners = run_cycle(slow, budget)
+    slow.release.set()
+    assert partners == {"A": False, "B": True, "C": True}
+    (report,) = budget.reports
+    assert (report.status, report.live_items, report.stale_items) == ("stale", 1, 2)
+    assert "slice" in report.reason and budget.stale_sources() == ["livelo"]
+    assert "livelo stale" in budget.report()
+
+def test_failed_fetch_without_cache_is_reported():
+    budget = CycleBudget(10)
+    assert run_cycle(ScriptedSource([], error=RuntimeError("down")), budget) == {}
+    (report,) = budget.reports
+    assert report.status == "failed" and "down" in report.reason
+
+def test_incomplete_fetch_keeps_the_last_good_cache(tmp_path):
+    budget = CycleBudget(10, cache=LastGoodCache(str(tmp_path)))
+    run_cycle(ScriptedSource(["A", "B", "C"]), budget)
+    # a page failed: the client returned nothing for it and the source finished early
+    assert run_cycle(ScriptedSource(["A"], complete=False), budget) == {"A": False, "B": True, "C": True}
+    (report,) = budget.reports
+    assert (report.status, report.live_items, report.stale_items) == ("stale", 1, 2)
+    assert [item["partnerCode"] for item in LastGoodCache(str(tmp_path)).get("livelo")] == ["A", "B", "C"]
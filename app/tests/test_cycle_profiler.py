@@ -0,0 +1,68 @@
+import pstats
+import sys
+import threading
+from app.cycle_profiler_class import CycleProfiler, resolve_stage
+from app.partnersconfig_class import PartnerConfig
+
+TERMS = "Ganhe 10 pontos por real gasto. Válido de 11 a 13/02/2025."
+
+def analyse_in_thread():
+    # the legal terms are analysed on first access
+    thread = threading.Thread(target=lambda: PartnerConfig(partnerCode="CEN", parity=1, parityClub=2,
+                                                           legalTerms=TERMS, promotion=True).max_points)
+    thread.start()
+    thread.join()
+
+def busy_loop():
+    return sum(i * i for i in range(200000))
+
+def test_resolve_stage_by_alias_and_suffix():
+    assert resolve_stage("analyse") == (PartnerConfig, "analyze_legal_terms_for_points")
+    assert resolve_stage("PartnerConfig.analyze_legal_terms_for_points") == (PartnerConfig,
+                                                                            "analyze_legal_terms_for_points")
+
+def test_cprofile_covers_worker_threads(tmp_path):
+    output = str(tmp_path / "cycle.prof")
+    with CycleProfiler(output):
+        analyse_in_thread()
+    functions = {name for _, _, name in pstats.Stats(output).stats}
+    assert "analyze_legal_terms_for_points" in functions
+
+def test_stage_mode_only_profiles_the_stage(tmp_path):
+    output = str(tmp_path / "stage.prof")
+    original = PartnerConfig.analyze_legal_terms_for_points
+    with CycleProfiler(output, stage="analyse"):
+        busy_loop()
+        analyse_in_thread()
+    assert PartnerConfig.analyze_legal_terms_for_points is original
+    functions = {name for _, _, name in pstats.Stats(output).stats}
+    assert "analyze_legal_terms_for_points" in functions
+    assert "busy_loop" not in functions
+
+def test_sample_mode_writes_collapsed_stacks(tmp_path):
+    output = tmp_path / "cycle.folded"
+    with CycleProfiler(str(output), mode="sample", interval=0.001):
+        busy_loop()
+    lines = output.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and "busy_loop" in output.read_text()
+
+def test_threads_alive_after_stop_stop_profiling(tmp_path):
+    output = str(tmp_path / "cycle.prof")
+    wake, seen = threading.Event(), []
+    def idle_worker():
+        wake.wait()
+        busy_loop()
+        seen.append(sys.getprofile())
+    profiler = CycleProfiler(output)
+    profiler.start()
+    worker = threading.Thread(target=idle_worker)
+    worker.start()
+    profiler.stop()
+    wake.set()
+    worker.join()
+    assert seen == [None]
+    assert worker.ident in profiler._detached
+    functions = {name for _, _, name in pstats.Stats(output).stats}
+    assert "idle_worker" not in functions
@@ -0,0 +1,58 @@
+import requests
+from app.cycle_replay_class import CycleReplayer, compare, load_results, save_results
+from app.response_archive_class import ResponseArchive
+from app.services.restapi_class import RestApiClient
+from app.sources_class import LiveloSource
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchstore_class import WatchStore
+
+PARITIES = b'[{"partnerCode": "CEN", "parity": 2, "parityClub": 5, "legalTerms": "", "promotion": true}]'
+
+class DummyResponse:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+def record_cycle(archive, cycle, monkeypatch):
+    client = RestApiClient(base_url="https://livelo.example")
+    responses = iter([DummyResponse(200, PARITIES), DummyResponse(503, b"")])
+    monkeypatch.setattr(client.session, "get", lambda url, params, headers, timeout=None: next(responses))
+    with archive.open_cycle(cycle) as writer:
+        client.recorders.append(writer.recorder("livelo"))
+        assert client.get("/parities", {"partnersCodes": "CEN"})[0]["partnerCode"] == "CEN"
+        assert client.get("/parities", {"partnersCodes": "ZZZ"}) is None
+    return writer
+
+def test_recorded_exchanges_keep_timing_and_status(tmp_path, monkeypatch):
+    writer = record_cycle(ResponseArchive(str(tmp_path)), "20250101T000000", monkeypatch)
+    first, failed = writer.entries
+    assert first.status == 200 and first.started > 0 and first.elapsed >= 0
+    assert first.key.endswith("partnersCodes=CEN")
+    assert failed.status == 503
+
+def test_replay_reports_cycles_and_compares_builds(tmp_path, monkeypatch):
+    archive = ResponseArchive(str(tmp_path / "archive"))
+    for cycle in ("20250101T000000", "20250102T000000", "20250103T000000"):
+        record_cycle(archive, cycle, monkeypatch)
+    matcher = WatchlistMatcher([WatchStore("CEN", "Centauro", "2099-12-31", 3)])
+    replayer = CycleReplayer(archive, [LiveloSource(["CEN"])], matcher, speedup=1000)
+
+    results = replayer.replay_all(since="20250102")
+    assert [result.cycle for result in results] == ["20250102T000000", "20250103T000000"]
+    assert results[0].promotions == ["livelo:CEN"]
+    assert (results[0].responses, results[0].failed_responses, results[0].partners) == (2, 1, 1)
+    assert results[0].seconds > 0 and results[0].cpu_seconds >= 0
+
+    save_results(results, str(tmp_path / "baseline.json"))
+    baseline = load_results(str(tmp_path / "baseline.json"))
+    assert baseline == results
+    stricter = CycleReplayer(archive, [LiveloSource(["CEN"])],
+                             WatchlistMatcher([WatchStore("CEN", "Centauro", "2099-12-31", 8)]))
+    report = compare(stricter.replay_all(until="20250102"), baseline)
+    assert report[0] == "1 cycles in common with the baseline"
+    assert report[-1] == "20250102T000000: +[] -['livelo:CEN']"
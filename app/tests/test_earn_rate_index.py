@@ -0,0 +1,86 @@
+import random
+import shutil
+from app.cycle_budget_class import SourceReport
+from app.daemon import TrackerDaemon
+from app.earn_rate_index_class import EarnRate, EarnRateIndex, EarnRateTracker
+from app.partner_identity_map_class import PartnerIdentityMap, canonical_name
+from app.partnersconfig_class import PartnerConfig
+from app.services.query_api_class import QueryApiServer
+from app.watchstore_class import WatchStore
+
+def livelo_partner(code, parity, currency="R$", currency_value=1):
+    return PartnerConfig(code, parity, parity, "", True, currency=currency, currencyValue=currency_value)
+
+def esfera_partner(name, parity, categories=()):
+    partner = PartnerConfig.from_esfera_dict({"partner_name": name, "parity_club": parity})
+    partner.categories = list(categories)
+    return partner
+
+def test_canonical_name_joins_names_and_slugs():
+    assert canonical_name("Casas  Bahia") == canonical_name("casas-bahia") == "casas bahia"
+    assert canonical_name("Ótica Diniz") == "otica diniz"
+
+def test_tracker_joins_programs_and_ranks_best_rate():
+    identities = PartnerIdentityMap.from_watchstores([WatchStore("CSB", "Casas Bahia", "2099-12-31", 1)])
+    index = EarnRateIndex()
+    tracker = EarnRateTracker(index, identities, currency_rates={"U$": 5})
+    tracker.begin_cycle(["livelo", "esfera"])
+    tracker("livelo", livelo_partner("CSB", 6), [])
+    tracker("esfera", esfera_partner("Casas Bahia", 8, ["esf_categorias_eletronicos"]), [])
+    tracker("livelo", livelo_partner("BOK", 10, currency="U$"), [])
+    tracker("livelo", livelo_partner("XYZ", 3, currency="EUR"), [])
+    tracker.end_cycle(["livelo", "esfera"])
+
+    assert [(rate.program, rate.points) for rate in index.best("casas bahia")] == [("esfera", 800), ("livelo", 600)]
+    assert [(rate.partner_id, rate.points) for rate in index.top(5)] == [("casas bahia", 800), ("livelo:BOK", 200)]
+    assert [rate.partner_name for rate in index.top(5, "eletronicos")] == ["Casas Bahia"]
+    assert tracker.unpriced == {"livelo:XYZ"}
+
+def test_refresh_drops_partners_no_longer_listed():
+    index = EarnRateIndex()
+    index.update(EarnRate("a", "A", "", "livelo", 500, None))
+    index.update(EarnRate("b", "B", "", "livelo", 300, None))
+    index.update(EarnRate("b", "B", "", "esfera", 100, None))
+    index.begin_refresh("livelo")
+    index.update(EarnRate("a", "A", "", "livelo", 200, None))
+    index.end_refresh("livelo")
+    assert [(rate.partner_id, rate.program, rate.points) for rate in index.top(5)] == [("a", "livelo", 200),
+                                                                                      ("b", "esfera", 100)]
+
+def test_daemon_only_ends_complete_refreshes(tmp_path):
+    watchlist = tmp_path / "watchstores.json"
+    shutil.copy("app/database/watchstoreslist.json", watchlist)
+    server = QueryApiServer(port=0)
+    daemon = TrackerDaemon(server, str(watchlist))
+    livelo, esfera = daemon.pipeline.sources
+    programs = ["livelo", "esfera"]
+    livelo.complete, esfera.complete = True, True
+    assert daemon.completely_refreshed(programs) == programs
+    # a targeted Esfera refresh, then a Livelo fetch served from the last good cache
+    esfera.targeted = True
+    assert daemon.completely_refreshed(programs) == ["livelo"]
+    esfera.targeted, esfera.complete = False, False
+    assert daemon.completely_refreshed(programs) == ["livelo"]
+    daemon.budget.record(SourceReport("livelo", "stale", 0, 3, 1.0, "no items returned"))
+    assert daemon.completely_refreshed(programs) == []
+    server.server_close()
+
+def test_top_k_matches_a_full_sort_after_many_updates():
+    rng = random.Random(7)
+    index = EarnRateIndex()
+    current = {}
+    for _ in range(5000):
+        partner, program = f"p{rng.randrange(200)}", rng.choice(["livelo", "esfera"])
+        if rng.random() < 0.1:
+            index.remove(program, partner)
+            current.pop((partner, program), None)
+        else:
+            points = rng.randrange(1, 2000)
+            index.update(EarnRate(partner, partner, "", program, points, None))
+            current[(partner, program)] = points
+    best = {}
+    for (partner, _), points in current.items():
+        best[partner] = max(points, best.get(partner, 0))
+    assert [rate.points for rate in index.top(20)] == sorted(best.values(), reverse=True)[:20]
+    assert len(index) == len(best)
+    assert len(index._heaps[""]) <= 2 * len(best) + 65
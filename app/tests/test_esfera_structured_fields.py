@@ -0,0 +1,73 @@
+from datetime import date
+import pytest
+from app.accumulation_parser import AccumulationRange
+from app.esfera_partners_list import EsferaPartnersList
+from app.esfera_structured_fields_class import StructuredFieldStats, extract_structured_terms, strip_tags
+from app.partnersconfig_class import PartnerConfig
+from app.services import json_codec
+
+TERMS = "<p>&bull;&nbsp;O ac&uacute;mulo padr&atilde;o &eacute; de 2 pontos a cada R$ 1 gasto.</p>"
+
+
+def item(**fields):
+    base = {"displayName": "Loja", "esf_accumulationAmount": "2 pts", "esf_accumulationRule": "a cada real",
+            "esf_accumulationFactorValue": "1", "esf_accumulationFactor": "2x1 <p>Ganhe <b>2</b> pontos a cada real",
+            "esf_tempOfferInit": "dd-mm-yyyy HH:MM", "esf_tempOfferEnd": "dd-mm-yyyy HH:MM",
+            "esf_accumulationExpirationDate": "31/12/2025", "esf_accumulationHowItWorks": TERMS}
+    base.update(fields)
+    return base
+
+
+def test_strip_tags():
+    assert strip_tags(TERMS) == "O acúmulo padrão é de 2 pontos a cada R$ 1 gasto."
+    assert strip_tags(None) == ""
+
+
+def test_consistent_fields_take_the_fast_path():
+    stats = StructuredFieldStats()
+    terms = extract_structured_terms(item(esf_tempOfferInit="01-11-2025 00:00", esf_tempOfferEnd="30-11-2025 23:59"),
+                                     stats)
+    assert terms.accumulation == AccumulationRange(200, 200, "pts")
+    assert terms.campaign == (date(2025, 11, 1), date(2025, 11, 30))
+    assert stats.fast == 1 and not stats.fallbacks
+
+
+def test_points_are_per_real():
+    terms = extract_structured_terms(item(esf_accumulationRule="a cada 2 reais na fatura*",
+                                          esf_accumulationFactorValue="2", esf_accumulationFactor=None),
+                                     StructuredFieldStats())
+    assert terms.accumulation.max == 100
+
+
+@pytest.mark.parametrize("fields, reason", [
+    ({"esf_accumulationAmount": None}, "amount missing"),
+    ({"esf_accumulationRule": "por contratação"}, "rule not per real"),
+    ({"esf_accumulationFactorValue": "15000"}, "factor value contradicts rule"),
+    ({"esf_accumulationFactor": "<p>Ganhe <b>3</b> pontos a cada real"}, "factor text contradicts amount"),
+    ({"esf_tempOfferInit": "01-11-2025 00:00"}, "inconsistent offer dates"),
+    ({"esf_tempOfferInit": "30-11-2025 00:00", "esf_tempOfferEnd": "01-11-2025 00:00"}, "inconsistent offer dates"),
+    ({"esf_tempOfferInit": "01-11-2026 00:00", "esf_tempOfferEnd": "30-11-2026 00:00"}, "offer ends after expiration"),
+    ({"esf_accumulationExpirationDate": "31/13/2025"}, "invalid dates"),
+])
+def test_contradictory_fields_fall_back(fields, reason):
+    stats = StructuredFieldStats()
+    assert extract_structured_terms(item(**fields), stats) is None
+    assert stats.fallbacks == {reason: 1}
+    assert reason in stats.report()
+
+
+def test_fast_path_record_skips_text_analysis():
+    text = TERMS + "<p>Promoção válida de 10 a 20/11/2025.</p>"
+    record = EsferaPartnersList.transform_item(item(esf_accumulationHowItWorks=text), structured=True)
+    assert record["structured"]
+    # the round trip of the worker's job queue turns ranges into lists and dates into strings
+    partner = PartnerConfig.from_esfera_dict(json_codec.loads(json_codec.dumps(record)))
+    assert partner.accumulation == AccumulationRange(200, 200, "pts")
+    assert partner.max_points == 0
+    assert partner.points_fixed() == 200
+    assert (partner.campaign_from, partner.campaign_to) == (date(2025, 11, 10), date(2025, 11, 20))
+
+
+def test_fallback_record_matches_text_mode():
+    raw = item(esf_accumulationRule="por contratação")
+    assert EsferaPartnersList.transform_item(raw, structured=True) == EsferaPartnersList.transform_item(raw)
@@ -0,0 +1,102 @@
+from app.sources_class import EsferaTargetedSource
+
+CATALOGUE = [{"id": f"p{i}", "displayName": f"Store {i}", "seoUrlSlugDerived": f"store-{i}"} for i in range(12)]
+WATCHED = {"store-3", "store-7", "store-11"}
+
+class CatalogueClient:
+    def __init__(self):
+        self.calls = []
+        self.bytes_received = 0
+
+    def get(self, endpoint, params=None):
+        self.calls.append(dict(params))
+        if "productIds" in params:
+            ids = params["productIds"].split(",")
+            items = [item for item in CATALOGUE if item["id"] in ids]
+            self.bytes_received += 100 * len(items)
+            return {"items": items}
+        offset, limit = params["offset"], params["limit"]
+        self.bytes_received += 100 * limit
+        return {"items": CATALOGUE[offset:offset + limit], "totalResults": len(CATALOGUE)}
+
+def make_source(client, **kwargs):
+    return EsferaTargetedSource(lambda item: item["seoUrlSlugDerived"] in WATCHED, client=client,
+                                page_size=5, ids_per_request=2, **kwargs)
+
+def test_full_listing_then_targeted_refresh():
+    client = CatalogueClient()
+    source = make_source(client, full_listing_every=2)
+    assert len(list(source.fetch())) == 12
+    assert source.product_ids == ["p3", "p7", "p11"]
+
+    client.calls.clear()
+    items = list(source.fetch())
+    assert sorted(item["id"] for item in items) == ["p11", "p3", "p7"]
+    assert all("productIds" in call for call in client.calls) and len(client.calls) == 2
+    assert [stat.mode for stat in source.refresh_stats] == ["full", "targeted"]
+    assert source.refresh_stats[1].bytes < source.refresh_stats[0].bytes
+
+    # The periodic full listing comes back after full_listing_every fetches.
+    list(source.fetch())
+    assert source.refresh_stats[-1].mode == "full"
+
+    # Only the most recent fetches are kept.
+    source.refresh_stats.extend(source.refresh_stats[0] for _ in range(100))
+    assert len(source.refresh_stats) == source.refresh_stats.maxlen
+
+def test_known_ids_survive_restarts(tmp_path):
+    state_path = str(tmp_path / "targets.json")
+    list(make_source(CatalogueClient(), state_path=state_path).fetch())
+    client = CatalogueClient()
+    source = make_source(client, state_path=state_path)
+    assert source.product_ids == ["p3", "p7", "p11"]
+    list(source.fetch())
+    assert all("productIds" in call for call in client.calls)
+
+def test_targeted_refresh_is_merged_into_the_kept_catalogue():
+    client = CatalogueClient()
+    source = make_source(client, full_listing_every=3, keep_catalogue=True)
+    list(source.fetch())
+    CATALOGUE[3] = dict(CATALOGUE[3], displayName="Store 3 renamed")
+    client.calls.clear()
+    try:
+        items = list(source.fetch())
+    finally:
+        CATALOGUE[3] = dict(CATALOGUE[3], displayName="Store 3")
+    assert all("productIds" in call for call in client.calls)
+    assert sorted(item["id"] for item in items) == sorted(item["id"] for item in CATALOGUE)
+    assert next(item for item in items if item["id"] == "p3")["displayName"] == "Store 3 renamed"
+    assert source.targeted and source.complete
+
+    # After a restart the catalogue is seeded from an earlier fetch instead of listed again.
+    restarted = make_source(CatalogueClient(), keep_catalogue=True)
+    restarted.restore(source.checkpoint())
+    restarted.seed_catalogue(items)
+    assert len(list(restarted.fetch())) == 12 and restarted.refresh_stats[-1].mode == "targeted"
+
+def test_watchlist_edits_reuse_the_kept_catalogue():
+    client = CatalogueClient()
+    source = make_source(client, keep_catalogue=True)
+    list(source.fetch())
+    source.watch(lambda item: item["id"] in {"p1", "p3"})
+    assert source.product_ids == ["p1", "p3"]
+    client.calls.clear()
+    list(source.fetch())
+    assert client.calls == [{"productIds": "p1,p3"}]
+
+    # Without a kept catalogue the ids are learnt again from a full listing.
+    plain = make_source(CatalogueClient())
+    list(plain.fetch())
+    plain.watch(lambda item: item["id"] == "p1")
+    list(plain.fetch())
+    assert plain.refresh_stats[-1].mode == "full" and plain.product_ids == ["p1"]
+
+def test_failed_batches_keep_their_products():
+    client = CatalogueClient()
+    source = make_source(client, keep_catalogue=True)
+    list(source.fetch())
+    get = client.get
+    client.get = lambda endpoint, params=None: None if "p3" in params.get("productIds", "") else get(endpoint, params)
+    items = list(source.fetch())
+    assert source.product_ids == ["p3", "p7", "p11"]
+    assert len(items) == 12 and not source.complete
@@ -0,0 +1,93 @@
+import time
+from app.services.job_queue_class import JobQueue
+from app.watchstore_class import WatchStore
+from app.worker import Worker, enqueue_cycle
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    first = queue.enqueue("fetch_page", {"offset": 0}, key="c1:fetch:esfera:0")
+    assert queue.enqueue("fetch_page", {"offset": 0}, key="c1:fetch:esfera:0") == first
+    assert queue.counts() == {"pending": 1}
+
+def test_each_job_is_leased_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue, other = JobQueue(path), JobQueue(path)
+    queue.enqueue("fetch_page", {"offset": 0})
+    job = queue.lease()
+    assert job.payload == {"offset": 0} and job.attempts == 1
+    assert other.lease() is None
+    queue.complete(job, 3)
+    assert queue.counts() == {"done": 1}
+
+def test_expired_lease_is_retried_until_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=0, max_attempts=2, retry_delay=0)
+    queue.enqueue("fetch_page", {"offset": 0})
+    # The first worker "crashes" while holding the lease.
+    assert queue.lease().attempts == 1
+    time.sleep(0.01)
+    job = queue.lease()
+    assert job.attempts == 2
+    queue.fail(job, "boom")
+    assert queue.counts() == {"failed": 1}
+
+def test_expired_last_attempt_is_failed_and_stalled_worker_cannot_overwrite(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue, other = JobQueue(path, lease_seconds=0, max_attempts=2), JobQueue(path, lease_seconds=60)
+    queue.enqueue("fetch_page", {"offset": 0}, key="c1:fetch:esfera:0")
+    stalled = queue.lease()
+    time.sleep(0.01)
+    job = other.lease()
+    assert job.attempts == 2
+    # The stalled first worker finishes late: the new lease holder's outcome wins.
+    assert not queue.complete(stalled, "late")
+    assert other.complete(job, "on time")
+    assert other.results("fetch_page", "c1:") == ["on time"]
+
+    queue.enqueue("fetch_page", {"offset": 50})
+    queue.lease(), time.sleep(0.01), queue.lease(), time.sleep(0.01)
+    # Both attempts crashed without calling fail(): the job is failed instead of leased forever.
+    assert queue.lease() is None
+    assert queue.counts() == {"done": 1, "failed": 1}
+
+def test_lease_is_renewed_while_a_job_runs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue, other = JobQueue(path, lease_seconds=0.1), JobQueue(path)
+    queue.enqueue("fetch_page", {"offset": 0})
+    job = queue.lease()
+    with queue.renewing(job):
+        time.sleep(0.3)
+        assert other.lease() is None
+    assert queue.complete(job)
+
+class DummySource:
+    program = "livelo"
+    match_field = "code"
+
+    def __init__(self, codes):
+        self.codes = codes
+
+    def chunks(self):
+        return [self.codes[:2], self.codes[2:]]
+
+    def fetch_chunk(self, codes):
+        return [{"partnerCode": code, "parity": 5, "parityClub": 5, "legalTerms": "", "promotion": True}
+                for code in codes]
+
+    def normalise(self, item):
+        return item
+
+    def analyse(self, record):
+        from app.partnersconfig_class import PartnerConfig
+        return PartnerConfig(**record)
+
+def test_worker_drains_a_cycle(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    watchstores = [WatchStore("CEN", "Centauro", "2099-12-31", 4), WatchStore("BOK", "Booking", "2099-12-31", 6),
+                   WatchStore("AMZ", "Amazon", "2099-12-31", 2)]
+    source = DummySource(["CEN", "BOK", "AMZ"])
+    digest = []
+    enqueue_cycle(queue, "c1", [source])
+    Worker(queue, watchstores, sources=[source], shards=2, notifier=digest.append).run(drain=True, poll_interval=0)
+    assert sorted(match["partner"] for match in digest) == ["AMZ", "CEN"]
+    # 2 fetches, 2 analyses, 4 shard matches and the digest
+    assert queue.counts() == {"done": 9}
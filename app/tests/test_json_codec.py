@@ -0,0 +1,29 @@
+import datetime
+from decimal import Decimal
+import pytest
+from app.services import json_codec
+
+def test_loads_bytes_and_text():
+    document = '{"name": "Casas Bahia", "points": [1, 2]}'
+    assert json_codec.loads(document.encode("utf-8")) == {"name": "Casas Bahia", "points": [1, 2]}
+    assert json_codec.loads(document) == json_codec.loads(memoryview(document.encode("utf-8")))
+
+def test_dumps_returns_utf8_bytes():
+    encoded = json_codec.dumps({"name": "Eletroportáteis", "points": Decimal("1.5"),
+                                "day": datetime.date(2025, 2, 11)})
+    assert isinstance(encoded, bytes)
+    assert json_codec.loads(encoded) == {"name": "Eletroportáteis", "points": 1.5, "day": "2025-02-11"}
+
+def test_invalid_json_raises_decode_error():
+    with pytest.raises(json_codec.JSONDecodeError):
+        json_codec.loads(b"{invalid")
+
+def test_load_and_dump_roundtrip(tmp_path):
+    path = str(tmp_path / "data.json")
+    json_codec.dump([{"code": "CEN"}], path, indent=True)
+    assert json_codec.load(path) == [{"code": "CEN"}]
+
+def test_stdlib_fallback(monkeypatch):
+    monkeypatch.setattr(json_codec, "orjson", None)
+    assert json_codec.loads(b'{"points": 4}') == {"points": 4}
+    assert json_codec.dumps({"name": "Eletroportáteis"}) == '{"name": "Eletroportáteis"}'.encode("utf-8")
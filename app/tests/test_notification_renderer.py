@@ -0,0 +1,42 @@
+import datetime
+from app.notification_renderer_class import LIVELO_RENDERER, NotificationRenderer
+
+DAY = datetime.date(2025, 2, 11)
+
+def make_campaign(name="Casas Bahia", categories=None):
+    return {
+        "name": name,
+        "categories": categories or [],
+        "min_points": 6,
+        "legal_terms": "Ganhe 10 pontos por real. Campanha válida de 11 a 13/02/2025. Consulte o regulamento.",
+        "url": "https://www.livelo.com.br/ganhe-pontos-compre-pontue-casasbahia",
+    }
+
+def test_livelo_render_matches_previous_layout():
+    campaign = make_campaign(categories=["telas", "portáteis"])
+    html = LIVELO_RENDERER.render([campaign], DAY)
+    assert html == ("<table align='center'><tr><th><h1>Livelo - 11/02/2025</h1></th></tr>"
+                    "<tr><td><strong>Casas Bahia</strong><br/><p>Search Terms: telas, portáteis</p>"
+                    "<p>Minimum amount of points: 6</p><p>Ganhe 10 pontos por real.<br/>Campanha válida de 11 "
+                    "a 13/02/2025.<br/>Consulte o regulamento.</p><p>URL Access: "
+                    "https://www.livelo.com.br/ganhe-pontos-compre-pontue-casasbahia</p></td><tr/></table>")
+
+def test_fragments_are_reused_across_recipients():
+    renderer = NotificationRenderer("Esfera", "<tr><td>$name $categories $terms $url</td></tr>", "-")
+    shared = make_campaign()
+    digests = renderer.render_digests({
+        "a@example.com": [shared, make_campaign("Extra")],
+        "b@example.com": [shared],
+    }, DAY)
+    assert renderer.misses == 2
+    assert renderer.hits == 1
+    assert "Extra" in digests["a@example.com"]
+    assert "Extra" not in digests["b@example.com"]
+
+def test_changed_legal_terms_are_rendered_again():
+    renderer = NotificationRenderer("Esfera", "<tr><td>$terms</td></tr>", "-")
+    campaign = make_campaign()
+    renderer.render([campaign], DAY)
+    campaign["legal_terms"] = "Ganhe 12 pontos por real."
+    assert "12 pontos" in renderer.render([campaign], DAY)
+    assert renderer.misses == 2
@@ -33,3 +33,55 @@ def test_has_active_campaign():
     yesterday = today - datetime.timedelta(days=1)
     config_inactive = PartnerConfig("CEN", 2, 2, "Some terms", True, campaign_from=yesterday, campaign_to=yesterday)
     assert config_inactive.has_active_campaign() is False
+
+def count_analyses(monkeypatch):
+    calls = []
+    original = PartnerConfig.analyze_legal_terms_for_points
+    def spy(self):
+        calls.append(self.partner_code)
+        return original(self)
+    monkeypatch.setattr(PartnerConfig, "analyze_legal_terms_for_points", spy)
+    return calls
+
+def test_analysis_is_lazy_and_cached(monkeypatch):
+    calls = count_analyses(monkeypatch)
+    config = PartnerConfig("CEN", 2, 2, "Ganhe 4 pontos por real de 1 a 30/12/2099.", True)
+    assert calls == []
+    assert config.max_points == 4
+    assert config.campaign_to == datetime.date(2099, 12, 30)
+    assert config.sentences[0][1] == [4]
+    assert calls == ["CEN"]
+    config.legal_terms = "Ganhe 6 pontos por real."
+    assert config.points_fixed() == 600
+    assert calls == ["CEN", "CEN"]
+
+def test_clearing_legal_terms_drops_their_points():
+    config = PartnerConfig("CEN", 2, 2, "Ganhe 10 pontos por real.", True)
+    assert config.max_points == 10
+    config.legal_terms = ""
+    assert config.max_points == 0
+    assert config.points_fixed() == 200
+    assert PartnerConfig("CEN", 2, 2, "", True).max_points == 1
+
+def test_matcher_rejects_on_numeric_fields_first(monkeypatch):
+    from app.watchlist_matcher_class import WatchlistMatcher
+    from app.watchstore_class import WatchStore
+    calls = count_analyses(monkeypatch)
+    matcher = WatchlistMatcher([WatchStore("CEN", "Centauro", "2099-12-31", 3)])
+    terms = "Ganhe 8 pontos por real."
+    assert matcher.match(PartnerConfig("NOT", 1, 1, terms, True)) == []
+    assert [ws.code for ws in matcher.match(PartnerConfig("CEN", 5, 5, terms, True))] == ["CEN"]
+    assert calls == []
+    # below the minimum on the numeric fields: the legal terms can still raise the points
+    assert [ws.code for ws in matcher.match(PartnerConfig("CEN", 1, 1, terms, True))] == ["CEN"]
+    assert calls == ["CEN"]
+
+def test_matcher_requires_the_promotion_flag_for_livelo():
+    from app.watchlist_matcher_class import WatchlistMatcher
+    from app.watchstore_class import WatchStore
+    matcher = WatchlistMatcher([WatchStore("CEN", "Centauro", "2099-12-31", 3)])
+    assert matcher.match(PartnerConfig("CEN", 5, 5, "", False)) == []
+    assert [ws.code for ws in matcher.match(PartnerConfig("CEN", 5, 5, "", True))] == ["CEN"]
+    # Esfera partners carry no promotion flag and are matched by name
+    esfera = PartnerConfig("CEN", 5, 5, "", False, partnerName="Centauro")
+    assert [ws.code for ws in matcher.match(esfera, "name")] == ["CEN"]
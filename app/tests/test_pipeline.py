@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from app.partnersconfig_class import PartnerConfig
+from app.pipeline_class import Pipeline
+from app.thread_pool_runner_class import ThreadPoolRunner
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchstore_class import WatchStore
+
+class DummySource:
+    program = "livelo"
+    match_field = "code"
+
+    def __init__(self, items, gate=None):
+        self.items = items
+        self.gate = gate
+
+    def fetch(self):
+        for item in self.items:
+            yield item
+            if self.gate is not None:
+                # Block until the first alert has been sent.
+                assert self.gate.wait(timeout=5)
+
+    def normalise(self, item):
+        return item
+
+    def analyse(self, record):
+        return PartnerConfig(**record)
+
+@pytest.fixture
+def matcher():
+    return WatchlistMatcher([
+        WatchStore("CEN", "Centauro", "2099-12-31", 4),
+        WatchStore("BOK", "Booking", "2099-12-31", 6),
+    ])
+
+def make_item(code, parity):
+    return {"partnerCode": code, "parity": parity, "parityClub": parity, "legalTerms": "", "promotion": True}
+
+def test_run_returns_matches(matcher):
+    source = DummySource([make_item("CEN", 5), make_item("BOK", 4), make_item("EXT", 10)])
+    matches = Pipeline([source], matcher).run()
+    assert [match.partner.partner_code for match in matches] == ["CEN"]
+    assert matches[0].watchstores[0].name == "Centauro"
+
+def test_first_alert_sent_before_fetch_finishes(matcher):
+    gate = threading.Event()
+    source = DummySource([make_item("CEN", 5), make_item("CEN", 8)], gate=gate)
+    notified = []
+
+    def notifier(match):
+        notified.append(match)
+        gate.set()
+
+    matches = Pipeline([source], matcher, notifier=notifier, queue_size=1).run()
+    assert len(matches) == 2
+    assert len(notified) == 2
+
+def test_stage_error_is_raised(matcher):
+    source = DummySource([{"unexpected": True}])
+    with pytest.raises(TypeError):
+        Pipeline([source], matcher).run()
+
+def test_notifications_sent_on_runner_finish_before_run_returns(matcher):
+    source = DummySource([make_item("CEN", 5), make_item("BOK", 7)])
+    notified = []
+
+    def slow_notifier(match):
+        time.sleep(0.05)
+        notified.append(match.partner.partner_code)
+
+    with ThreadPoolRunner(2) as runner:
+        matches = Pipeline([source], matcher, notifier=slow_notifier, runner=runner).run()
+        assert sorted(notified) == ["BOK", "CEN"]
+    assert len(matches) == 2
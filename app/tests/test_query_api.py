@@ -0,0 +1,81 @@
+import datetime
+import json
+import urllib.error
+import urllib.request
+import pytest
+from app.earn_rate_index_class import EarnRate, EarnRateIndex
+from app.partnersconfig_class import PartnerConfig
+from app.promotions_index_class import PromotionsIndex, PromotionsIndexBuilder
+from app.services.query_api_class import QueryApiServer
+from app.watchstore_class import WatchStore
+
+@pytest.fixture
+def index():
+    today = datetime.date.today()
+    builder = PromotionsIndexBuilder()
+    builder("livelo", PartnerConfig("CEN", 2, 2, "", True), [])
+    builder("livelo", PartnerConfig("CSB", 10, 10, "", True, partnerName="Casas Bahia",
+                                    campaign_from=today, campaign_to=today),
+            [WatchStore("CSB", "Casas Bahia", "2099-12-31", 6)])
+    builder("livelo", PartnerConfig("EXT", 4, 4, "", True), [])
+    return builder.build()
+
+@pytest.fixture
+def server(index):
+    server = QueryApiServer(port=0, index=index)
+    server.start()
+    yield server
+    server.stop()
+
+def fetch(server, path, headers=None):
+    request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}{path}", headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, None
+
+def partner_codes(body):
+    return [record["partner_code"] for record in body]
+
+def test_promotions_by_min_points(index):
+    assert partner_codes(json.loads(index.promotions(4)[0])) == ["CSB", "EXT"]
+    assert partner_codes(json.loads(index.promotions(3)[0])) == ["CSB", "EXT"]
+    assert partner_codes(json.loads(index.promotions(11)[0])) == []
+
+def test_threshold_etags_hash_the_joined_body(index):
+    import hashlib
+    for min_points in (0, 2, 4, 10, 11):
+        body, etag = index.promotions(min_points)
+        assert etag == '"' + hashlib.sha1(body).hexdigest() + '"'
+    assert index.promotions(2)[1] != index.promotions(4)[1]
+
+def test_partner_and_active_queries(index):
+    assert partner_codes(json.loads(index.partner("casas  bahia")[0])) == ["CSB"]
+    assert index.partner("unknown") is None
+    assert partner_codes(json.loads(index.active_campaigns()[0])) == ["CSB"]
+
+def test_http_api_with_etag(server):
+    status, headers, body = fetch(server, "/promotions?min_points=5")
+    assert status == 200
+    assert partner_codes(body) == ["CSB"]
+    status, _, _ = fetch(server, "/promotions?min_points=5", {"If-None-Match": headers["ETag"]})
+    assert status == 304
+    assert fetch(server, "/partners/CEN")[0] == 200
+    assert fetch(server, "/partners/XXX")[0] == 404
+    assert fetch(server, "/promotions?min_points=abc")[0] == 400
+
+def test_publish_swaps_index(server):
+    server.publish(PromotionsIndex([]))
+    assert fetch(server, "/promotions")[2] == []
+
+def test_earn_rate_endpoints(server):
+    assert fetch(server, "/earn-rates/top")[0] == 404
+    server.earn_rates = EarnRateIndex()
+    server.earn_rates.update(EarnRate("casas bahia", "Casas Bahia", "", "esfera", 850, None))
+    server.earn_rates.update(EarnRate("casas bahia", "Casas Bahia", "", "livelo", 600, None))
+    status, _, body = fetch(server, "/earn-rates/top?k=1")
+    assert status == 200 and [(rate["program"], rate["points"]) for rate in body] == [("esfera", 8.5)]
+    assert [rate["program"] for rate in fetch(server, "/earn-rates/partners/Casas%20Bahia")[2]] == ["esfera", "livelo"]
+    assert fetch(server, "/earn-rates/partners/unknown")[0] == 404
+    assert fetch(server, "/earn-rates/top?k=x")[0] == 400
@@ -0,0 +1,50 @@
+import csv
+import gzip
+import io
+import json
+import os
+import pytest
+from datetime import date
+from app.partnersconfig_class import PartnerConfig
+from app.record_exporter_class import FIELDS, RecordExporter
+from app.watchstore_class import WatchStore
+
+def make_partner(code, points=10):
+    partner = PartnerConfig(partnerCode=code, parity=2, partnerName=f"Loja {code}", parityClub=3, promotion=True,
+                            legalTerms=f"Ganhe {points} pontos por real de 1 a 30/04/2023.")
+    partner.analyze_legal_terms_for_points()
+    return partner
+
+def test_ndjson_records_and_rotation(tmp_path):
+    watcher = WatchStore("A", "Loja A", "2099-12-31", 5)
+    with RecordExporter(str(tmp_path), max_records=3, buffer_records=2) as exporter:
+        exporter.start_cycle("c1")
+        for i in range(7):
+            exporter("livelo", make_partner(f"P{i}"), [watcher] if i == 0 else [])
+    assert exporter.records == 7
+    assert [os.path.basename(path) for path in exporter.files] == [
+        "partners-c1-0000.ndjson", "partners-c1-0001.ndjson", "partners-c1-0002.ndjson"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    with open(exporter.files[0], encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 3
+    first = records[0]
+    assert list(first) == FIELDS
+    assert first["partner_code"] == "P0" and first["program"] == "livelo" and first["max_points"] == 10
+    assert first["campaign_from"] == date(2023, 4, 1).isoformat() and first["watchers"] == ["Loja A"]
+
+def test_compressed_csv(tmp_path):
+    exporter = RecordExporter(str(tmp_path), format="csv", compress=True)
+    exporter.start_cycle("c2")
+    exporter("esfera", make_partner("P1"), [WatchStore("1", "X", "2099-12-31", 1), WatchStore("2", "Y", "2099-12-31", 1)])
+    exporter.close()
+    (path,) = exporter.files
+    assert path.endswith(".csv.gz")
+    with gzip.open(path, "rb") as f:
+        rows = list(csv.reader(io.TextIOWrapper(f, encoding="utf-8", newline="")))
+    assert rows[0] == FIELDS
+    assert rows[1][FIELDS.index("watchers")] == "X;Y" and rows[1][FIELDS.index("parity_club")] == "3.0"
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RecordExporter(str(tmp_path), format="xml")
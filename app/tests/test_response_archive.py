@@ -0,0 +1,47 @@
+import gzip
+import pytest
+from app.response_archive_class import ResponseArchive
+from app.services.restapi_class import RestApiClient
+
+def test_random_access_to_archived_responses(tmp_path):
+    archive = ResponseArchive(str(tmp_path), retain=2)
+    pages = [(b'{"items": [%d], "image": "https://www.esfera.com.vc/file/%d.png"}' % (i, i)) * 50 for i in range(10)]
+    with archive.open_cycle("c1") as writer:
+        for i, page in enumerate(pages):
+            writer.add("esfera", f"https://www.esfera.com.vc/products?offset={i * 50}", page)
+        writer.add("livelo", "https://apis.pontoslivelo.com.br/parities?partnersCodes=CSB", b"[]")
+    assert writer.size < writer.raw_bytes / 4
+
+    reader = archive.open("c1")
+    assert len(reader.entries) == 11
+    assert reader.read("esfera", "offset=150") == [pages[3]]
+    assert reader.read("livelo") == [b"[]"]
+
+def test_retention_and_incomplete_archives(tmp_path):
+    archive = ResponseArchive(str(tmp_path), retain=2)
+    for cycle in ("c1", "c2", "c3"):
+        archive.open_cycle(cycle).close()
+        archive.prune()
+    archive.open_cycle("c4")
+    assert archive.cycles() == ["c2", "c3"]
+    (tmp_path / "bad.rza").write_bytes(b"RZA1" + bytes(30))
+    with pytest.raises(ValueError):
+        archive.open("bad")
+
+def test_client_requests_compression_and_feeds_hooks(monkeypatch, tmp_path):
+    client = RestApiClient(base_url="https://example.com")
+    assert "gzip" in client.headers["Accept-Encoding"]
+
+    class CompressedResponse:
+        status_code = 200
+        content = b'{"result": "ok"}'
+        headers = {"Content-Encoding": "gzip", "Content-Length": str(len(gzip.compress(content)))}
+
+        def raise_for_status(self):
+            pass
+    monkeypatch.setattr(client.session, "get", lambda url, params, headers, timeout=None: CompressedResponse())
+    with ResponseArchive(str(tmp_path)).open_cycle("c1") as writer:
+        client.response_hooks.append(writer.hook("test"))
+        assert client.get("/items", {"page": 2}) == {"result": "ok"}
+    assert client.bytes_transferred == int(CompressedResponse.headers["Content-Length"])
+    assert ResponseArchive(str(tmp_path)).open("c1").read("test", "page=2") == [b'{"result": "ok"}']
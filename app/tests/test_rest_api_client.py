@@ -1,11 +1,15 @@
+import asyncio
+import threading
+import time
 import json
 from app.services.restapi_class import RestApiClient
 
 # A dummy response class to simulate requests responses.
 class DummyResponse:
-    def __init__(self, json_data, status_code=200):
+    def __init__(self, json_data, status_code=200, headers=None):
         self._json_data = json_data
         self.status_code = status_code
+        self.headers = headers or {}
 
     def raise_for_status(self):
         if self.status_code != 200:
@@ -18,10 +22,82 @@ class DummyResponse:
     def text(self):
         return json.dumps(self._json_data)
 
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
 def test_get(monkeypatch):
-    def dummy_get(url, params, headers):
+    def dummy_get(url, params, headers, timeout=None):
         # Assert that the URL contains a known substring
         assert "test_endpoint" in url
         assert params == {"key": "value"}
         return DummyResponse({"result": "success"}, 200)
     monkeypatch
+
+def make_slow_client(monkeypatch, release):
+    client = RestApiClient(base_url="https://example.com")
+    calls = []
+
+    def slow_get(url, params, headers, timeout=None):
+        calls.append(url)
+        assert release.wait(timeout=5)
+        return DummyResponse({"items": [1, 2, 3]}, 200)
+
+    monkeypatch.setattr(client.session, "get", slow_get)
+    return client, calls
+
+def test_get_coalesces_concurrent_requests(monkeypatch):
+    release = threading.Event()
+    client, calls = make_slow_client(monkeypatch, release)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(client.get("/products", {"offset": 0})))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while client.coalesced_requests < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    # Once the request has completed, a new call goes upstream again.
+    client.get("/products", {"offset": 0})
+    assert len(calls) == 2
+
+def test_get_async_coalesces_concurrent_requests(monkeypatch):
+    release = threading.Event()
+    client, calls = make_slow_client(monkeypatch, release)
+
+    async def run():
+        tasks = [asyncio.ensure_future(client.get_async("/products", {"offset": 0})) for _ in range(3)]
+        while client.coalesced_requests < 2:
+            await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results[0] == {"items": [1, 2, 3]}
+    assert all(result is results[0] for result in results)
+
+def test_conditional_get_reuses_body_on_304(monkeypatch):
+    client = RestApiClient(base_url="https://example.com")
+    sent = []
+
+    def conditional_get(url, params, headers, timeout=None):
+        sent.append(dict(headers))
+        if headers.get("If-None-Match") == '"v1"':
+            return DummyResponse(None, 304)
+        return DummyResponse({"result": "fresh"}, 200, {"ETag": '"v1"'})
+    monkeypatch.setattr(client.session, "get", conditional_get)
+    assert client.get("/items") == {"result": "fresh"}
+    assert client.get("/items") == {"result": "fresh"}
+    assert client.not_modified == 1 and "If-None-Match" not in sent[0]
+
+    restored = RestApiClient(base_url="https://example.com")
+    restored.restore(client.checkpoint())
+    monkeypatch.setattr(restored.session, "get", conditional_get)
+    assert restored.get("/items") == {"result": "fresh"} and restored.not_modified == 1
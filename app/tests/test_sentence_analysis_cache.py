@@ -0,0 +1,50 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app.partnersconfig_class import PartnerConfig
+from app.sentence_analysis_cache_class import SENTENCE_CACHE, SentenceAnalysisCache
+
+def test_sentence_analysed_once():
+    cache = SentenceAnalysisCache()
+    first = cache.analyse(" Ganhe 3 pontos por real  gasto de 1 a 30/04/2023")
+    second = cache.analyse("Ganhe 3 pontos por real gasto de 1 a 30/04/2023 ")
+    assert first is second
+    assert first.points == (3,)
+    assert first.numbers == ("3", "1", "30", "04", "2023")
+    assert first.campaign == (datetime.date(2023, 4, 1), datetime.date(2023, 4, 30))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_ratio == 0.5
+
+def test_category_lookups_cached_per_categories():
+    cache = SentenceAnalysisCache()
+    assert cache.mentions_any("4 pontos por real em brinquedos", ["livros", "brinquedos"])
+    assert cache.mentions_any("4 pontos por real em brinquedos", ["livros", "brinquedos"])
+    assert not cache.mentions_any("4 pontos por real em brinquedos", ["livros"])
+    assert (cache.category_hits, cache.category_misses) == (1, 2)
+
+def test_lru_eviction():
+    cache = SentenceAnalysisCache(max_sentences=2)
+    for sentence in ("a", "b", "a", "c"):
+        cache.analyse(sentence)
+    assert len(cache) == 2
+    cache.analyse("a")
+    assert cache.hits == 2
+
+def test_concurrent_use_keeps_the_lru_consistent():
+    cache = SentenceAnalysisCache(max_sentences=50)
+    sentences = [f"Ganhe {i % 80} pontos por real" for i in range(4000)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        analyses = list(executor.map(cache.analyse, sentences))
+        list(executor.map(lambda sentence: cache.mentions_any(sentence, ["real"]), sentences))
+    assert [analysis.points for analysis in analyses] == [(i % 80,) for i in range(4000)]
+    assert len(cache) == 50 and cache.hits + cache.misses == 4000
+    assert cache.category_hits + cache.category_misses == 4000
+
+def test_partners_share_boilerplate_analysis():
+    SENTENCE_CACHE.clear()
+    boilerplate = "Consulte o regulamento. Pagamento via cartão de crédito, boleto e Pix."
+    for code, points in (("CEN", 4), ("BOK", 6)):
+        partner = PartnerConfig(partnerCode=code, parity=1, parityClub=1, promotion=True,
+                                legalTerms=f"Ganhe {points} pontos por real. {boilerplate}")
+        assert partner.max_points == points
+    # The two boilerplate sentences were analysed for the first partner only.
+    assert (SENTENCE_CACHE.hits, SENTENCE_CACHE.misses) == (2, 4)
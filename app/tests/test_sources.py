@@ -0,0 +1,61 @@
+from app.sources_class import LiveloSource, chunk_codes
+
+class DummyClient:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        codes = params["partnersCodes"].split(",")
+        self.calls.append(codes)
+        # Every chunk also returns "CEN", which must be de-duplicated.
+        return [{"partnerCode": code} for code in codes] + [{"partnerCode": "CEN"}]
+
+def test_chunk_codes_by_count():
+    codes = [f"C{i:02d}" for i in range(10)]
+    chunks = chunk_codes(codes, chunk_size=4)
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert sum(chunks, []) == codes
+
+def test_chunk_codes_by_query_length():
+    chunks = chunk_codes(["AAA", "BBB", "CCC"], chunk_size=10, max_query_length=7)
+    assert chunks == [["AAA", "BBB"], ["CCC"]]
+
+def test_chunk_codes_drops_duplicates():
+    assert chunk_codes(["CEN", "", "CEN", "EXT"]) == [["CEN", "EXT"]]
+
+def test_livelo_fetch_merges_chunks():
+    client = DummyClient()
+    source = LiveloSource(["CEN", "EXT", "MZL", "CSB", "AMC"], client=client, chunk_size=2)
+    records = list(source.fetch())
+    assert len(client.calls) == 3
+    assert sorted(record["partnerCode"] for record in records) == ["AMC", "CEN", "CSB", "EXT", "MZL"]
+    assert len(source.chunk_stats) == 3
+    assert source.complete
+
+def test_livelo_fetch_with_a_failed_chunk_is_incomplete():
+    client = DummyClient()
+    get = client.get
+    client.get = lambda endpoint, params=None: None if "MZL" in params["partnersCodes"] else get(endpoint, params)
+    source = LiveloSource(["CEN", "EXT", "MZL", "CSB"], client=client, chunk_size=2)
+    assert sorted(record["partnerCode"] for record in source.fetch()) == ["CEN", "EXT"]
+    assert [stat.failed for stat in source.chunk_stats].count(True) == 1
+    assert not source.complete
+
+def test_livelo_crawler_aborts_on_a_partial_parity_list(monkeypatch):
+    import pytest
+    import requests
+    from app import crawler_livelo
+    from app.services.restapi_class import RestApiClient
+    monkeypatch.setattr(RestApiClient, "get", lambda self, endpoint, params=None: None
+                        if "MZL" in params["partnersCodes"] else DummyClient().get(endpoint, params))
+    monkeypatch.setattr(crawler_livelo, "LiveloSource",
+                        lambda codes, max_workers: LiveloSource(codes, chunk_size=2, max_workers=max_workers))
+    with pytest.raises(requests.exceptions.RequestException, match="1 de 2"):
+        crawler_livelo.get_campaigns("CEN,EXT,MZL,CSB")
+
+def test_crawlers_read_the_minimum_purchase_after_the_currency():
+    from app import crawler_esfera, crawler_livelo
+    terms = "Ganhe 5 pontos por real em compras acima de R$ 1.500,00."
+    for crawler in (crawler_livelo, crawler_esfera):
+        assert crawler.is_valid_legal_terms(terms, 500, 200000, []) is True
+        assert crawler.is_valid_legal_terms(terms, 500, 100000, []) is False
@@ -0,0 +1,68 @@
+from app.cycle_budget_class import StaleItem
+from app.partnersconfig_class import PartnerConfig
+from app.pipeline_class import Pipeline
+from app.stage_memory_class import StageMemoryTracker
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchstore_class import WatchStore
+
+def test_stage_reports_peak_retained_and_sites():
+    tracker = StageMemoryTracker(top_sites=3)
+    with tracker.stage("temporary"):
+        temporary = [bytes(1000) for _ in range(1000)]
+        del temporary
+    with tracker.stage("kept"):
+        kept = [bytes(1000) for _ in range(1000)]
+    tracker.stop()
+    temporary_stage, kept_stage = tracker.stages
+    assert temporary_stage.peak >= 1_000_000 and temporary_stage.retained < 100_000
+    assert kept_stage.retained >= 1_000_000
+    assert "test_stage_memory.py" in kept_stage.top[0][0]
+    assert tracker.high_water >= kept_stage.high_water
+    assert "kept" in tracker.report()
+    assert len(kept) == 1000
+
+class DummySource:
+    program = "livelo"
+    match_field = "code"
+
+    def fetch(self):
+        yield {"partnerCode": "CEN", "parity": 5, "parityClub": 5, "legalTerms": "", "promotion": True}
+
+    def normalise(self, item):
+        return item
+
+    def analyse(self, record):
+        return PartnerConfig(**record)
+
+def test_pipeline_run_staged(monkeypatch):
+    analysed = []
+    analyse = PartnerConfig.analyze_legal_terms_for_points
+    monkeypatch.setattr(PartnerConfig, "analyze_legal_terms_for_points",
+                        lambda self: analysed.append(self.partner_code) or analyse(self))
+    notified = []
+    pipeline = Pipeline([DummySource()], WatchlistMatcher([WatchStore("CEN", "Centauro", "2099-12-31", 4)]),
+                        notifier=notified.append)
+    tracker = StageMemoryTracker(top_sites=0)
+    matches = pipeline.run_staged(tracker)
+    tracker.stop()
+    assert [match.partner.partner_code for match in matches] == ["CEN"]
+    assert notified == matches
+    # the parity alone meets the minimum, so only the analyse stage reads the legal terms
+    assert analysed == ["CEN"]
+    assert [stage.stage for stage in tracker.stages] == ["fetch", "extract", "analyse", "match", "notify"]
+
+def test_run_staged_keeps_the_stale_mark():
+    class CachedSource(DummySource):
+        def fetch(self):
+            yield StaleItem(next(super().fetch()))
+
+        def analyse(self, record):
+            partner = super().analyse(record)
+            partner.stale = isinstance(record, StaleItem)
+            return partner
+
+    pipeline = Pipeline([CachedSource()], WatchlistMatcher([WatchStore("CEN", "Centauro", "2099-12-31", 4)]))
+    tracker = StageMemoryTracker(top_sites=0)
+    matches = pipeline.run_staged(tracker)
+    tracker.stop()
+    assert [match.partner.stale for match in matches] == [True]
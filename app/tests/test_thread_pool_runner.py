@@ -0,0 +1,50 @@
+import threading
+import time
+from app.sources_class import EsferaSource
+from app.thread_pool_runner_class import ThreadPoolRunner
+
+def test_map_ordered_keeps_input_order():
+    def slow_square(value):
+        # Later items finish first.
+        time.sleep(0.01 * (5 - value))
+        return value * value
+
+    with ThreadPoolRunner(4) as runner:
+        assert list(runner.map_ordered(slow_square, range(5))) == [0, 1, 4, 9, 16]
+
+def test_map_ordered_runs_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_others(value):
+        # Only passes if three calls are in flight at the same time.
+        barrier.wait()
+        return value
+
+    with ThreadPoolRunner(3) as runner:
+        assert list(runner.map_ordered(wait_for_others, [1, 2, 3])) == [1, 2, 3]
+
+def test_wait_blocks_until_submitted_work_is_done():
+    done = []
+    with ThreadPoolRunner(2) as runner:
+        runner.submit(lambda: (time.sleep(0.05), done.append(1)))
+        runner.submit(lambda: 1 / 0)
+        runner.wait()
+        assert done == [1]
+
+class PagedClient:
+    def __init__(self, total):
+        self.total = total
+        self.offsets = []
+
+    def get(self, endpoint, params=None):
+        offset, limit = params["offset"], params["limit"]
+        self.offsets.append(offset)
+        items = [{"displayName": f"Store {i}"} for i in range(offset, min(offset + limit, self.total))]
+        return {"items": items, "totalResults": self.total}
+
+def test_esfera_pages_fetched_concurrently_in_order():
+    client = PagedClient(23)
+    with ThreadPoolRunner(4) as runner:
+        items = list(EsferaSource(client=client, page_size=5, runner=runner).fetch())
+    assert [item["displayName"] for item in items] == [f"Store {i}" for i in range(23)]
+    assert sorted(client.offsets) == [0, 5, 10, 15, 20]
@@ -0,0 +1,76 @@
+import datetime
+import shutil
+import struct
+import pytest
+from app.campaign_calendar_class import CampaignCalendar
+from app.daemon import TrackerDaemon
+from app.earn_rate_index_class import EarnRate
+from app.partnersconfig_class import PartnerConfig
+from app.sentence_analysis_cache_class import SentenceAnalysisCache
+from app.services.query_api_class import QueryApiServer
+from app.tracker_checkpoint_class import HEADER, TrackerCheckpoint
+
+def test_round_trip_and_validation(tmp_path):
+    checkpoint = TrackerCheckpoint(str(tmp_path / "state.ckpt"))
+    assert checkpoint.load() is None
+    size = checkpoint.save({"calendar": {"windows": [], "terms": {}}, "sentences": [["a", [1], ["1"], None, False]]})
+    assert size == (tmp_path / "state.ckpt").stat().st_size
+    assert checkpoint.load()["sentences"] == [["a", [1], ["1"], None, False]]
+
+    data = bytearray((tmp_path / "state.ckpt").read_bytes())
+    data[-1] ^= 0xFF
+    (tmp_path / "state.ckpt").write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="checksum"):
+        checkpoint.read()
+    assert checkpoint.load() is None
+
+def test_rejects_other_versions_and_old_files(tmp_path):
+    checkpoint = TrackerCheckpoint(str(tmp_path / "state.ckpt"), max_age=60)
+    checkpoint.save({})
+    data = bytearray((tmp_path / "state.ckpt").read_bytes())
+    struct.pack_into("<H", data, 4, 99)
+    (tmp_path / "state.ckpt").write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="version"):
+        checkpoint.read()
+    magic, version, flags, created, length, crc = HEADER.unpack_from(data, 0)
+    HEADER.pack_into(data, 0, magic, 1, flags, created - 120, length, crc)
+    (tmp_path / "state.ckpt").write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="older"):
+        checkpoint.read()
+
+def test_component_state_round_trips():
+    calendar = CampaignCalendar()
+    calendar.add("livelo:CSB", datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+    restored_calendar = CampaignCalendar()
+    restored_calendar.restore(calendar.checkpoint())
+    assert restored_calendar.active_on(datetime.date(2025, 1, 15)) == ["livelo:CSB"]
+
+    cache = SentenceAnalysisCache()
+    analysis = cache.analyse("Ganhe 10 pontos por real de 1 a 30/04/2023")
+    restored_cache = SentenceAnalysisCache()
+    restored_cache.restore(cache.checkpoint())
+    assert restored_cache.analyse("Ganhe 10 pontos por real de 1 a 30/04/2023") == analysis
+    assert restored_cache.hits == 1
+
+def test_daemon_restores_its_state(tmp_path):
+    watchlist = tmp_path / "watchstores.json"
+    shutil.copy("app/database/watchstoreslist.json", watchlist)
+    checkpoint = TrackerCheckpoint(str(tmp_path / "tracker.ckpt"))
+    server = QueryApiServer(port=0)
+    daemon = TrackerDaemon(server, str(watchlist), checkpoint=checkpoint)
+    daemon.index_records = [{"program": "livelo", "partner_code": "CSB", "partner_name": "Casas Bahia",
+                             "parity_club": 6, "points": 6.0, "promotion": True, "campaign_from": None,
+                             "campaign_to": None, "watchers": []}]
+    daemon.track_campaign("livelo", PartnerConfig("CSB", 6, 6, "", True, campaign_from=datetime.date(2025, 1, 1),
+                                                  campaign_to=datetime.date(2025, 1, 31)), [])
+    daemon.earn_rates.update(EarnRate("casas bahia", "Casas Bahia", "", "livelo", 600, None))
+    daemon.save_checkpoint()
+    server.server_close()
+
+    server = QueryApiServer(port=0)
+    restarted = TrackerDaemon(server, str(watchlist), checkpoint=checkpoint)
+    assert restarted.restore_checkpoint()
+    assert server.index.size == 1 and server.index.partner("CSB") is not None
+    assert "livelo:CSB" in restarted.calendar
+    assert [rate.points for rate in restarted.earn_rates.top(1)] == [600]
+    server.server_close()
@@ -0,0 +1,80 @@
+import datetime
+import json
+import os
+import pytest
+from app.partnersconfig_class import PartnerConfig
+from app.watchlist_artifact_class import WatchlistArtifact
+from app.watchlist_matcher_class import WatchlistMatcher
+
+WATCHLIST = [
+    {"code": "MZL", "name": "Magazine  Luiza", "valid_until": "2099-12-31", "min_points": 6,
+     "categories": ["Eletroportáteis", "telas"]},
+    {"code": "CEN", "name": "Centauro", "valid_until": "2099-12-31", "min_points": 8},
+    {"code": "CSB", "name": "Casas Bahia", "valid_until": "2022-11-30", "min_points": 4},
+]
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "watchstoreslist.json"
+    path.write_text(json.dumps(WATCHLIST), encoding="utf-8")
+    return str(path)
+
+def test_compile_and_lookup(source):
+    artifact = WatchlistArtifact.load_or_compile(source)
+    assert os.path.exists(WatchlistArtifact.default_path(source))
+    assert [ws.code for ws in artifact.watchstores()] == ["MZL", "CEN", "CSB"]
+
+    store = artifact.find_by_code("MZL")[0]
+    assert store.valid_until == datetime.date(2099, 12, 31)
+    assert store.categories == ["Eletroportáteis", "telas"]
+    assert artifact.category_terms(0) == ["eletroportáteis", "telas"]
+    assert artifact.find_by_name("magazine luiza")[0] is store
+    assert artifact.find_by_code("XXX") == []
+    assert sorted(ws.code for ws in artifact.stores_up_to(6)) == ["CSB", "MZL"]
+
+def test_recompiles_only_when_source_changes(source):
+    WatchlistArtifact.load_or_compile(source).close()
+    artifact_path = WatchlistArtifact.default_path(source)
+    compiled_at = os.stat(artifact_path).st_mtime_ns
+    WatchlistArtifact.load_or_compile(source).close()
+    assert os.stat(artifact_path).st_mtime_ns == compiled_at
+
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump(WATCHLIST + [{"code": "EXT", "name": "Extra", "valid_until": "2099-12-31", "min_points": 6}], f)
+    artifact = WatchlistArtifact.load_or_compile(source)
+    assert artifact.find_by_code("EXT")[0].name == "Extra"
+
+def test_dictionary_watchlist_as_config(tmp_path):
+    path = tmp_path / "livelo.json"
+    path.write_text(json.dumps({"CSB": {"name": "Casas Bahia", "min_points": 6, "max_amount": 500}}), encoding="utf-8")
+    config = WatchlistArtifact.load_or_compile(str(path)).as_config()
+    assert config == {"CSB": {"name": "Casas Bahia", "min_points": 6, "max_amount": 500}}
+
+def test_fractional_thresholds_match_the_json_path(tmp_path):
+    entries = {"CSB": {"name": "Casas Bahia", "min_points": 1.5, "max_amount": "2,5"},
+               "CEN": {"name": "Centauro", "min_points": "2,5"}}
+    path = tmp_path / "livelo.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    artifact = WatchlistArtifact.load_or_compile(str(path))
+    assert [ws.min_points_fixed for ws in artifact.watchstores()] == [150, 250]
+    assert artifact.as_config() == {"CSB": {"name": "Casas Bahia", "min_points": 1.5, "max_amount": 2.5},
+                                    "CEN": {"name": "Centauro", "min_points": 2.5}}
+    assert [ws.code for ws in artifact.stores_up_to(2)] == ["CSB"]
+
+def test_matcher_uses_artifact(source):
+    matcher = WatchlistMatcher(artifact=WatchlistArtifact.load_or_compile(source))
+    assert [ws.code for ws in matcher.match(PartnerConfig("MZL", 6, 6, "", True))] == ["MZL"]
+    # Casas Bahia's watch has expired.
+    assert matcher.match(PartnerConfig("CSB", 6, 6, "", True)) == []
+
+def test_concurrent_compiles_leave_a_whole_artifact(source, tmp_path):
+    import threading
+    threads = [threading.Thread(target=WatchlistArtifact.compile, args=(source,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    artifact = WatchlistArtifact(WatchlistArtifact.default_path(source))
+    assert [ws.code for ws in artifact.watchstores()] == ["MZL", "CEN", "CSB"]
+    artifact.close()
@@ -0,0 +1,71 @@
+import datetime
+import json
+import os
+from app.partnersconfig_class import PartnerConfig
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchlist_reloader_class import WatchlistReloader
+from app.watchstore_class import WatchStore
+
+def write_watchlist(path, stores, mtime):
+    path.write_text(json.dumps(stores))
+    os.utime(path, ns=(mtime, mtime))
+
+def store(code, min_points, valid_until="2099-12-31"):
+    return {"code": code, "name": code.title(), "valid_until": valid_until, "min_points": min_points}
+
+def partner(code, parity):
+    return PartnerConfig(partnerCode=code, parity=parity, parityClub=parity, legalTerms="", promotion=True)
+
+def test_reload_patches_only_changed_entries(tmp_path):
+    path = tmp_path / "watchlist.json"
+    write_watchlist(path, [store("CEN", 4), store("BOK", 6)], 1_000_000_000)
+    reloader = WatchlistReloader(str(path))
+    matcher = reloader.matcher
+    centauro = matcher.by_code["CEN"][0]
+    assert reloader.poll() is None
+
+    write_watchlist(path, [store("CEN", 4), store("BOK", 3), store("AMZ", 2)], 2_000_000_000)
+    diff = reloader.poll()
+    assert [ws.code for ws in diff.added] == ["AMZ"]
+    assert [new.min_points for _, new in diff.changed] == [3]
+    assert diff.removed == []
+    # Unchanged entries keep their indexed object.
+    assert matcher.by_code["CEN"][0] is centauro
+    assert [ws.code for ws in matcher.match(partner("BOK", 4))] == ["BOK"]
+
+    write_watchlist(path, [store("AMZ", 2)], 3_000_000_000)
+    diff = reloader.poll()
+    assert sorted(ws.code for ws in diff.removed) == ["BOK", "CEN"]
+    assert matcher.match(partner("CEN", 10)) == []
+    assert [ws.code for ws in matcher.watchstores()] == ["AMZ"]
+
+def test_expired_stores_drop_out_through_heap():
+    today = datetime.date.today()
+    soon = WatchStore("CEN", "Centauro", (today + datetime.timedelta(days=1)).isoformat(), 4)
+    later = WatchStore("BOK", "Booking", (today + datetime.timedelta(days=30)).isoformat(), 4)
+    expired = WatchStore("OLD", "Old", (today - datetime.timedelta(days=1)).isoformat(), 4)
+    matcher = WatchlistMatcher([soon, later, expired])
+    assert "OLD" not in matcher.by_code
+    assert matcher.expire(today + datetime.timedelta(days=2)) == [soon]
+    assert "CEN" not in matcher.by_code
+    assert matcher.watchstores() == [later]
+
+def test_removed_store_is_skipped_when_its_expiry_comes_due():
+    today = datetime.date.today()
+    watchstore = WatchStore("CEN", "Centauro", (today + datetime.timedelta(days=1)).isoformat(), 4)
+    matcher = WatchlistMatcher([watchstore])
+    matcher.remove(watchstore)
+    assert matcher.by_code == {} and matcher.by_name == {}
+    assert matcher.expire(today + datetime.timedelta(days=5)) == []
+
+def test_poll_keeps_the_current_watchlist_when_the_file_is_broken(tmp_path):
+    path = tmp_path / "watchlist.json"
+    write_watchlist(path, [store("CEN", 4)], 1_000_000_000)
+    reloader = WatchlistReloader(str(path))
+    path.write_text("[{\"code\": ")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert reloader.poll() is None
+    assert [ws.code for ws in reloader.matcher.watchstores()] == ["CEN"]
+    # Once fixed, the file is picked up even though the broken version was never loaded.
+    write_watchlist(path, [store("CEN", 4), store("AMZ", 2)], 3_000_000_000)
+    assert [ws.code for ws in reloader.poll().added] == ["AMZ"]
@@ -0,0 +1,98 @@
+import collections
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ThreadPoolRunner:
+    """
+    Runs blocking calls (HTTP requests, email sends) on a shared thread pool.
+
+    map_ordered() runs a function over many inputs concurrently and yields the
+    results in input order, keeping a bounded number of calls in flight.
+    submit() runs fire-and-forget work such as notification sends; wait() blocks
+    until it has all finished. Errors of submitted work are logged, not raised.
+    """
+    def __init__(self, workers: int = 4) -> None:
+        """
+        Initializes the runner.
+
+        Args:
+            workers (int): Number of worker threads.
+        """
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="runner")
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ThreadPoolRunner":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    def map_ordered(self, func: Callable[[T], R], items: Iterable[T], window: Optional[int] = None) -> Iterator[R]:
+        """
+        Calls func on every item concurrently and yields the results in input order.
+
+        Args:
+            func (Callable[[T], R]): Blocking function to call.
+            items (Iterable[T]): Inputs, consumed lazily.
+            window (Optional[int]): Maximum calls in flight; defaults to twice the worker count.
+
+        Returns:
+            Iterator[R]: The results, in the order of items.
+
+        Raises:
+            Exception: The first error raised by func, when its result is reached.
+        """
+        window = window or self.workers * 2
+        in_flight: Deque[Future] = collections.deque()
+        try:
+            for item in items:
+                in_flight.append(self._executor.submit(func, item))
+                if len(in_flight) >= window:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            # The consumer stopped early or a call failed: drop the calls not started yet.
+            for future in in_flight:
+                future.cancel()
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        """
+        Runs func(*args) in the background; errors are logged.
+        """
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._log_error)
+        with self._lock:
+            self._pending = [pending for pending in self._pending if not pending.done()]
+            self._pending.append(future)
+        return future
+
+    @staticmethod
+    def _log_error(future: Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"Background task failed: {future.exception()}")
+
+    def wait(self) -> None:
+        """
+        Blocks until every submitted task has finished.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            if not future.cancelled():
+                future.exception()
+
+    def shutdown(self) -> None:
+        """
+        Waits for submitted tasks and stops the worker threads.
+        """
+        self.wait()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,108 @@
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, Optional
+from .services import json_codec
+
+# File layout (little endian):
+#   header:  magic, format version, flags (reserved), creation time (unix seconds),
+#            compressed payload length, CRC32 of the compressed payload
+#   payload: zlib-compressed UTF-8 JSON object, one key per state section
+MAGIC = b"TCK1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHdQI")
+
+
+class TrackerCheckpoint:
+    """
+    Versioned binary checkpoint of the tracker's derived state.
+
+    The state is a dictionary of sections (analysed partners, caches, indexes,
+    HTTP validators), each produced by the checkpoint() method of its component.
+    Files are written to a temporary name and renamed, so a crash while saving
+    leaves the previous checkpoint intact. load() validates the magic, format
+    version, payload length, checksum and age; any mismatch means a cold start.
+    """
+    def __init__(self, path: str, max_age: float = 7 * 24 * 3600) -> None:
+        """
+        Initializes the checkpoint.
+
+        Args:
+            path (str): Checkpoint file.
+            max_age (float): Checkpoints older than this many seconds are ignored.
+        """
+        self.path = path
+        self.max_age = max_age
+
+    def save(self, state: Dict[str, Any]) -> int:
+        """
+        Writes the state atomically.
+
+        Args:
+            state (Dict[str, Any]): JSON-serialisable sections.
+
+        Returns:
+            int: Size of the file in bytes.
+        """
+        payload = zlib.compress(json_codec.dumps(state), 6)
+        header = HEADER.pack(MAGIC, VERSION, 0, time.time(), len(payload), zlib.crc32(payload))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(header)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        return len(header) + len(payload)
+
+    def read(self) -> Dict[str, Any]:
+        """
+        Reads and validates the checkpoint.
+
+        Returns:
+            Dict[str, Any]: The state sections.
+
+        Raises:
+            FileNotFoundError: If there is no checkpoint.
+            ValueError: If the file is not a valid, recent checkpoint of this version.
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError("truncated header")
+        magic, version, _, created, length, crc = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a tracker checkpoint")
+        if version != VERSION:
+            raise ValueError(f"format version {version}, expected {VERSION}")
+        payload = data[HEADER.size:]
+        if len(payload) != length:
+            raise ValueError(f"payload is {len(payload)} bytes, header says {length}")
+        if zlib.crc32(payload) != crc:
+            raise ValueError("checksum mismatch")
+        if time.time() - created > self.max_age:
+            raise ValueError(f"older than {self.max_age:.0f}s")
+        try:
+            state = json_codec.loads(zlib.decompress(payload))
+        except (zlib.error, json_codec.JSONDecodeError) as e:
+            raise ValueError(f"corrupt payload: {e}") from None
+        if not isinstance(state, dict):
+            raise ValueError("payload is not a state object")
+        return state
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the checkpointed state, or None (with a warning) if it is missing or invalid.
+        """
+        try:
+            return self.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring checkpoint {self.path}: {e}")
+            return None
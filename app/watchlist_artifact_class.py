@@ -0,0 +1,332 @@
+import datetime
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from .accumulation_parser import from_fixed, to_fixed
+from .watchstore_class import WatchStore
+from .services import json_codec
+
+# File layout (little endian):
+#   header
+#   strings:    (n_strings + 1) u32 offsets followed by the UTF-8 blob (every string stored once)
+#   stores:     n_stores STORE records
+#   categories: n_categories (term u32, normalised term u32) string id pairs, grouped per store
+#   thresholds: n_stores (min_points i32, store u32) pairs sorted by min_points
+#               (min_points and max_amount are fixed-point: hundredths, see accumulation_parser.to_fixed)
+#   code index: (string id u32, store u32) pairs sorted by code
+#   name index: (string id u32, store u32) pairs sorted by normalised name
+MAGIC = b"WLA1"
+VERSION = 2
+HEADER = struct.Struct("<4sHHQQ20sIIIIIIIII")
+STORE = struct.Struct("<IIiiiII")
+PAIR = struct.Struct("<iI")
+U32 = struct.Struct("<I")
+CATEGORY = struct.Struct("<II")
+NO_VALUE = -1
+
+
+def normalise_term(term: Optional[str]) -> str:
+    """
+    Normalises a name or category term (case and whitespace insensitive).
+    """
+    return " ".join((term or "").casefold().split())
+
+
+def _from_fixed(value: int) -> Union[int, float]:
+    # Whole values come back as int, as they are usually written in the watchlist JSON
+    number = from_fixed(value)
+    return int(number) if number == number.to_integral_value() else float(number)
+
+
+def _source_stat(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _sha1(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+class WatchlistArtifact:
+    """
+    Memory-mapped, precompiled watchlist.
+
+    compile() turns a watchlist JSON file into a binary artifact with interned
+    strings, normalised category terms, a threshold table and sorted code/name
+    indexes. Opening the artifact only maps the file: lookups binary-search the
+    mapped indexes and WatchStore objects are built on demand, so startup cost does
+    not grow with the watchlist.
+
+    Both watchlist formats are accepted: a list of watch stores (watchstoreslist.json)
+    or a dictionary keyed by code/slug (the crawlers' livelo.json and esfera.json).
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Maps an existing artifact.
+
+        Args:
+            path (str): Path of the compiled artifact.
+
+        Raises:
+            ValueError: If the file is not a compatible artifact.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.source_size, self.source_mtime_ns, self.source_sha1,
+         self.n_strings, self.n_stores, self.n_categories,
+         self._strings_off, self._stores_off, self._categories_off,
+         self._thresholds_off, self._code_index_off, self._name_index_off) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} watchlist artifact")
+        self._blob_off = self._strings_off + (self.n_strings + 1) * U32.size
+        self._strings: Dict[int, str] = {}
+        self._stores: Dict[int, WatchStore] = {}
+
+    @staticmethod
+    def default_path(source: str) -> str:
+        """
+        Returns the artifact path used for a watchlist JSON file.
+        """
+        return source + ".wla"
+
+    @staticmethod
+    def _entries(data: Any) -> Iterator[Dict[str, Any]]:
+        if isinstance(data, dict):
+            for key, item in data.items():
+                yield dict(item, code=item.get("code", key))
+        else:
+            yield from data
+
+    @classmethod
+    def compile(cls, source: str, target: Optional[str] = None) -> str:
+        """
+        Compiles a watchlist JSON file into a binary artifact.
+
+        Args:
+            source (str): Watchlist JSON file.
+            target (Optional[str]): Artifact path; defaults to default_path(source).
+
+        Returns:
+            str: The artifact path.
+        """
+        target = target or cls.default_path(source)
+        size, mtime_ns = _source_stat(source)
+        with open(source, "rb") as f:
+            raw = f.read()
+        entries = list(cls._entries(json_codec.loads(raw)))
+
+        strings: List[bytes] = []
+        string_ids: Dict[str, int] = {}
+
+        def intern(value: Optional[str]) -> int:
+            value = value or ""
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(value.encode("utf-8"))
+            return string_ids[value]
+
+        stores = bytearray()
+        categories = bytearray()
+        thresholds: List[Tuple[int, int]] = []
+        code_index: List[Tuple[str, int, int]] = []
+        name_index: List[Tuple[str, int, int]] = []
+        n_categories = 0
+        for position, entry in enumerate(entries):
+            valid_until = entry.get("valid_until")
+            ordinal = datetime.datetime.strptime(valid_until, "%Y-%m-%d").date().toordinal() if valid_until else 0
+            # Parsed like WatchStore does, so "1,5" and 1.5 keep their fraction
+            min_points = to_fixed(entry.get("min_points"))
+            max_amount = entry.get("max_amount")
+            terms = entry.get("categories") or []
+            for term in terms:
+                categories += CATEGORY.pack(intern(term), intern(normalise_term(term)))
+            code, name = entry.get("code") or "", entry.get("name") or ""
+            stores += STORE.pack(intern(code), intern(name), ordinal, min_points,
+                                 NO_VALUE if max_amount is None else to_fixed(max_amount),
+                                 n_categories, len(terms))
+            n_categories += len(terms)
+            thresholds.append((min_points, position))
+            code_index.append((code, intern(code), position))
+            normalised_name = normalise_term(name)
+            name_index.append((normalised_name, intern(normalised_name), position))
+
+        offsets = bytearray()
+        blob = bytearray()
+        for value in strings:
+            offsets += U32.pack(len(blob))
+            blob += value
+        offsets += U32.pack(len(blob))
+
+        sections = [offsets + blob, stores, categories,
+                    b"".join(PAIR.pack(points, position) for points, position in sorted(thresholds)),
+                    b"".join(PAIR.pack(sid, position) for _, sid, position in sorted(code_index)),
+                    b"".join(PAIR.pack(sid, position) for _, sid, position in sorted(name_index))]
+        section_offsets = []
+        offset = HEADER.size
+        for section in sections:
+            section_offsets.append(offset)
+            offset += len(section)
+
+        header = HEADER.pack(MAGIC, VERSION, 0, size, mtime_ns, hashlib.sha1(raw).digest(),
+                             len(strings), len(entries), n_categories, *section_offsets)
+        # A temporary file of its own, so concurrent compiles do not write over each other.
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(header)
+                for section in sections:
+                    f.write(section)
+            # Replace atomically so readers never map a half-written artifact.
+            os.replace(temporary, target)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return target
+
+    @classmethod
+    def load_or_compile(cls, source: str, target: Optional[str] = None) -> "WatchlistArtifact":
+        """
+        Maps the artifact of a watchlist, compiling it first if the source JSON changed.
+
+        The source size and modification time are checked first; the content hash is
+        only computed when they differ from the ones recorded in the artifact.
+
+        Args:
+            source (str): Watchlist JSON file.
+            target (Optional[str]): Artifact path; defaults to default_path(source).
+
+        Returns:
+            WatchlistArtifact: The mapped artifact.
+        """
+        target = target or cls.default_path(source)
+        try:
+            artifact = cls(target)
+        except (FileNotFoundError, ValueError, struct.error):
+            return cls(cls.compile(source, target))
+        if (artifact.source_size, artifact.source_mtime_ns) == _source_stat(source):
+            return artifact
+        if artifact.source_sha1 == _sha1(source):
+            return artifact
+        artifact.close()
+        return cls(cls.compile(source, target))
+
+    def close(self) -> None:
+        """
+        Unmaps the artifact.
+        """
+        self._map.close()
+
+    def string(self, sid: int) -> str:
+        """
+        Returns an interned string from the string table.
+        """
+        value = self._strings.get(sid)
+        if value is None:
+            start, end = struct.unpack_from("<II", self._map, self._strings_off + sid * U32.size)
+            value = self._map[self._blob_off + start:self._blob_off + end].decode("utf-8")
+            self._strings[sid] = value
+        return value
+
+    def store(self, position: int) -> WatchStore:
+        """
+        Returns the WatchStore at a position, building it on first access.
+        """
+        watchstore = self._stores.get(position)
+        if watchstore is None:
+            (code_sid, name_sid, ordinal, min_points, max_amount,
+             categories_start, categories_count) = STORE.unpack_from(self._map, self._stores_off + position * STORE.size)
+            categories = [self.string(sid) for sid, _ in self._categories(categories_start, categories_count)]
+            watchstore = WatchStore.from_compiled(
+                code=self.string(code_sid),
+                name=self.string(name_sid),
+                valid_until=datetime.date.fromordinal(ordinal) if ordinal else None,
+                min_points=_from_fixed(min_points),
+                categories=categories,
+                max_amount=None if max_amount == NO_VALUE else _from_fixed(max_amount),
+            )
+            self._stores[position] = watchstore
+        return watchstore
+
+    def _categories(self, start: int, count: int) -> List[Tuple[int, int]]:
+        return [CATEGORY.unpack_from(self._map, self._categories_off + index * CATEGORY.size)
+                for index in range(start, start + count)]
+
+    def category_terms(self, position: int) -> List[str]:
+        """
+        Returns the normalised category terms of the watch store at a position.
+        """
+        _, _, _, _, _, start, count = STORE.unpack_from(self._map, self._stores_off + position * STORE.size)
+        return [self.string(sid) for _, sid in self._categories(start, count)]
+
+    def watchstores(self) -> List[WatchStore]:
+        """
+        Returns every watch store of the artifact, in source order.
+        """
+        return [self.store(position) for position in range(self.n_stores)]
+
+    def _pair(self, offset: int, index: int) -> Tuple[int, int]:
+        return PAIR.unpack_from(self._map, offset + index * PAIR.size)
+
+    def _find(self, index_off: int, key: str) -> List[WatchStore]:
+        # Binary search for the first entry >= key in an index sorted by string value.
+        low, high = 0, self.n_stores
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(self._pair(index_off, middle)[0]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.n_stores:
+            sid, position = self._pair(index_off, low)
+            if self.string(sid) != key:
+                break
+            found.append(self.store(position))
+            low += 1
+        return found
+
+    def find_by_code(self, code: str) -> List[WatchStore]:
+        """
+        Returns the watch stores with the given code (Livelo partner code or Esfera slug).
+        """
+        return self._find(self._code_index_off, code or "")
+
+    def find_by_name(self, name: str) -> List[WatchStore]:
+        """
+        Returns the watch stores whose normalised name matches.
+        """
+        return self._find(self._name_index_off, normalise_term(name))
+
+    def stores_up_to(self, points: Union[int, float, str]) -> List[WatchStore]:
+        """
+        Returns the watch stores whose min_points is at most the given number of points.
+        """
+        points = to_fixed(points)
+        low, high = 0, self.n_stores
+        while low < high:
+            middle = (low + high) // 2
+            if self._pair(self._thresholds_off, middle)[0] <= points:
+                low = middle + 1
+            else:
+                high = middle
+        return [self.store(self._pair(self._thresholds_off, index)[1]) for index in range(low)]
+
+    def as_config(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the watchlist in the crawlers' dictionary format, keyed by code.
+        """
+        config: Dict[str, Dict[str, Any]] = {}
+        for watchstore in self.watchstores():
+            item: Dict[str, Any] = {"name": watchstore.name, "min_points": watchstore.min_points}
+            if watchstore.categories:
+                item["categories"] = list(watchstore.categories)
+            if watchstore.max_amount is not None:
+                item["max_amount"] = watchstore.max_amount
+            config[watchstore.code] = item
+        return config
@@ -0,0 +1,195 @@
+import datetime
+import heapq
+import itertools
+from typing import Dict, List, Optional, Tuple
+from .partnersconfig_class import PartnerConfig
+from .watchstore_class import WatchStore
+from .watchlist_artifact_class import WatchlistArtifact, normalise_term
+
+class WatchlistMatcher:
+    """
+    Matches partner configurations against a list of WatchStore objects.
+
+    Watch stores are indexed by code (Livelo's partnerCode) and by normalised name
+    (Esfera's displayName), so each partner is resolved with a dictionary lookup
+    instead of a scan over the whole watchlist.
+
+    A compiled WatchlistArtifact can be used instead of (or in addition to) a list of
+    watch stores; its memory-mapped indexes are queried directly, so no lookup
+    tables have to be built at startup.
+
+    Indexed watch stores can be added and removed one at a time, so a changed
+    watchlist is patched in place. Their expiry dates are kept in a min-heap:
+    stores past valid_until are dropped from the indexes as the heap's head comes
+    due, instead of each candidate being checked on every match.
+    """
+    def __init__(self, watchstores: Optional[List[WatchStore]] = None,
+                 artifact: Optional[WatchlistArtifact] = None) -> None:
+        """
+        Initializes the matcher and builds the lookup indexes.
+
+        Args:
+            watchstores (Optional[List[WatchStore]]): Watch stores to match against.
+            artifact (Optional[WatchlistArtifact]): Compiled watchlist to match against.
+        """
+        self.artifact = artifact
+        self.by_code: Dict[str, List[WatchStore]] = {}
+        self.by_name: Dict[str, List[WatchStore]] = {}
+        self._indexed: Dict[int, WatchStore] = {}
+        self._expiry: List[Tuple[datetime.date, int, WatchStore]] = []
+        self._sequence = itertools.count()
+        for watchstore in watchstores or []:
+            self.add(watchstore)
+
+    @staticmethod
+    def normalise_name(name: Optional[str]) -> str:
+        """
+        Normalises a store name for lookups (case and whitespace insensitive).
+        """
+        return normalise_term(name)
+
+    @staticmethod
+    def partner_points(partner: PartnerConfig) -> int:
+        """
+        Returns the best points per real offered by a partner, in fixed-point.
+
+        Considers both the club parity (or Esfera accumulation range) and the highest
+        value found in the legal terms.
+        """
+        return partner.points_fixed()
+
+    def add(self, watchstore: WatchStore) -> None:
+        """
+        Adds a watch store to the indexes. Stores that are already expired are ignored.
+        """
+        if not watchstore.is_valid() or id(watchstore) in self._indexed:
+            return
+        self._indexed[id(watchstore)] = watchstore
+        heapq.heappush(self._expiry, (watchstore.valid_until, next(self._sequence), watchstore))
+        if watchstore.code:
+            self.by_code.setdefault(watchstore.code, []).append(watchstore)
+        if watchstore.name:
+            self.by_name.setdefault(self.normalise_name(watchstore.name), []).append(watchstore)
+
+    def remove(self, watchstore: WatchStore) -> None:
+        """
+        Removes a watch store from the indexes (no-op if it is not indexed).
+
+        Its expiry heap entry is left behind and discarded when it reaches the head.
+        """
+        if self._indexed.pop(id(watchstore), None) is None:
+            return
+        for index, key in ((self.by_code, watchstore.code), (self.by_name, self.normalise_name(watchstore.name))):
+            stores = index.get(key)
+            if not stores:
+                continue
+            stores[:] = [store for store in stores if store is not watchstore]
+            if not stores:
+                del index[key]
+
+    def expire(self, today: Optional[datetime.date] = None) -> List[WatchStore]:
+        """
+        Drops the watch stores whose valid_until has passed.
+
+        Args:
+            today (Optional[datetime.date]): Reference day; defaults to today.
+
+        Returns:
+            List[WatchStore]: The stores that were removed.
+        """
+        today = today or datetime.date.today()
+        expired = []
+        while self._expiry and self._expiry[0][0] < today:
+            _, _, watchstore = heapq.heappop(self._expiry)
+            if id(watchstore) in self._indexed:
+                self.remove(watchstore)
+                expired.append(watchstore)
+        return expired
+
+    def watchstores(self) -> List[WatchStore]:
+        """
+        Returns the indexed (not expired) watch stores, in insertion order.
+        """
+        return list(self._indexed.values())
+
+    def candidates(self, partner: PartnerConfig, field: str = "code") -> List[WatchStore]:
+        """
+        Returns the watch stores that refer to the given partner.
+
+        Args:
+            partner (PartnerConfig): Partner to look up.
+            field (str): "code" to match by partner code, "name" to match by partner name.
+
+        Returns:
+            List[WatchStore]: Watch stores watching this partner (may be empty).
+        """
+        key = self.partner_key(partner, field)
+        return self._indexed_candidates(key, field) + self._compiled_candidates(key, field)
+
+    @staticmethod
+    def partner_key(partner: PartnerConfig, field: str = "code") -> str:
+        """
+        Returns the value a partner is looked up by: its name for "name", else its code.
+        """
+        return partner.partner_name if field == "name" else partner.partner_code
+
+    def _indexed_candidates(self, key: str, field: str) -> List[WatchStore]:
+        if field == "name":
+            return self.by_name.get(self.normalise_name(key), [])
+        return self.by_code.get(key, [])
+
+    def _compiled_candidates(self, key: str, field: str) -> List[WatchStore]:
+        if self.artifact is None:
+            return []
+        if field == "name":
+            return self.artifact.find_by_name(key)
+        return self.artifact.find_by_code(key)
+
+    def match(self, partner: PartnerConfig, field: str = "code") -> List[WatchStore]:
+        """
+        Returns the valid watch stores whose minimum points are met by the partner.
+
+        The partner is looked up first, so unwatched partners are rejected without
+        computing their points. The legal terms are analysed only when the numeric
+        fields alone do not meet every candidate's minimum. Partners matched by code
+        (Livelo) must also be flagged as on promotion; Esfera partners, matched by
+        name, have no such flag.
+
+        Args:
+            partner (PartnerConfig): Analysed partner configuration.
+            field (str): "code" to match by partner code, "name" to match by partner name.
+
+        Returns:
+            List[WatchStore]: Matching watch stores (may be empty).
+        """
+        if field == "code" and not partner.promotion:
+            return []
+        candidates = self._valid_candidates(self.partner_key(partner, field), field)
+        if not candidates:
+            return []
+        points = partner.parity_fixed()
+        if any(points < watchstore.min_points_fixed for watchstore in candidates):
+            points = self.partner_points(partner)
+        return [watchstore for watchstore in candidates if points >= watchstore.min_points_fixed]
+
+    def _valid_candidates(self, key: str, field: str) -> List[WatchStore]:
+        if self._expiry:
+            self.expire()
+        indexed = self._indexed_candidates(key, field)
+        # The artifact is immutable, so its stores are still checked for expiry here.
+        compiled = [watchstore for watchstore in self._compiled_candidates(key, field) if watchstore.is_valid()]
+        return indexed + compiled
+
+    def match_points(self, key: str, points: int, field: str = "code") -> List[WatchStore]:
+        """
+        Returns the valid watch stores for a partner key whose minimum points are met.
+
+        Args:
+            key (str): Partner code (or name, if field is "name").
+            points (int): Best points per real offered by the partner, in fixed-point.
+            field (str): "code" to match by partner code, "name" to match by partner name.
+
+        Returns:
+            List[WatchStore]: Matching watch stores (may be empty).
+        """
+        return [watchstore for watchstore in self._valid_candidates(key, field) if points >= watchstore.min_points_fixed]
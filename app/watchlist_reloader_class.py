@@ -0,0 +1,116 @@
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .watchstore_class import WatchStore
+from .watchlist_artifact_class import WatchlistArtifact
+from .watchlist_matcher_class import WatchlistMatcher
+
+
+class WatchlistDiff(NamedTuple):
+    """
+    Changes found between two versions of a watchlist.
+    """
+    added: List[WatchStore]
+    removed: List[WatchStore]
+    changed: List[Tuple[WatchStore, WatchStore]]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+class WatchlistReloader:
+    """
+    Keeps a WatchlistMatcher in sync with a watchlist file.
+
+    poll() only stats the file; when its size or modification time changed the
+    watchlist is re-read (through its compiled artifact), compared entry by entry
+    with the previous version, and only the added, removed and edited watch stores
+    are patched into the matcher's indexes. A file that cannot be read or parsed
+    is logged once and the matcher keeps the last loaded watchlist.
+    """
+    def __init__(self, path: str, matcher: Optional[WatchlistMatcher] = None) -> None:
+        """
+        Initializes the reloader and loads the watchlist.
+
+        Args:
+            path (str): Watchlist JSON file.
+            matcher (Optional[WatchlistMatcher]): Matcher to keep up to date; an empty one is created if omitted.
+        """
+        self.path = path
+        self.matcher = matcher or WatchlistMatcher()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._failed_stat: Optional[Tuple[int, int]] = None
+        self._stores: Dict[Tuple[str, str], WatchStore] = {}
+        self.reload()
+
+    def _read_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def poll(self) -> Optional[WatchlistDiff]:
+        """
+        Reloads the watchlist if the file changed since the last load.
+
+        Returns:
+            Optional[WatchlistDiff]: The applied changes, or None if the file did not change or could not be loaded.
+        """
+        stat = self._read_stat()
+        if stat is None or stat in (self._stat, self._failed_stat):
+            return None
+        try:
+            return self.reload()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self._failed_stat = stat
+            logging.error(f"Keeping the current watchlist, {self.path} could not be loaded: {e}")
+            return None
+
+    def reload(self) -> WatchlistDiff:
+        """
+        Reads the watchlist and applies the differences to the matcher.
+
+        Returns:
+            WatchlistDiff: The applied changes.
+
+        Raises:
+            OSError, ValueError, KeyError, TypeError: If the watchlist cannot be read or parsed; the
+                matcher is left unchanged.
+        """
+        # Stat before reading, so a write made while loading is picked up by the next poll.
+        stat = self._read_stat()
+        artifact = WatchlistArtifact.load_or_compile(self.path)
+        try:
+            current = {watchstore.key(): watchstore for watchstore in artifact.watchstores()}
+        finally:
+            artifact.close()
+        self._stat = stat
+
+        diff = WatchlistDiff([], [], [])
+        for key, watchstore in self._stores.items():
+            if key not in current:
+                diff.removed.append(watchstore)
+                self.matcher.remove(watchstore)
+        for key, watchstore in current.items():
+            previous = self._stores.get(key)
+            if previous is None:
+                diff.added.append(watchstore)
+                self.matcher.add(watchstore)
+            elif previous.signature() != watchstore.signature():
+                diff.changed.append((previous, watchstore))
+                self.matcher.remove(previous)
+                self.matcher.add(watchstore)
+            else:
+                current[key] = previous
+        self._stores = current
+        if diff:
+            logging.info(f"Watchlist {self.path} reloaded: {len(diff.added)} added, "
+                         f"{len(diff.removed)} removed, {len(diff.changed)} changed")
+        return diff
+
+    def watchstores(self) -> List[WatchStore]:
+        """
+        Returns the watch stores of the last loaded watchlist, expired ones included.
+        """
+        return list(self._stores.values())
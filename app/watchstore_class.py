@@ -1,11 +1,13 @@
 import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from .accumulation_parser import to_fixed
 
 class WatchStore:
     """
     Represents a watch store item from watchstoreslist.json.
     """
-    def __init__(self, code: str, name: str, valid_until: str, min_points: int, categories: Optional[List[str]] = None) -> None:
+    def __init__(self, code: str, name: str, valid_until: str, min_points: int, categories: Optional[List[str]] = None,
+                 max_amount: Optional[int] = None) -> None:
         """
         Initializes a WatchStore instance.
 
@@ -15,13 +17,16 @@ class WatchStore:
             valid_until (str): Expiration date in 'YYYY-MM-DD' format.
             min_points (int): Minimum desired points.
             categories (Optional[List[str]]): List of categories (optional).
+            max_amount (Optional[int]): Highest minimum purchase value accepted (optional).
         """
         self.code = code
         self.name = name
         # Parse valid_until into a date object
         self.valid_until = datetime.datetime.strptime(valid_until, '%Y-%m-%d').date() if valid_until else None
         self.min_points = min_points
+        self.min_points_fixed = to_fixed(min_points)
         self.categories = categories or []
+        self.max_amount = max_amount
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "WatchStore":
@@ -39,9 +44,31 @@ class WatchStore:
             name=data.get("name"),
             valid_until=data.get("valid_until"),
             min_points=data.get("min_points"),
-            categories=data.get("categories")
+            categories=data.get("categories"),
+            max_amount=data.get("max_amount")
         )
 
+    @classmethod
+    def from_compiled(cls, code: str, name: str, valid_until: Optional[datetime.date], min_points: int,
+                      categories: Optional[List[str]] = None, max_amount: Optional[int] = None) -> "WatchStore":
+        """
+        Creates a WatchStore from already parsed values (e.g. a compiled watchlist artifact).
+
+        Args:
+            code (str): The store code.
+            name (str): The store name.
+            valid_until (Optional[datetime.date]): Expiration date.
+            min_points (int): Minimum desired points.
+            categories (Optional[List[str]]): List of categories (optional).
+            max_amount (Optional[int]): Highest minimum purchase value accepted (optional).
+
+        Returns:
+            WatchStore: The created WatchStore instance.
+        """
+        watchstore = cls(code, name, "", min_points, categories, max_amount)
+        watchstore.valid_until = valid_until
+        return watchstore
+
     def is_valid(self) -> bool:
         """
         Checks if the store is still valid (i.e., the valid_until date has not passed).
@@ -53,6 +80,18 @@ class WatchStore:
             return False
         return self.valid_until >= datetime.date.today()
 
+    def key(self) -> Tuple[str, str]:
+        """
+        Returns the identity of the store in a watchlist (its code and name).
+        """
+        return (self.code or "", self.name or "")
+
+    def signature(self) -> Tuple[Any, ...]:
+        """
+        Returns every configured value of the store, used to detect edited entries.
+        """
+        return (self.code, self.name, self.valid_until, self.min_points, tuple(self.categories), self.max_amount)
+
     def __repr__(self) -> str:
         """
         Returns a string representation of the WatchStore instance.
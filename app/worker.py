@@ -0,0 +1,246 @@
+"""
+Queue worker: runs crawl and match work as jobs from a durable SQLite queue, so
+several processes (or machines sharing the queue file) can drain a cycle in parallel.
+
+    python3 -m app.worker --enqueue-cycle                 # queue a crawl cycle
+    python3 -m app.worker --processes 4 --drain           # work until the queue is empty
+
+A cycle is split into jobs that enqueue their follow-ups:
+
+    fetch_page     one Livelo code chunk or one Esfera catalogue page
+    analyse_batch  analyses the partners of a fetched page
+    match_shard    matches analysed partners against one shard of the watchlist
+    send_digest    waits for the cycle's other jobs and prints the matches
+
+Follow-up jobs use idempotency keys derived from the parent job, so a job retried
+after a worker crash does not duplicate work.
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+from app.accumulation_parser import from_fixed
+from app.main import build_sources, load_watchstores, WATCHSTORES_PATH
+from app.services.job_queue_class import Job, JobQueue
+from app.watchlist_matcher_class import WatchlistMatcher
+from app.watchstore_class import WatchStore
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+QUEUE_PATH = "./app/database/jobs.db"
+FETCH_PAGE = "fetch_page"
+ANALYSE_BATCH = "analyse_batch"
+MATCH_SHARD = "match_shard"
+SEND_DIGEST = "send_digest"
+
+
+class Postpone(Exception):
+    """
+    Raised by a handler whose inputs are not ready; the job is retried later without counting an attempt.
+    """
+    def __init__(self, delay: float = 1) -> None:
+        super().__init__(f"postponed for {delay}s")
+        self.delay = delay
+
+
+def shard_of(watchstore: WatchStore, shards: int) -> int:
+    """
+    Returns the watchlist shard of a watch store (stable across processes).
+    """
+    return zlib.crc32("\0".join(watchstore.key()).encode("utf-8")) % shards
+
+
+def print_digest_line(match: Dict[str, Any]) -> None:
+    print(f"[{match['program']}] {match['partner']}: {from_fixed(match['points'])} pts "
+          f"({', '.join(match['watchstores'])})")
+
+
+def enqueue_cycle(queue: JobQueue, cycle: str, sources: List[Any]) -> None:
+    """
+    Queues the first jobs of a crawl cycle and its digest.
+
+    Args:
+        queue (JobQueue): Queue to fill.
+        cycle (str): Cycle identifier, used as prefix of every job key.
+        sources (List[Any]): Sources to crawl (LiveloSource is split into code chunks).
+    """
+    for source in sources:
+        if source.program == "livelo":
+            for number, codes in enumerate(source.chunks()):
+                queue.enqueue(FETCH_PAGE, {"cycle": cycle, "program": "livelo", "codes": codes},
+                              key=f"{cycle}:fetch:livelo:{number}")
+        else:
+            queue.enqueue(FETCH_PAGE, {"cycle": cycle, "program": source.program, "offset": 0},
+                          key=f"{cycle}:fetch:{source.program}:0")
+    queue.enqueue(SEND_DIGEST, {"cycle": cycle}, key=f"digest:{cycle}")
+
+
+class Worker:
+    """
+    Leases jobs from a JobQueue and runs the matching handler.
+    """
+    def __init__(self, queue: JobQueue, watchstores: List[WatchStore], sources: Optional[List[Any]] = None,
+                 shards: int = 4, notifier: Callable[[Dict[str, Any]], None] = print_digest_line) -> None:
+        """
+        Initializes the worker.
+
+        Args:
+            queue (JobQueue): Queue to drain.
+            watchstores (List[WatchStore]): Watchlist to match against.
+            sources (Optional[List[Any]]): Sources by program; built from the watchlist if omitted.
+            shards (int): Number of watchlist shards each analysed batch is matched against.
+            notifier (Callable[[Dict[str, Any]], None]): Called by send_digest for every match.
+        """
+        self.queue = queue
+        self.watchstores = watchstores
+        self.sources = {source.program: source for source in sources or build_sources(watchstores)}
+        self.shards = shards
+        self.notifier = notifier
+        self.handlers: Dict[str, Callable[[Job], Any]] = {
+            FETCH_PAGE: self.fetch_page,
+            ANALYSE_BATCH: self.analyse_batch,
+            MATCH_SHARD: self.match_shard,
+            SEND_DIGEST: self.send_digest,
+        }
+        self._matchers: Dict[int, WatchlistMatcher] = {}
+
+    def matcher(self, shard: int) -> WatchlistMatcher:
+        """
+        Returns the matcher of one watchlist shard, building it on first use.
+        """
+        if shard not in self._matchers:
+            self._matchers[shard] = WatchlistMatcher([watchstore for watchstore in self.watchstores
+                                                      if shard_of(watchstore, self.shards) == shard])
+        return self._matchers[shard]
+
+    def fetch_page(self, job: Job) -> int:
+        payload = job.payload
+        source = self.sources[payload["program"]]
+        if "codes" in payload:
+            items = source.fetch_chunk(payload["codes"])
+        else:
+            items, total = source.fetch_page(payload["offset"])
+            if payload["offset"] == 0:
+                # The first page tells how many pages follow.
+                for offset in range(source.page_size, total, source.page_size):
+                    self.queue.enqueue(FETCH_PAGE, dict(payload, offset=offset),
+                                       key=f"{payload['cycle']}:fetch:{source.program}:{offset}")
+        records = [source.normalise(item) for item in items]
+        self.queue.enqueue(ANALYSE_BATCH, {"cycle": payload["cycle"], "program": source.program, "records": records},
+                           key=job.key.replace(":fetch:", ":analyse:", 1))
+        return len(records)
+
+    def analyse_batch(self, job: Job) -> int:
+        payload = job.payload
+        source = self.sources[payload["program"]]
+        partners = []
+        for record in payload["records"]:
+            partner = source.analyse(record)
+            points = WatchlistMatcher.partner_points(partner)
+            if points:
+                partners.append({"key": WatchlistMatcher.partner_key(partner, source.match_field),
+                                 "name": partner.partner_name or partner.partner_code, "points": points})
+        for shard in range(self.shards):
+            self.queue.enqueue(MATCH_SHARD, {"cycle": payload["cycle"], "program": source.program,
+                                             "field": source.match_field, "shard": shard, "partners": partners},
+                               key=f"{job.key.replace(':analyse:', ':match:', 1)}:{shard}")
+        return len(partners)
+
+    def match_shard(self, job: Job) -> List[Dict[str, Any]]:
+        payload = job.payload
+        matcher = self.matcher(payload["shard"])
+        matches = []
+        for partner in payload["partners"]:
+            watchstores = matcher.match_points(partner["key"], partner["points"], payload["field"])
+            if watchstores:
+                matches.append({"program": payload["program"], "partner": partner["name"],
+                                "points": partner["points"], "watchstores": [ws.name for ws in watchstores]})
+        return matches
+
+    def send_digest(self, job: Job) -> int:
+        cycle = job.payload["cycle"]
+        if self.queue.outstanding(f"{cycle}:"):
+            raise Postpone(1)
+        matches = [match for shard in self.queue.results(MATCH_SHARD, f"{cycle}:") for match in shard]
+        for match in matches:
+            self.notifier(match)
+        return len(matches)
+
+    def run_job(self, job: Job) -> None:
+        """
+        Runs a leased job, keeping its lease renewed, and records its outcome in the queue.
+        """
+        try:
+            with self.queue.renewing(job):
+                result = self.handlers[job.kind](job)
+        except Postpone as e:
+            recorded = self.queue.postpone(job, e.delay)
+        except Exception as e:
+            logging.error(f"Job {job.id} ({job.kind}, attempt {job.attempts}) failed: {e}")
+            recorded = self.queue.fail(job, repr(e))
+        else:
+            recorded = self.queue.complete(job, result)
+        if not recorded:
+            logging.warning(f"Job {job.id} ({job.kind}): lease lost to another worker, outcome discarded")
+
+    def run(self, drain: bool = False, poll_interval: float = 0.5) -> int:
+        """
+        Runs jobs until interrupted, or until the queue has no pending or leased jobs if drain is True.
+
+        Returns:
+            int: The number of jobs run.
+        """
+        processed = 0
+        while True:
+            job = self.queue.lease(self.handlers)
+            if job is None:
+                counts = self.queue.counts()
+                if drain and not counts.get("pending") and not counts.get("leased"):
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            self.run_job(job)
+            processed += 1
+
+
+def run_worker(queue_path: str, watchlist_path: str, shards: int, drain: bool) -> None:
+    queue = JobQueue(queue_path)
+    try:
+        processed = Worker(queue, load_watchstores(watchlist_path), shards=shards).run(drain=drain)
+        logging.info(f"Worker {queue.owner} finished after {processed} jobs")
+    finally:
+        queue.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Livelo/Esfera queue worker")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="SQLite job queue file")
+    parser.add_argument("--watchlist", default=WATCHSTORES_PATH, help="watch stores JSON file")
+    parser.add_argument("--shards", type=int, default=4, help="watchlist shards per analysed batch")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--enqueue-cycle", action="store_true", help="queue a new crawl cycle first")
+    parser.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    args = parser.parse_args()
+
+    if args.enqueue_cycle:
+        queue = JobQueue(args.queue)
+        cycle = time.strftime("%Y%m%dT%H%M%S")
+        enqueue_cycle(queue, cycle, build_sources(load_watchstores(args.watchlist)))
+        logging.info(f"Cycle {cycle} queued")
+        queue.close()
+
+    if args.processes == 1:
+        run_worker(args.queue, args.watchlist, args.shards, args.drain)
+        return
+    workers = [multiprocessing.Process(target=run_worker, args=(args.queue, args.watchlist, args.shards, args.drain))
+               for _ in range(args.processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()